@@ -0,0 +1,8 @@
+"""
+FastAPI backend of FebriLogic.
+
+The startup clock is started here, before any other module of the application is loaded.
+"""
+from apis.tools.profiling import startup_profile
+
+startup_profile.start()
@@ -15,6 +15,15 @@ BASE_DIR: Final[Path] = Path(__file__).resolve().parents[3]
 APIS_DIR: Final[Path] = BASE_DIR / 'app' / 'apis'
 
 
+def get_choice(name: str, default: str, choices: tuple[str, ...]) -> str:
+    """Get a setting that must be one of `choices`, so a typo fails at startup."""
+    value: str = os.environ.get(name, default)
+    if value not in choices:
+        raise ValueError(
+            f"{name} must be one of {', '.join(choices)}, got {value!r}")
+    return value
+
+
 AWS_ACCESS_KEY_ID: Final[str] = os.environ.get('AWS_ACCESS_KEY_ID')
 
 AWS_SECRET_ACCESS_KEY: Final[str] = os.environ.get('AWS_SECRET_ACCESS_KEY')
@@ -67,3 +76,135 @@ SUPPORT_REQUEST_TEMPLATE: Final[Path] = APIS_DIR / Path(
 
 PASSWORD_RESET_EMAIL_TEMPLATE: Final[Path] = APIS_DIR / Path(
     os.environ.get('PASSWORD_RESET_EMAIL_TEMPLATE'))
+
+IMPORT_CHUNK_SIZE: Final[int] = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+
+IMPORT_MAX_ERRORS: Final[int] = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+
+EXPORT_BATCH_SIZE: Final[int] = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+
+SCORING_WORKERS: Final[int] = int(os.environ.get('SCORING_WORKERS', 2))
+
+MODEL_EXECUTOR: Final[str] = get_choice(
+    'MODEL_EXECUTOR', 'process', ('process', 'thread', 'inline'))
+
+MODEL_WORKERS: Final[int] = int(os.environ.get('MODEL_WORKERS', 2))
+
+MODEL_QUEUE_SIZE: Final[int] = int(os.environ.get('MODEL_QUEUE_SIZE', 8))
+
+MODEL_RETRY_AFTER: Final[int] = int(os.environ.get('MODEL_RETRY_AFTER', 5))
+
+BCRYPT_ROUNDS: Final[int] = int(os.environ.get('BCRYPT_ROUNDS', 12))
+
+PASSWORD_HASH_WORKERS: Final[int] = int(
+    os.environ.get('PASSWORD_HASH_WORKERS', 2))
+
+LOGIN_THROTTLE_WINDOW: Final[int] = int(
+    os.environ.get('LOGIN_THROTTLE_WINDOW', 60))
+
+LOGIN_MAX_ATTEMPTS_PER_IP: Final[int] = int(
+    os.environ.get('LOGIN_MAX_ATTEMPTS_PER_IP', 30))
+
+LOGIN_MAX_ATTEMPTS_PER_EMAIL: Final[int] = int(
+    os.environ.get('LOGIN_MAX_ATTEMPTS_PER_EMAIL', 5))
+
+TOKEN_CACHE_SIZE: Final[int] = int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+
+EMAIL_SENDER: Final[str] = get_choice('EMAIL_SENDER', 'resend', ('resend', 'fake'))
+
+EMAIL_BATCH_SIZE: Final[int] = int(os.environ.get('EMAIL_BATCH_SIZE', 20))
+
+EMAIL_POLL_INTERVAL: Final[float] = float(
+    os.environ.get('EMAIL_POLL_INTERVAL', 5))
+
+EMAIL_BACKOFF_SECONDS: Final[float] = float(
+    os.environ.get('EMAIL_BACKOFF_SECONDS', 30))
+
+EMAIL_BACKOFF_MAX_SECONDS: Final[float] = float(
+    os.environ.get('EMAIL_BACKOFF_MAX_SECONDS', 3600))
+
+EMAIL_CIRCUIT_THRESHOLD: Final[int] = int(
+    os.environ.get('EMAIL_CIRCUIT_THRESHOLD', 5))
+
+EMAIL_CIRCUIT_RESET_SECONDS: Final[float] = float(
+    os.environ.get('EMAIL_CIRCUIT_RESET_SECONDS', 60))
+
+EMAIL_RETENTION_DAYS: Final[float] = float(
+    os.environ.get('EMAIL_RETENTION_DAYS', 30))
+
+ARTIFACT_STORE: Final[str] = get_choice(
+    'ARTIFACT_STORE', 's3', ('s3', 'filesystem'))
+
+ARTIFACT_DIR: Final[Path] = BASE_DIR / \
+    os.environ.get('ARTIFACT_DIR', 'data/private')
+
+LOG_LEVEL: Final[str] = os.environ.get('LOG_LEVEL', 'INFO')
+
+MODEL_RELOAD_INTERVAL: Final[float] = float(
+    os.environ.get('MODEL_RELOAD_INTERVAL', 0))
+
+ADMIN_EMAILS: Final[frozenset[str]] = frozenset(
+    email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',')
+    if email.strip()
+)
+
+COMPILED_MODEL_DIR: Final[Path] = BASE_DIR / \
+    os.environ.get('COMPILED_MODEL_DIR', 'data/private/compiled')
+
+API_WORKERS: Final[int] = int(os.environ.get('API_WORKERS', 1))
+
+METRICS_DIR: Final[Path] = BASE_DIR / \
+    os.environ.get('METRICS_DIR', 'data/private/metrics')
+
+METRICS_WRITE_INTERVAL: Final[float] = float(
+    os.environ.get('METRICS_WRITE_INTERVAL', 5))
+
+MODEL_OBJECTS: Final[dict[str, str]] = dict(
+    (name.strip(), key.strip()) for name, _, key in (
+        entry.partition('=') for entry in os.environ.get('MODEL_OBJECTS', '').split(',')
+        if entry.strip()
+    )
+)
+
+MODEL_CACHE_SIZE: Final[int] = int(os.environ.get('MODEL_CACHE_SIZE', 4))
+
+SHADOW_MODEL: Final[str] = os.environ.get('SHADOW_MODEL', '')
+
+SHADOW_SAMPLE_RATE: Final[float] = float(
+    os.environ.get('SHADOW_SAMPLE_RATE', 0.05))
+
+SLOW_REQUEST_SECONDS: Final[float] = float(
+    os.environ.get('SLOW_REQUEST_SECONDS', 1))
+
+SLOW_QUERY_SECONDS: Final[float] = float(
+    os.environ.get('SLOW_QUERY_SECONDS', 0.25))
+
+QUERY_BUDGET: Final[int] = int(os.environ.get('QUERY_BUDGET', 30))
+
+QUERY_BUDGET_STRICT: Final[bool] = os.environ.get(
+    'QUERY_BUDGET_STRICT', 'false').lower() in ('1', 'true', 'yes')
+
+REPEATED_QUERY_THRESHOLD: Final[int] = int(
+    os.environ.get('REPEATED_QUERY_THRESHOLD', 5))
+
+PROFILE_DIR: Final[Path] = BASE_DIR / \
+    os.environ.get('PROFILE_DIR', 'data/private/profiles')
+
+PROFILE_INTERVAL: Final[float] = float(
+    os.environ.get('PROFILE_INTERVAL', 0.005))
+
+PATIENT_PAGE_SIZE: Final[int] = int(os.environ.get('PATIENT_PAGE_SIZE', 100))
+
+COUNTRY_PRIORS_OBJECT: Final[str] = os.environ.get('COUNTRY_PRIORS_OBJECT', '')
+
+COUNTRY_PRIORS_PATH: Final[Path | None] = BASE_DIR / 'data' / 'private' / \
+    COUNTRY_PRIORS_OBJECT if COUNTRY_PRIORS_OBJECT else None
+
+MC_MODE: Final[str] = get_choice('MC_MODE', 'full', ('fast', 'full'))
+
+MC_FAST_MIN_DRAWS: Final[int] = int(os.environ.get('MC_FAST_MIN_DRAWS', 64))
+
+MC_FAST_TOLERANCE: Final[float] = float(
+    os.environ.get('MC_FAST_TOLERANCE', 0.01))
+
+MC_SEED: Final[int] = int(os.environ.get('MC_SEED', 0))
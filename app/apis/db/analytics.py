@@ -0,0 +1,92 @@
+"""Maintain and read disease probability totals by country and week."""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import Row, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from apis.db.patients import snapshot_country, snapshot_submitted_at
+from apis.models.model import AggregatedSnapshot, Country, DiseaseWeekAggregate
+
+RANKING_MEANS: dict[str, str] = {
+    'symptoms': 'symptom_mean',
+    'biomarkers': 'biomarker_mean'
+}
+
+
+def week_start(moment: datetime) -> date:
+    """Get the Monday of the week of a moment."""
+    day: date = moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+def aggregate_rows(country_id: int, week: date, results: dict[str, Any]) -> list[dict[str, Any]]:
+    """Build the aggregate increments of one ranking."""
+    return [{
+        'week': week,
+        'country_id': country_id,
+        'ranking': ranking,
+        'disease': disease,
+        'results': 1,
+        'probability_sum': float(probability)
+    } for ranking, field in RANKING_MEANS.items()
+        for disease, probability in results.get(field, {}).items()
+        if probability is not None]
+
+
+def add_to_aggregates(patient_id: int, snapshot: str, results: dict[str, Any],
+                      db: Session) -> None:
+    """
+    Add the ranking of a lab snapshot to the totals of its country and week in the open
+    transaction.
+
+    Each snapshot is added once, when its first ranking is stored, so rescoring it after a
+    model reload does not count the patient again. Rankings fall in the week the snapshot's
+    lab results were submitted. The increments are applied with one upsert, so concurrent
+    rankings never lose updates.
+    """
+    country_id: int | None = snapshot_country(snapshot)
+    if not country_id:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == 'postgresql' else sqlite
+    marked = db.execute(
+        dialect.insert(AggregatedSnapshot)
+        .values(patient_id=patient_id, snapshot=snapshot)
+        .on_conflict_do_nothing(index_elements=['patient_id', 'snapshot'])
+    )
+    if marked.rowcount == 0:
+        return
+    submitted_at: datetime | None = snapshot_submitted_at(snapshot, db)
+    rows: list[dict[str, Any]] = aggregate_rows(
+        country_id, week_start(submitted_at or datetime.now(timezone.utc)), results)
+    if not rows:
+        return
+    statement = dialect.insert(DiseaseWeekAggregate)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=['week', 'country_id', 'ranking', 'disease'],
+        set_={
+            'results': DiseaseWeekAggregate.results + statement.excluded.results,
+            'probability_sum':
+                DiseaseWeekAggregate.probability_sum + statement.excluded.probability_sum
+        }
+    ), rows)
+
+
+def get_disease_trends(db: Session, since: date, country_id: int | None = None,
+                       ranking: str | None = None) -> list[Row]:
+    """Get the totals of every disease by week and country from a week onwards."""
+    query = (
+        select(DiseaseWeekAggregate.week, DiseaseWeekAggregate.country_id,
+               Country.common_name, DiseaseWeekAggregate.ranking,
+               DiseaseWeekAggregate.disease, DiseaseWeekAggregate.results,
+               DiseaseWeekAggregate.probability_sum)
+        .join(Country, Country.id == DiseaseWeekAggregate.country_id)
+        .where(DiseaseWeekAggregate.week >= since)
+    )
+    if country_id is not None:
+        query = query.where(DiseaseWeekAggregate.country_id == country_id)
+    if ranking is not None:
+        query = query.where(DiseaseWeekAggregate.ranking == ranking)
+    return db.execute(query.order_by(DiseaseWeekAggregate.week,
+                                     DiseaseWeekAggregate.country_id)).all()
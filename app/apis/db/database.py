@@ -1,20 +1,61 @@
 """Database connection and session management for SQLAlchemy."""
 from typing import Generator
-from sqlalchemy import create_engine
+from sqlalchemy import Connection, DateTime, create_engine, inspect, text
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 from apis.config import POSTGRES_DATABASE_URL
+from apis.db.instrumentation import instrument_engine
 
 
 engine = create_engine(
     POSTGRES_DATABASE_URL
 )
 
+instrument_engine(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# create_all only creates missing tables, so indexes added to existing tables are created
+# here with statements that are safe to run on every startup.
+SCHEMA_UPGRADES: tuple[str, ...] = (
+    'CREATE INDEX IF NOT EXISTS ix_patient_symptoms_patient_id '
+    'ON patient_symptoms (patient_id)',
+    'CREATE INDEX IF NOT EXISTS ix_patient_biomarkers_patient_id '
+    'ON patient_biomarkers (patient_id)',
+    'CREATE INDEX IF NOT EXISTS ix_patient_negative_diseases_patient_id '
+    'ON patient_negative_diseases (patient_id)',
+)
+
+
+def add_patients_updated_at(connection: Connection) -> None:
+    """Add and backfill patients.updated_at on databases created before the column."""
+    columns: list[str] = [
+        column['name'] for column in inspect(connection).get_columns('patients')
+    ]
+    if 'updated_at' in columns:
+        return
+    column_type: str = DateTime(timezone=True).compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE patients ADD COLUMN updated_at {column_type}'))
+    connection.execute(text(
+        'UPDATE patients SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)'))
+    # SQLite cannot change the default of an existing column; the ORM sets it on insert.
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            'ALTER TABLE patients ALTER COLUMN updated_at SET DEFAULT now()'))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_patients_updated_at ON patients (updated_at)'))
+
+
+def upgrade_schema() -> None:
+    """Add the columns and indexes that create_all skips on tables that already exist."""
+    with engine.begin() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+        add_patients_updated_at(connection)
+
 
 def get_db() -> Generator[Session, None, None]:
     """Get a database session for dependency injection."""
@@ -0,0 +1,204 @@
+"""Time SQL statements and flag slow statements and requests running too many of them."""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, ExceptionContext
+
+from apis.config import (
+    QUERY_BUDGET, QUERY_BUDGET_STRICT, REPEATED_QUERY_THRESHOLD, SLOW_QUERY_SECONDS
+)
+from apis.tools.metrics import REGISTRY
+from apis.tools.timing import increment, record
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_OPERATIONS: frozenset[str] = frozenset(
+    ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'COMMIT', 'ROLLBACK'))
+
+DB_STATEMENT_SECONDS = REGISTRY.histogram(
+    'db_statement_duration_seconds', 'Execution time of SQL statements by operation.',
+    ('operation',))
+
+DB_SLOW_STATEMENTS = REGISTRY.counter(
+    'db_slow_statements_total', 'SQL statements slower than SLOW_QUERY_SECONDS by operation.',
+    ('operation',))
+
+DB_QUERY_BUDGET_EXCEEDED = REGISTRY.counter(
+    'db_query_budget_exceeded_total',
+    'Requests that executed more SQL statements than their budget by route.', ('route',))
+
+DB_REPEATED_STATEMENTS = REGISTRY.counter(
+    'db_repeated_statements_total',
+    'Requests that executed one statement at least REPEATED_QUERY_THRESHOLD times by route.',
+    ('route',))
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def statement_operation(statement: str) -> str:
+    """Get the SQL keyword a statement starts with, or OTHER for uncommon ones."""
+    operation: str = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    return operation if operation in STATEMENT_OPERATIONS else 'OTHER'
+
+
+def compact_statement(statement: str, limit: int = 500) -> str:
+    """Collapse the whitespace of a statement and shorten it for the log."""
+    compact: str = WHITESPACE.sub(' ', statement).strip()
+    return compact if len(compact) <= limit else compact[:limit] + '...'
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Replace every bound value with its type name, so no patient data reaches the log."""
+    if isinstance(parameters, dict):
+        return {name: f'<{type(value).__name__}>' for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f'<{len(parameters)} parameter sets>'
+        return [f'<{type(value).__name__}>' for value in parameters]
+    return f'<{type(parameters).__name__}>'
+
+
+class QueryLog:
+    """
+    SQL statements executed while handling one request.
+
+    The budget is the number of statements the request may execute; routes declare their
+    own with `query_budget`, and QUERY_BUDGET applies otherwise.
+    """
+
+    def __init__(self, budget: int = QUERY_BUDGET) -> None:
+        self.budget: int = budget
+        self.statements: Counter[str] = Counter()
+        self.seconds: float = 0.0
+        self.lock: Lock = Lock()
+
+    @property
+    def count(self) -> int:
+        """Get the number of statements executed."""
+        return sum(self.statements.values())
+
+    def add(self, statement: str, seconds: float) -> None:
+        """Record an executed statement."""
+        with self.lock:
+            self.statements[statement] += 1
+            self.seconds += seconds
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Get the statements executed at least REPEATED_QUERY_THRESHOLD times."""
+        with self.lock:
+            return [(statement, count) for statement, count in self.statements.most_common()
+                    if count >= REPEATED_QUERY_THRESHOLD]
+
+    def summary(self, limit: int = 5) -> str:
+        """Describe the most frequent statements."""
+        with self.lock:
+            return '\n'.join(f'{count}x {compact_statement(statement, 200)}'
+                             for statement, count in self.statements.most_common(limit))
+
+    def report(self, route: str) -> None:
+        """
+        Log a request that exceeded its query budget or repeated a statement, a likely N+1.
+
+        With QUERY_BUDGET_STRICT set, as in tests, exceeding the budget raises AssertionError.
+        """
+        count: int = self.count
+        if count > self.budget:
+            DB_QUERY_BUDGET_EXCEEDED.inc(route)
+            logger.warning('route=%s executed %d SQL statements, over its budget of %d:\n%s',
+                           route, count, self.budget, self.summary())
+            if QUERY_BUDGET_STRICT:
+                raise AssertionError(
+                    f'{route} executed {count} SQL statements, over its budget of '
+                    f'{self.budget}:\n{self.summary()}')
+        repeated: list[tuple[str, int]] = self.repeated()
+        if repeated:
+            DB_REPEATED_STATEMENTS.inc(route)
+            for statement, times in repeated:
+                logger.warning('route=%s executed the same SQL statement %d times, '
+                               'a possible N+1 query: %s', route, times,
+                               compact_statement(statement, 200))
+
+
+request_queries: ContextVar[QueryLog | None] = ContextVar('request_queries', default=None)
+
+
+@contextmanager
+def track_queries(budget: int = QUERY_BUDGET) -> Iterator[QueryLog]:
+    """Record the SQL statements executed within the block."""
+    queries: QueryLog = QueryLog(budget)
+    token = request_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        request_queries.reset(token)
+
+
+def query_budget(budget: int) -> Callable[[], None]:
+    """
+    Create a route dependency declaring how many SQL statements the route may execute.
+
+    Use it as `dependencies=[Depends(query_budget(6))]` in the route decorator.
+    """
+    def declare_budget() -> None:
+        queries: QueryLog | None = request_queries.get()
+        if queries is not None:
+            queries.budget = budget
+
+    return declare_budget
+
+
+@contextmanager
+def assert_max_queries(budget: int) -> Iterator[QueryLog]:
+    """Fail when the block executes more than `budget` SQL statements, for use in tests."""
+    with track_queries(budget) as queries:
+        yield queries
+    if queries.count > budget:
+        raise AssertionError(
+            f'{queries.count} SQL statements were executed, over the budget of {budget}:\n'
+            f'{queries.summary()}')
+
+
+def start_statement_timer(conn, _cursor, _statement, _parameters, _context,
+                          _executemany) -> None:
+    """Note when a statement starts executing."""
+    conn.info.setdefault('statement_started_at', []).append(time.perf_counter())
+
+
+def stop_statement_timer(conn, _cursor, statement, parameters, _context,
+                         _executemany) -> None:
+    """Record the execution time of a statement and log it if it was slow."""
+    seconds: float = time.perf_counter() - conn.info['statement_started_at'].pop()
+    operation: str = statement_operation(statement)
+    record('db', seconds)
+    increment('db_statements')
+    DB_STATEMENT_SECONDS.observe(seconds, operation)
+    queries: QueryLog | None = request_queries.get()
+    if queries is not None:
+        queries.add(statement, seconds)
+    if seconds >= SLOW_QUERY_SECONDS:
+        DB_SLOW_STATEMENTS.inc(operation)
+        logger.warning('Slow SQL statement took %.1f ms: %s parameters=%s', seconds * 1000,
+                       compact_statement(statement), redact_parameters(parameters))
+
+
+def discard_statement_timer(context: ExceptionContext) -> None:
+    """Forget the start of a statement that failed, since it is never stopped."""
+    if context.connection is None or context.statement is None or context.is_pre_ping:
+        return
+    started_at: list[float] = context.connection.info.get('statement_started_at', [])
+    if started_at:
+        started_at.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the statement timers to an engine."""
+    event.listen(engine, 'before_cursor_execute', start_statement_timer)
+    event.listen(engine, 'after_cursor_execute', stop_statement_timer)
+    event.listen(engine, 'handle_error', discard_statement_timer)
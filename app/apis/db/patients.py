@@ -1,10 +1,11 @@
-"""Get latest lab results for a patient."""
+"""Get latest lab results for a patient and list patients page by page."""
+from datetime import datetime
 from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import Row, func, or_, select
 
 from apis.models.model import (
-    Biomarker, Disease, Symptom,
+    Biomarker, Country, Disease, Patient, Symptom,
     patient_biomarkers, patient_negative_diseases, patient_symptoms
 )
 
@@ -57,3 +58,71 @@ def get_latest_lab_results(patient_id: int, db: Session) -> dict[str, Any]:
         'symptoms': positive_symptoms,
         'biomarkers': biomarker_result
     }
+
+
+def get_lab_snapshot(patient_id: int, db: Session) -> str:
+    """
+    Identify the latest lab results of a patient and their country without loading them.
+
+    The snapshot changes whenever negative diseases, symptoms, or biomarkers are submitted,
+    and when the patient moves to another country, since rankings use country priors.
+    """
+    *latest_ids, country_id = db.execute(
+        select(*(
+            select(func.max(table.c.id))
+            .where(table.c.patient_id == patient_id)
+            .scalar_subquery()
+            for table in (patient_negative_diseases, patient_symptoms, patient_biomarkers)
+        ), select(Patient.country_id).where(Patient.id == patient_id).scalar_subquery())
+    ).one()
+    return '-'.join(str(id_ or 0) for id_ in latest_ids) + f'@{country_id or 0}'
+
+
+def snapshot_country(snapshot: str) -> int | None:
+    """Get the country ID of a lab snapshot, or None for a snapshot taken without one."""
+    _ids, separator, country_id = snapshot.partition('@')
+    return int(country_id) if separator and country_id.isdigit() else None
+
+
+def snapshot_submitted_at(snapshot: str, db: Session) -> datetime | None:
+    """Get when the latest lab results of a snapshot were submitted, or None without any."""
+    ids, _separator, _country_id = snapshot.partition('@')
+    submitted = [
+        select(table.c.created_at).where(table.c.id == int(id_)).scalar_subquery()
+        for table, id_ in zip(
+            (patient_negative_diseases, patient_symptoms, patient_biomarkers), ids.split('-'))
+        if id_.isdigit() and id_ != '0'
+    ]
+    if not submitted:
+        return None
+    return max((moment for moment in db.execute(select(*submitted)).one() if moment),
+               default=None)
+
+
+def list_patients(user_id: int, db: Session, limit: int, after: int = 0,
+                  search: str = '', updated_since: datetime | None = None) -> list[Row]:
+    """
+    Get a page of a user's patients in ID order, starting after the patient ID `after`.
+
+    Patients are numbered per user before filtering, so numbers are stable across pages
+    and searches. A numeric search matches the patient number or age, and any other search
+    the country or city. `updated_since` keeps patients added or changed since then.
+    """
+    numbered = (
+        select(Patient.id, Patient.age, Patient.city, Patient.country_id, Patient.race,
+               Patient.sex, Patient.updated_at,
+               func.row_number().over(order_by=Patient.id).label('patient_number'))
+        .where(Patient.user_id == user_id)
+        .subquery()
+    )
+    query = select(numbered).where(numbered.c.id > after)
+    search = search.strip()
+    if search.isdigit():
+        query = query.where(or_(numbered.c.patient_number == int(search),
+                                numbered.c.age == int(search)))
+    elif search:
+        query = query.join(Country, Country.id == numbered.c.country_id).where(
+            or_(Country.common_name.ilike(f'%{search}%'), numbered.c.city.ilike(f'%{search}%')))
+    if updated_since is not None:
+        query = query.where(numbered.c.updated_at >= updated_since)
+    return db.execute(query.order_by(numbered.c.id).limit(limit)).all()
@@ -0,0 +1,61 @@
+"""Store and retrieve disease rankings computed for patients."""
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from apis.db.analytics import add_to_aggregates
+from apis.models.model import Patient, PatientResult
+
+
+def get_patient_result(patient_id: int, snapshot: str, model_version: str,
+                       db: Session) -> PatientResult | None:
+    """Get the ranking computed from a lab snapshot with a model version, if any."""
+    return db.execute(
+        select(PatientResult).where(
+            PatientResult.patient_id == patient_id,
+            PatientResult.snapshot == snapshot,
+            PatientResult.model_version == model_version
+        )
+    ).scalar_one_or_none()
+
+
+def save_patient_result(patient_id: int, snapshot: str, model_version: str,
+                        response: dict[str, Any], db: Session,
+                        aggregate: bool = False) -> None:
+    """
+    Store a ranking unless an identical one was stored concurrently.
+
+    With `aggregate`, the ranking is also added to the country and week totals in the same
+    transaction, unless another ranking of its lab snapshot already was, so each snapshot
+    is counted exactly once.
+    """
+    db.add(PatientResult(
+        patient_id=patient_id,
+        snapshot=snapshot,
+        model_version=model_version,
+        negative_diseases=response['negative_diseases'],
+        symptoms=response['symptoms'],
+        biomarkers=response['biomarkers'],
+        results=response['results']
+    ))
+    try:
+        if aggregate:
+            db.flush()
+            add_to_aggregates(patient_id, snapshot, response['results'], db)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def get_patient_results_history(patient_id: int, user_id: int, db: Session,
+                                limit: int) -> list[PatientResult]:
+    """Get the latest rankings of a patient owned by the user, newest first."""
+    return list(db.execute(
+        select(PatientResult)
+        .join(Patient, Patient.id == PatientResult.patient_id)
+        .where(PatientResult.patient_id == patient_id, Patient.user_id == user_id)
+        .order_by(PatientResult.created_at.desc(), PatientResult.id.desc())
+        .limit(limit)
+    ).scalars())
@@ -1,35 +1,105 @@
 """FastAPI application for disease diagnosis using symptoms and biomarkers."""
+import logging
+import os
+import shutil
+import signal
 from contextlib import asynccontextmanager
 
 import uvicorn
-import boto3
 
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 
-from apis.routes import auth, biomarkers, contact, countries, diseases, patients, symptoms
+from apis.routes import (
+    admin, analytics, auth, biomarkers, contact, countries, diseases, metrics, patients,
+    symptoms
+)
 from apis.config import (
-    AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY,
-    BUCKET_NAME, BIOMARKERS_RANGES_OBJECT, BIOMARKERS_RANGES_PATH,
-    FAST_API_HOST, FAST_API_PORT, STREAMLIT_BASE_URL,
-    SYMPTOM_WEIGHTS_OBJECT, SYMPTOM_WEIGHTS_PATH
+    API_WORKERS, FAST_API_HOST, FAST_API_PORT, LOG_LEVEL, METRICS_DIR, METRICS_WRITE_INTERVAL,
+    MODEL_OBJECTS, MODEL_RETRY_AFTER, PROFILE_DIR, PROFILE_INTERVAL, SLOW_REQUEST_SECONDS,
+    STREAMLIT_BASE_URL
+)
+
+from apis.db.database import Base, engine, upgrade_schema
+from apis.db.instrumentation import track_queries
+from apis.routes.admin import profiling_requested
+from apis.services.artifacts import fetch_artifact_store, sync_artifacts
+from apis.services.emails import load_templates, outbox_worker
+from apis.services.model import (
+    ModelBusyError, active_model, model_artifacts, model_executor, model_registry,
+    model_reloader
 )
+from apis.services.passwords import password_executor
+from apis.services.results import scoring_executor
+from apis.services.shadow import shadow_scorer
+from apis.tools.metrics import REGISTRY, MetricsWriter
+from apis.tools.profiling import RequestProfile, request_profile, startup_profile
+from apis.tools.timing import RequestTimings, request_timings
+
+logging.basicConfig(level=LOG_LEVEL,
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests by method, route, and status code.',
+    ('method', 'route', 'status'))
+
+HTTP_ERRORS = REGISTRY.counter(
+    'http_request_errors_total', 'Requests that failed with a server error by method and route.',
+    ('method', 'route'))
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by method and route.',
+    ('method', 'route'))
+
+HTTP_REQUEST_STATEMENTS = REGISTRY.histogram(
+    'http_request_db_statements', 'SQL statements executed per request by method and route.',
+    ('method', 'route'), buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'http_requests_in_flight', 'Requests being handled.')
+
+metrics_writer: MetricsWriter = MetricsWriter(REGISTRY, METRICS_WRITE_INTERVAL)
+
+
+prepared: bool = False
+
 
-from apis.db.database import Base, engine
+def prepare() -> None:
+    """Set up the database, templates, and model artifacts once per process tree."""
+    global prepared  # pylint: disable=global-statement
+    if prepared:
+        return
+    with startup_profile.phase('database'):
+        Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+    with startup_profile.phase('templates'):
+        load_templates()
+    with startup_profile.phase('artifacts'):
+        sync_artifacts(fetch_artifact_store(), {
+            **model_artifacts(),
+            **{key: model_registry.weights_paths[name] for name, key in MODEL_OBJECTS.items()}
+        })
+    prepared = True
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """Initialize the FastAPI application and set up the database."""
-    Base.metadata.create_all(bind=engine)
-
-    s3 = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY_ID,
-                      aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
-    s3.download_file(BUCKET_NAME, SYMPTOM_WEIGHTS_OBJECT,
-                     SYMPTOM_WEIGHTS_PATH)
-    s3.download_file(BUCKET_NAME, BIOMARKERS_RANGES_OBJECT,
-                     BIOMARKERS_RANGES_PATH)
+    prepare()
+    outbox_worker.start()
+    model_reloader.start()
+    metrics_writer.start()
+    startup_profile.log()
     yield
+    metrics_writer.stop()
+    scoring_executor.shutdown(wait=False, cancel_futures=True)
+    shadow_scorer.shutdown()
+    model_reloader.stop()
+    model_executor.shutdown()
+    password_executor.shutdown(wait=False, cancel_futures=True)
+    outbox_worker.stop()
 
 
 api = FastAPI(lifespan=lifespan)
@@ -41,14 +111,132 @@ def index() -> RedirectResponse:
     return RedirectResponse(url=STREAMLIT_BASE_URL)
 
 
+def observe_request(request: Request, status_code: int, timings: RequestTimings) -> None:
+    """Record the metrics of a finished request and log its phase timings."""
+    phases: dict[str, float] = timings.finish()
+    route = request.scope.get('route')
+    route_path: str = getattr(route, 'path', 'unmatched')
+    HTTP_REQUESTS.inc(request.method, route_path, str(status_code))
+    if status_code >= 500:
+        HTTP_ERRORS.inc(request.method, route_path)
+    HTTP_REQUEST_SECONDS.observe(phases['total'], request.method, route_path)
+    HTTP_REQUEST_STATEMENTS.observe(
+        timings.counts.get('db_statements', 0), request.method, route_path)
+    logger.log(
+        logging.WARNING if phases['total'] >= SLOW_REQUEST_SECONDS else logging.INFO,
+        'method=%s route=%s status=%d %s', request.method,
+        getattr(route, 'path', request.url.path), status_code,
+        ' '.join(f'{phase}_ms={seconds * 1000:.1f}' for phase, seconds in phases.items()),
+        extra={'timings': phases}
+    )
+
+
+@api.middleware('http')
+async def time_request(request: Request, call_next) -> Response:
+    """
+    Time the phases of a request and report them in the Server-Timing header, the request
+    metrics, and the log.
+
+    Requests slower than SLOW_REQUEST_SECONDS are logged as warnings, and so are requests
+    over their SQL statement budget or repeating a statement. Requests an admin asked to
+    profile are sampled and their profile ID is returned in the X-Profile-Id header.
+    """
+    timings: RequestTimings = RequestTimings()
+    token = request_timings.set(timings)
+    profile: RequestProfile | None = RequestProfile.claim(PROFILE_INTERVAL) \
+        if profiling_requested(request) else None
+    profile_token = request_profile.set(profile)
+    HTTP_IN_FLIGHT.inc()
+    with track_queries() as queries:
+        try:
+            response: Response = await call_next(request)
+        except Exception:
+            observe_request(request, 500, timings)
+            raise
+        finally:
+            request_timings.reset(token)
+            request_profile.reset(profile_token)
+            HTTP_IN_FLIGHT.dec()
+            if profile is not None:
+                profile.release()
+    observe_request(request, response.status_code, timings)
+    route: str = getattr(request.scope.get('route'), 'path', 'unmatched')
+    queries.report(route)
+    if profile is not None:
+        profile.save(PROFILE_DIR, route, timings.phases)
+        response.headers['X-Profile-Id'] = profile.id
+    response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+
+@api.exception_handler(ModelBusyError)
+def model_busy(_request: Request, _exc: ModelBusyError) -> JSONResponse:
+    """Ask the client to retry when the model queue is full."""
+    return JSONResponse(
+        status_code=503,
+        content={'detail': 'The model is busy. Please try again shortly.'},
+        headers={'Retry-After': str(MODEL_RETRY_AFTER)}
+    )
+
+
+api.include_router(admin.api_router)
+api.include_router(analytics.api_router)
 api.include_router(auth.api_router)
 api.include_router(biomarkers.api_router)
 api.include_router(contact.api_router)
 api.include_router(countries.api_router)
 api.include_router(diseases.api_router)
+api.include_router(metrics.api_router)
 api.include_router(patients.api_router)
 api.include_router(symptoms.api_router)
 
+startup_profile.mark('imports')
+
+
+def serve(workers: int = API_WORKERS) -> None:
+    """
+    Serve the API from one process, or from `workers` forked processes sharing a socket.
+
+    With several workers, the parent prepares the application and maps the compiled model
+    before forking, so the children share its pages instead of each loading a copy. Each
+    child writes its metrics to METRICS_DIR, so /metrics reports every worker whichever one
+    serves the scrape. The parent then forwards termination signals to the children and
+    waits for them.
+    """
+    config: uvicorn.Config = uvicorn.Config(
+        api, host=FAST_API_HOST, port=FAST_API_PORT, log_level='info')
+    if workers <= 1:
+        uvicorn.Server(config).run()
+        return
+    prepare()
+    with startup_profile.phase('model'):
+        active_model.get()
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    METRICS_DIR.mkdir(parents=True)
+    REGISTRY.share(METRICS_DIR)
+    sock = config.bind_socket()
+    children: list[int] = []
+    for _ in range(workers):
+        pid: int = os.fork()
+        if pid == 0:
+            engine.dispose(close=False)
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)  # pylint: disable=protected-access
+        children.append(pid)
+    sock.close()
+
+    def forward(signum: int, _frame) -> None:
+        for child in children:
+            try:
+                os.kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        os.waitpid(child, 0)
+
 
 if __name__ == '__main__':
-    uvicorn.run(api, host=FAST_API_HOST, port=FAST_API_PORT, log_level='info')
+    serve()
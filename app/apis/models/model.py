@@ -1,7 +1,10 @@
 """Encapsulate the database models for the FebriLogic backend."""
 from typing import List
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    JSON, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Table,
+    UniqueConstraint
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -34,11 +37,33 @@ class Disease(Base):
     name = Column(String, nullable=False, unique=True)
 
 
+class EmailOutbox(Base):
+    """Store emails waiting to be delivered by the outbox worker."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt_at',
+              'status', 'next_attempt_at'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sender = Column(String, nullable=False)
+    recipients = Column(JSON, nullable=False)
+    subject = Column(String, nullable=False)
+    html = Column(String, nullable=False)
+    status = Column(String, nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(String, nullable=True)
+    provider_id = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True),
+                        server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+
 patient_symptoms = Table(
     'patient_symptoms',
     Base.metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('patient_id', ForeignKey('patients.id'), nullable=False),
+    Column('patient_id', ForeignKey('patients.id'), nullable=False, index=True),
     Column('symptom_id', ForeignKey('symptoms.id'), nullable=True),
     Column('created_at', DateTime(timezone=True),
            server_default=func.now())
@@ -57,6 +82,8 @@ class Patient(Base):
     race = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True),
                         server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(),
+                        server_default=func.now(), onupdate=func.now(), index=True)
     country_id: Mapped[int] = mapped_column(
         ForeignKey('countries.id'),
         nullable=False
@@ -80,7 +107,7 @@ patient_biomarkers = Table(
     'patient_biomarkers',
     Base.metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('patient_id', ForeignKey('patients.id'), nullable=False),
+    Column('patient_id', ForeignKey('patients.id'), nullable=False, index=True),
     Column('biomarker_id', ForeignKey('biomarkers.id'), nullable=True),
     Column('value', Float, nullable=True),
     Column('created_at', DateTime(timezone=True),
@@ -92,13 +119,67 @@ patient_negative_diseases = Table(
     'patient_negative_diseases',
     Base.metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('patient_id', ForeignKey('patients.id'), nullable=False),
+    Column('patient_id', ForeignKey('patients.id'), nullable=False, index=True),
     Column('disease_id', ForeignKey('diseases.id'), nullable=True),
     Column('created_at', DateTime(timezone=True),
            server_default=func.now())
 )
 
 
+class PatientResult(Base):
+    """Store disease rankings computed from a snapshot of a patient's lab results."""
+    __tablename__ = 'patient_results'
+    __table_args__ = (
+        UniqueConstraint('patient_id', 'snapshot', 'model_version'),
+        Index('ix_patient_results_patient_id_created_at',
+              'patient_id', 'created_at'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    patient_id = Column(ForeignKey('patients.id'), nullable=False)
+    snapshot = Column(String, nullable=False)
+    model_version = Column(String, nullable=False)
+    negative_diseases = Column(JSON, nullable=False)
+    symptoms = Column(JSON, nullable=False)
+    biomarkers = Column(JSON, nullable=False)
+    results = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True),
+                        server_default=func.now())
+
+
+class AggregatedSnapshot(Base):
+    """Mark the lab snapshots whose ranking was added to the disease week aggregates."""
+    __tablename__ = 'aggregated_snapshots'
+    __table_args__ = (
+        UniqueConstraint('patient_id', 'snapshot'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    patient_id = Column(ForeignKey('patients.id'), nullable=False)
+    snapshot = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True),
+                        server_default=func.now())
+
+
+class DiseaseWeekAggregate(Base):
+    """
+    Store running totals of disease probabilities by country and week.
+
+    The first stored ranking of each lab snapshot with the default model adds its mean
+    probability of every disease to the row of the snapshot's country and the week its lab
+    results were submitted, so dashboards read totals instead of every ranking.
+    """
+    __tablename__ = 'disease_week_aggregates'
+    __table_args__ = (
+        UniqueConstraint('week', 'country_id', 'ranking', 'disease'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    week = Column(Date, nullable=False)
+    country_id = Column(ForeignKey('countries.id'), nullable=False)
+    ranking = Column(String, nullable=False)
+    disease = Column(String, nullable=False)
+    results = Column(Integer, nullable=False)
+    probability_sum = Column(Float, nullable=False)
+
+
 class Symptom(Base):
     """Stores patient symptoms in the database."""
     __tablename__ = 'symptoms'
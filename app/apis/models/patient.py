@@ -6,6 +6,16 @@ class PatientBiomarkersRequest(BaseModel):
     biomarker_value_unit: dict[str, tuple[float, str]]
 
 
+class PatientEncounterRequest(BaseModel):
+    """Represent a request to record negative diseases, symptoms, and biomarkers at once.
+
+    Sections left as None are not recorded, so the patient's latest results for them are kept.
+    """
+    negative_diseases: list[str] | None = None
+    symptom_names: list[str] | None = None
+    biomarker_value_unit: dict[str, tuple[float, str]] | None = None
+
+
 class PatientNegativeDiseasesRequest(BaseModel):
     """Represent a request to record negative diseases for a patient."""
     negative_diseases: list[str]
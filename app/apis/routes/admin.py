@@ -0,0 +1,124 @@
+"""Administer the model served by the API and profile requests."""
+import json
+from pathlib import Path
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import Path as PathParam
+from fastapi.responses import PlainTextResponse
+from starlette import status
+
+from apis.config import ADMIN_EMAILS, PROFILE_DIR
+from apis.routes.auth import get_current_user, verify_access_token
+from apis.services.model import (
+    ModelValidationError, UnknownModelError, active_model, model_registry, reload_model
+)
+from apis.tools.afi_model import CompiledModel
+from apis.tools.timing import TimedRoute
+
+api_router: APIRouter = APIRouter(
+    prefix='/api/admin',
+    tags=['admin'],
+    route_class=TimedRoute
+)
+
+
+def get_admin_user(
+    user: Annotated[dict[str, str | int], Depends(get_current_user)]
+) -> dict[str, str | int]:
+    """Allow only users listed in ADMIN_EMAILS."""
+    if user is None:
+        raise HTTPException(status_code=401,
+                            detail='Authentication failed')
+    if str(user['email']).lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403,
+                            detail='Not enough permissions to administer the API')
+    return user
+
+
+def model_info(model: CompiledModel) -> dict[str, Any]:
+    """Describe a compiled model."""
+    return {
+        'model_version': model.version,
+        'diseases': len(model.disease_names),
+        'symptoms': len(model.symptoms),
+        'biomarkers': len(model.biomarker_names),
+        'prior_countries': len(model.prior_countries),
+        'iterations': model.weights.shape[1]
+    }
+
+
+@api_router.get('/model')
+def get_model(_admin: Annotated[dict[str, str | int], Depends(get_admin_user)]) -> dict[str, Any]:
+    """Describe the active model."""
+    return model_info(active_model.get())
+
+
+@api_router.get('/models')
+def get_models(
+    _admin: Annotated[dict[str, str | int], Depends(get_admin_user)]
+) -> dict[str, Any]:
+    """Describe every configured model, loading it if needed."""
+    models: dict[str, Any] = {}
+    for name in model_registry.names():
+        try:
+            models[name] = model_info(model_registry.get(name))
+        except (OSError, UnknownModelError, ModelValidationError) as exc:
+            models[name] = {'error': str(exc)}
+    return {'models': models}
+
+
+@api_router.post('/model/reload')
+def reload(_admin: Annotated[dict[str, str | int], Depends(get_admin_user)]) -> dict[str, Any]:
+    """Fetch the model artifacts and activate them if they changed and are valid."""
+    try:
+        reloaded: bool = reload_model()
+    except ModelValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=str(exc)) from exc
+    return {'reloaded': reloaded, **model_info(active_model.get())}
+
+
+def profiling_requested(request: Request) -> bool:
+    """Check whether an admin asked for the request to be profiled with X-Profile or ?profile."""
+    if request.headers.get('X-Profile') not in ('1', 'true') and \
+            request.query_params.get('profile') not in ('1', 'true'):
+        return False
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    try:
+        user: dict[str, str | int] = verify_access_token(token)
+    except HTTPException:
+        return False
+    return str(user['email']).lower() in ADMIN_EMAILS
+
+
+def profile_path(profile_id: str, suffix: str) -> Path:
+    """Get a file of a saved request profile, raising 404 if it does not exist."""
+    path: Path = PROFILE_DIR / f'{profile_id}{suffix}'
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return path
+
+
+ProfileId = Annotated[str, PathParam(pattern='^[0-9a-f]{32}$')]
+
+
+@api_router.get('/profiles/{profile_id}')
+def get_profile(
+    profile_id: ProfileId,
+    _admin: Annotated[dict[str, str | int], Depends(get_admin_user)]
+) -> dict[str, Any]:
+    """Get the phases, top allocation sites, and anonymized model inputs of a profiled request."""
+    with open(profile_path(profile_id, '.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+
+@api_router.get('/profiles/{profile_id}/stacks', response_class=PlainTextResponse)
+def get_profile_stacks(
+    profile_id: ProfileId,
+    _admin: Annotated[dict[str, str | int], Depends(get_admin_user)]
+) -> str:
+    """Get the sampled stacks of a profiled request in the collapsed flamegraph format."""
+    return profile_path(profile_id, '.folded').read_text(encoding='utf-8')
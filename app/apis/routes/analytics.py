@@ -0,0 +1,47 @@
+"""Report what the model predicts across the patient population."""
+from datetime import date, datetime, timedelta, timezone
+from typing import Annotated, Any, Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from apis.db.analytics import get_disease_trends, week_start
+from apis.db.database import get_db
+from apis.db.instrumentation import query_budget
+from apis.routes.admin import get_admin_user
+from apis.tools.timing import TimedRoute
+
+api_router: APIRouter = APIRouter(
+    prefix='/api/analytics',
+    tags=['analytics'],
+    route_class=TimedRoute
+)
+
+
+@api_router.get('/diseases', dependencies=[Depends(query_budget(2))])
+def disease_trends(
+    _admin: Annotated[dict[str, str | int], Depends(get_admin_user)],
+    db: Session = Depends(get_db),
+    weeks: int = Query(default=12, ge=1, le=520),
+    country_id: int | None = None,
+    ranking: Literal['symptoms', 'biomarkers'] | None = None
+) -> dict[str, Any]:
+    """
+    Get the mean probability of every disease by country and week over the last weeks.
+
+    Means are read from totals maintained as rankings are stored, so the cost depends on
+    the number of weeks, countries, and diseases, not on the number of encounters.
+    """
+    since: date = week_start(datetime.now(timezone.utc)) - timedelta(weeks=weeks - 1)
+    return {
+        'since': since,
+        'trends': [{
+            'week': row.week,
+            'country_id': row.country_id,
+            'country': row.common_name,
+            'ranking': row.ranking,
+            'disease': row.disease,
+            'results': row.results,
+            'mean': row.probability_sum / row.results
+        } for row in get_disease_trends(db, since, country_id, ranking)]
+    }
@@ -3,13 +3,10 @@ from datetime import datetime, timedelta
 from typing import Annotated
 from uuid import uuid4
 
-import resend
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jinja2 import Template
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from starlette import status
 from sqlalchemy.orm import Session
 
@@ -17,14 +14,12 @@ from sqlalchemy.orm import Session
 from apis.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     ALGORITHM,
-    FAST_API_PORT,
-    PASSWORD_RESET_EMAIL_TEMPLATE,
-    RENDER_EXTERNAL_HOST,
-    RESEND_API_KEY,
-    RESEND_MAX_RETRIES,
+    LOGIN_MAX_ATTEMPTS_PER_EMAIL,
+    LOGIN_MAX_ATTEMPTS_PER_IP,
+    LOGIN_THROTTLE_WINDOW,
     SECRET_KEY,
     STREAMLIT_BASE_URL,
-    VERIFICATION_EMAIL_TEMPLATE
+    TOKEN_CACHE_SIZE
 )
 
 from apis.db.database import get_db
@@ -33,49 +28,80 @@ from apis.models.model import User
 from apis.models.user import (
     ChangePasswordForm, PasswordResetRequest, ResetPasswordForm, Token, UserRequest
 )
-
-resend.api_key = RESEND_API_KEY
+from apis.services.emails import queue_password_reset_email, queue_verification_email
+from apis.services.passwords import hash_password, submit_hash, submit_verify, verify_password
+from apis.services.throttle import LoginThrottle
+from apis.services.tokens import TokenCache
+from apis.tools.timing import TimedRoute, timed
 
 api_router: APIRouter = APIRouter(
     prefix='/auth',
     tags=['auth'],
+    route_class=TimedRoute
 )
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='token')
 
-bcrypt_context: CryptContext = CryptContext(schemes=['bcrypt'],
-                                            deprecated='auto')
+ip_throttle: LoginThrottle = LoginThrottle(
+    'ip', LOGIN_MAX_ATTEMPTS_PER_IP, LOGIN_THROTTLE_WINDOW)
+
+email_throttle: LoginThrottle = LoginThrottle(
+    'email', LOGIN_MAX_ATTEMPTS_PER_EMAIL, LOGIN_THROTTLE_WINDOW)
+
+token_cache: TokenCache = TokenCache(TOKEN_CACHE_SIZE)
 
 
 @api_router.post('/token', response_model=Token)
 async def login_for_access_token(
+        request: Request,
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
         db: Session = Depends(get_db)):
     """Authenticate user and return access token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    client: str = request.client.host if request.client else 'unknown'
+    email: str = form_data.username.strip().lower()
+    retry_after: int = max(ip_throttle.hit(client), email_throttle.hit(email))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Too many login attempts. Please try again later.',
+            headers={'Retry-After': str(retry_after)}
+        )
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Incorrect email or password',
         )
+    # Only failed attempts count towards the address limit, so staff sharing one NAT or
+    # proxy address are never locked out by their own successful logins.
+    ip_throttle.release(client)
     if not user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='User is not verified',
         )
+    email_throttle.reset(email)
     token = create_access_token(user.email, user.id, timedelta(
         minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
 
     return {'access_token': token, 'token_type': 'bearer'}
 
 
-def authenticate_user(db: Session, email: str, password: str) -> User | None:
-    """Check if the user exists and the password is correct."""
+async def authenticate_user(db: Session, email: str, password: str) -> User | None:
+    """
+    Check if the user exists and the password is correct.
+
+    A password hashed with a different bcrypt cost than configured is rehashed.
+    """
     user = db.query(User).filter(User.email == email).first()
     if not user:
         return None
-    if not bcrypt_context.verify(password, user.hashed_password):
+    valid, new_hash = await verify_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
     return user
 
 
@@ -88,7 +114,16 @@ def create_access_token(email: str, user_id: int, expires_delta: timedelta | Non
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
-    """Get the current user from the access token."""
+    """Get the current user from the access token, reusing the claims of verified tokens."""
+    with timed('auth'):
+        return verify_access_token(token)
+
+
+def verify_access_token(token: str) -> dict[str, str | int]:
+    """Get the user of an access token, raising 401 when it is invalid."""
+    user: dict[str, str | int] | None = token_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get('sub')
@@ -98,7 +133,10 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail='Could not validate user',
             )
-        return {'email': email, 'id': user_id}
+        user = {'email': email, 'id': user_id}
+        if payload.get('exp') is not None:
+            token_cache.put(token, user, float(payload['exp']))
+        return dict(user)
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -108,7 +146,6 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
 
 @api_router.post('/', status_code=status.HTTP_201_CREATED)
 async def create_user(user_request: UserRequest,
-                      background_tasks: BackgroundTasks,
                       db: Session = Depends(get_db)):
     """Create a new user in the database."""
     existing_user = db.query(User).filter(
@@ -122,19 +159,17 @@ async def create_user(user_request: UserRequest,
         verification_code: str = str(uuid4())
         user_model = User(
             email=user_request.email,
-            hashed_password=bcrypt_context.hash(user_request.password),
+            hashed_password=await hash_password(user_request.password),
             is_verified=False,
             verification_code=verification_code
         )
         db.add(user_model)
-        db.commit()
-        background_tasks.add_task(send_verification_email(to_email=user_request.email,
-                                                          verification_code=verification_code))
+        queue_verification_email(db, to_email=user_request.email,
+                                 verification_code=verification_code)
     if existing_user and not existing_user.is_verified:
         verification_code: str = existing_user.verification_code
-        background_tasks.add_task(send_verification_email(
-            to_email=user_request.email, verification_code=verification_code
-        ))
+        queue_verification_email(db, to_email=user_request.email,
+                                 verification_code=verification_code)
     return {
         'message': f'Verification link sent to your email: {user_request.email}'
     }
@@ -158,7 +193,6 @@ def verify_user(verification_code: str, db: Session = Depends(get_db)) -> dict[s
 
 @api_router.post('/request-password-reset')
 def request_password_reset(request: PasswordResetRequest,
-                           background_tasks: BackgroundTasks,
                            db: Session = Depends(get_db)) -> None:
     """Request a password reset for a user."""
     email: str = request.email.strip().lower()
@@ -167,8 +201,7 @@ def request_password_reset(request: PasswordResetRequest,
         exp = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         to_encode = {'sub': email, 'exp': exp}
         token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        background_tasks.add_task(send_password_reset_email,
-                                  email=email, token=token)
+        queue_password_reset_email(db, email=email, token=token)
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -188,7 +221,7 @@ def reset_password(form: ResetPasswordForm, db: Session = Depends(get_db)) -> No
                 detail='Invalid token'
             )
         db.query(User).filter(User.email == email).update(
-            {'hashed_password': bcrypt_context.hash(form.new_password)}
+            {'hashed_password': submit_hash(form.new_password).result()}
         )
         db.commit()
     except jwt.ExpiredSignatureError as exc:
@@ -207,65 +240,12 @@ def change_password(form: ChangePasswordForm,
     user = db.query(User).filter(
         User.id == user['id']
     ).first()
-    if not bcrypt_context.verify(form.current_password, user.hashed_password):
+    valid, _new_hash = submit_verify(form.current_password, user.hashed_password).result()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Incorrect current password'
         )
-    user.hashed_password = bcrypt_context.hash(form.new_password)
+    user.hashed_password = submit_hash(form.new_password).result()
     db.add(user)
     db.commit()
-
-
-def send_password_reset_email(*, email: str, token: str) -> None:
-    """Send a password reset email to the user."""
-    with open(PASSWORD_RESET_EMAIL_TEMPLATE, encoding='utf-8') as file:
-        template = Template(file.read())
-    html = template.render(
-        reset_link=f'{STREAMLIT_BASE_URL}/reset-password?token={token}',
-        current_year=datetime.now().year
-    )
-    params: resend.Emails.SendParams = {
-        'from': 'FebriLogic <recovery@febrilogic.com>',
-        'to': [email],
-        'subject': 'Password Reset',
-        'html': html
-    }
-    for _i in range(RESEND_MAX_RETRIES):
-        email: resend.Email = resend.Emails.send(params)
-        if email and 'id' in email:
-            return {
-                'message': f"Password reset email with ID {email['id']} sent"
-            }
-    raise HTTPException(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        detail=f'Failed to send password reset email after {RESEND_MAX_RETRIES} attempts'
-    )
-
-
-def send_verification_email(*, to_email: str, verification_code: str) -> None:
-    """Send a verification email to the user."""
-    with open(VERIFICATION_EMAIL_TEMPLATE, encoding='utf-8') as file:
-        template = Template(file.read())
-    if RENDER_EXTERNAL_HOST is None:
-        html = template.render(
-            verification_url=f'http://localhost:{FAST_API_PORT}/auth/verify/{verification_code}')
-    else:
-        html = template.render(
-            verification_url=f'{RENDER_EXTERNAL_HOST}/auth/verify/{verification_code}')
-    params: resend.Emails.SendParams = {
-        'from': 'FebriLogic <verify@febrilogic.com>',
-        'to': [to_email],
-        'subject': 'Verify your email',
-        'html': html
-    }
-    for _i in range(RESEND_MAX_RETRIES):
-        email: resend.Email = resend.Emails.send(params)
-        if email and 'id' in email:
-            return {
-                'message': f"Verification email {email['id']} sent to {to_email}"
-            }
-    raise HTTPException(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        detail=f'Failed to send verification email to {to_email} after {RESEND_MAX_RETRIES} attempts'
-    )
@@ -5,11 +5,13 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from apis.routes.auth import get_current_user
 from apis.services.biomarkers import fetch_biomarkers, fetch_biomarker_units
+from apis.tools.timing import TimedRoute
 
 
 api_router: APIRouter = APIRouter(
     prefix='/api/biomarkers',
-    tags=['biomarkers']
+    tags=['biomarkers'],
+    route_class=TimedRoute
 )
 
 
@@ -5,10 +5,12 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from apis.services.countries import fetch_countries
 from apis.routes.auth import get_current_user
+from apis.tools.timing import TimedRoute
 
 api_router: APIRouter = APIRouter(
     prefix='/api/countries',
-    tags=['countries']
+    tags=['countries'],
+    route_class=TimedRoute
 )
 
 
@@ -6,10 +6,12 @@ from fastapi import APIRouter, Depends, HTTPException
 from apis.routes.auth import get_current_user
 from apis.models.model import Disease
 from apis.services.diseases import fetch_diseases
+from apis.tools.timing import TimedRoute
 
 api_router: APIRouter = APIRouter(
     prefix='/api/diseases',
-    tags=['diseases']
+    tags=['diseases'],
+    route_class=TimedRoute
 )
 
 
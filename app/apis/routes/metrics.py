@@ -0,0 +1,58 @@
+"""Expose application metrics for scraping."""
+import os
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from apis.services.biomarkers import (
+    fetch_biomarker_catalog, fetch_biomarker_units, fetch_biomarkers
+)
+from apis.services.countries import fetch_countries
+from apis.services.diseases import fetch_diseases
+from apis.services.emails import fetch_template
+from apis.services.results import SCORING_REQUESTS
+from apis.services.symptoms import fetch_symptom_categories
+from apis.services.tokens import TOKEN_CACHE_REQUESTS
+from apis.tools.memory import memory_attribution, memory_usage
+from apis.tools.metrics import REGISTRY, LabelValues
+from apis.tools.timing import TimedRoute
+
+api_router: APIRouter = APIRouter(
+    prefix='/metrics',
+    tags=['metrics'],
+    route_class=TimedRoute
+)
+
+CACHED_FUNCTIONS = (
+    fetch_biomarker_catalog, fetch_biomarker_units, fetch_biomarkers, fetch_countries,
+    fetch_diseases, fetch_symptom_categories, fetch_template
+)
+
+
+def cache_hit_ratios() -> dict[LabelValues, float]:
+    """Get the fraction of lookups served from each cache that has been used."""
+    lookups: dict[str, tuple[float, float]] = {
+        'access_tokens': (TOKEN_CACHE_REQUESTS.get('hit'), TOKEN_CACHE_REQUESTS.get('miss')),
+        'results': (SCORING_REQUESTS.get('stored') + SCORING_REQUESTS.get('coalesced'),
+                    SCORING_REQUESTS.get('computed')),
+        **{function.__name__: function.cache_info()[:2] for function in CACHED_FUNCTIONS}
+    }
+    return {(cache,): hits / (hits + misses)
+            for cache, (hits, misses) in lookups.items() if hits + misses}
+
+
+REGISTRY.gauge('cache_hit_ratio', 'Fraction of lookups served from each cache.',
+               ('cache',), callback=cache_hit_ratios)
+
+REGISTRY.gauge('process_resident_memory_bytes', 'Resident memory of the API process.',
+               callback=lambda: memory_usage(os.getpid()).get('rss', 0))
+
+REGISTRY.gauge('process_memory_bytes',
+               'Memory of the API process and its children by kind (rss, pss, shared, private).',
+               ('pid', 'role', 'kind'), callback=memory_attribution)
+
+
+@api_router.get('', response_class=PlainTextResponse)
+def get_metrics() -> str:
+    """Render the metrics in the Prometheus text format."""
+    return REGISTRY.render()
@@ -1,31 +1,111 @@
 """Insert, update, and retrieve patient information."""
-from typing import Annotated, Any
+import io
+from datetime import datetime, timezone
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from pandas import DataFrame
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette import status
 from sqlalchemy.orm import Session
 
-from apis.db.database import get_db
-from apis.db.patients import get_latest_lab_results
+from apis.config import MC_MODE, PATIENT_PAGE_SIZE
+from apis.db.database import SessionLocal, get_db
+from apis.db.instrumentation import query_budget
+from apis.db.patients import get_lab_snapshot, list_patients
+from apis.db.results import get_patient_results_history
 from apis.models.biomarker import BiomarkerInfo
 from apis.models.model import (
     Patient, patient_biomarkers, patient_negative_diseases, patient_symptoms
 )
 from apis.models.patient import (
-    PatientBiomarkersRequest, PatientNegativeDiseasesRequest, PatientRequest, PatientSymptomsRequest
+    PatientBiomarkersRequest, PatientEncounterRequest, PatientNegativeDiseasesRequest,
+    PatientRequest, PatientSymptomsRequest
 )
 from apis.routes.auth import get_current_user
-from apis.services.biomarkers import fetch_biomarker_stats, fetch_biomarker_catalog
+from apis.services.biomarkers import fetch_biomarker_catalog
 from apis.services.diseases import fetch_diseases
+from apis.services.exports import export_patients
+from apis.services.imports import import_patients
+from apis.services.model import DEFAULT_MODEL, model_registry, scoring_version
+from apis.services.results import (
+    etag_matches, precompute_patient_result, result_etag, result_summary, score_patient
+)
 from apis.services.symptoms import fetch_symptom_ids
-from apis.tools.afi_model import calculate_mean_confidence_intervals
+from apis.tools.timing import TimedRoute
 
 api_router: APIRouter = APIRouter(
-    prefix='/api/patients'
+    prefix='/api/patients',
+    route_class=TimedRoute
 )
 
 
+def negative_disease_rows(patient_id: int, negative_diseases: list[str],
+                          diseases: dict[str, int],
+                          created_at: datetime | None = None) -> list[dict[str, Any]]:
+    """Build rows for the patient_negative_diseases table."""
+    disease_names: set[str] = set(negative_diseases)
+    data: list[dict[str, Any]] = [
+        {'patient_id': patient_id, 'disease_id': id_}
+        for name, id_ in diseases.items()
+        if name in disease_names
+    ]
+    if not data:
+        data.append({
+            'patient_id': patient_id,
+            'disease_id': None
+        })
+    if created_at is not None:
+        for row in data:
+            row['created_at'] = created_at
+    return data
+
+
+def symptom_rows(patient_id: int, symptom_ids: list[int],
+                 created_at: datetime | None = None) -> list[dict[str, Any]]:
+    """Build rows for the patient_symptoms table."""
+    data: list[dict[str, Any]] = [
+        {'patient_id': patient_id, 'symptom_id': sid}
+        for sid in symptom_ids
+    ]
+    if not data:
+        data.append({
+            'patient_id': patient_id,
+            'symptom_id': None
+        })
+    if created_at is not None:
+        for row in data:
+            row['created_at'] = created_at
+    return data
+
+
+def biomarker_rows(patient_id: int,
+                   biomarker_value_unit: dict[str, tuple[float, str]],
+                   catalog: dict[str, BiomarkerInfo],
+                   created_at: datetime | None = None) -> list[dict[str, Any]]:
+    """Build rows for the patient_biomarkers table with values in standard units."""
+    data: list[dict[str, Any]] = []
+    for biomarker, (value, unit) in biomarker_value_unit.items():
+        info: BiomarkerInfo | None = catalog.get(biomarker)
+        known: bool = info is not None and unit in info.units
+        data.append(
+            {
+                'patient_id': patient_id,
+                'biomarker_id': info.id if known else None,
+                'value': value * (info.units[unit] if known else 1.0)
+            }
+        )
+    if not data:
+        data.append({
+            'patient_id': patient_id,
+            'biomarker_id': None,
+            'value': None
+        })
+    if created_at is not None:
+        for row in data:
+            row['created_at'] = created_at
+    return data
+
+
 @api_router.post('')
 def upload_patient_data(patient_request: PatientRequest,
                         user: Annotated[dict[str, str | int], Depends(get_current_user)],
@@ -51,41 +131,76 @@ def upload_patient_data(patient_request: PatientRequest,
     }
 
 
-@api_router.get('')
+@api_router.get('', dependencies=[Depends(query_budget(2))])
 def get_patient_info(user: Annotated[dict[str, str | int], Depends(get_current_user)],
-                     db: Session = Depends(get_db)) -> dict[str, list[dict[str, Any]]]:
-    """Get patient information based on the authenticated user."""
+                     db: Session = Depends(get_db),
+                     after: int = Query(default=0, ge=0),
+                     limit: int = Query(default=PATIENT_PAGE_SIZE, ge=1, le=500),
+                     search: str = Query(default='', max_length=100),
+                     updated_since: datetime | None = None) -> dict[str, Any]:
+    """
+    Get a page of the authenticated user's patients, optionally searched or changed since a time.
+
+    Pass `next_after` back as `after` for the next page; it is None on the last page. A client
+    keeping a local list can pass the latest `updated_at` it has seen as `updated_since` to
+    fetch only patients added or changed since; the bound is inclusive, so merge by ID.
+    """
     if user is None:
         raise HTTPException(status_code=401,
                             detail='Authentication failed')
-    patient_number = func.row_number().over(
-        partition_by=Patient.user_id,
-        order_by=Patient.id
-    ).label('patient_number')
-
-    user_patients = (
-        db.query(Patient, patient_number)
-        .filter(Patient.user_id == user['id'])
-        .all()
-    )
-
-    patients: list[dict[str, Any]] = []
-
-    for patient, number in user_patients:
-        patients.append({
-            'patient_number': number,
-            'age': patient.age,
-            'city': patient.city,
-            'country_id': patient.country_id,
-            'id': patient.id,
-            'race': patient.race,
-            'sex': patient.sex
-        })
+    rows = list_patients(int(user['id']), db, limit + 1, after, search, updated_since)
+    patients: list[dict[str, Any]] = [{
+        'patient_number': row.patient_number,
+        'age': row.age,
+        'city': row.city,
+        'country_id': row.country_id,
+        'id': row.id,
+        'race': row.race,
+        'sex': row.sex,
+        'updated_at': row.updated_at
+    } for row in rows[:limit]]
     return {
-        'patients': patients
+        'patients': patients,
+        'next_after': patients[-1]['id'] if len(rows) > limit else None
     }
 
 
+@api_router.post('/import')
+def import_patient_data(file: UploadFile,
+                        user: Annotated[dict[str, str | int], Depends(get_current_user)],
+                        db: Session = Depends(get_db),
+                        file_format: Literal['csv', 'ndjson'] | None = None) -> dict[str, Any]:
+    """Bulk import patients and their lab results from a CSV or NDJSON file."""
+    if user is None:
+        raise HTTPException(status_code=401,
+                            detail='Authentication failed')
+    if file_format is None:
+        file_format = 'csv' if (file.filename or '').lower().endswith('.csv') else 'ndjson'
+    stream = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+    return import_patients(stream, file_format, int(user['id']), db)
+
+
+@api_router.get('/export')
+def export_patient_data(user: Annotated[dict[str, str | int], Depends(get_current_user)],
+                        file_format: Literal['csv', 'ndjson'] = 'ndjson',
+                        include_scores: bool = False) -> StreamingResponse:
+    """Stream the lab history of the user's patients with one row per encounter."""
+    if user is None:
+        raise HTTPException(status_code=401,
+                            detail='Authentication failed')
+
+    def stream():
+        with SessionLocal() as db:
+            yield from export_patients(int(user['id']), db, file_format, include_scores)
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/csv' if file_format == 'csv' else 'application/x-ndjson',
+        headers={
+            'Content-Disposition': f'attachment; filename=patients.{file_format}'}
+    )
+
+
 @api_router.post('/{patient_id}')
 def update_patient_info(patient_id: int,
                         patient_request: PatientRequest,
@@ -130,23 +245,8 @@ def upload_patient_negative_diseases(
             status_code=403,
             detail='Not enough permissions to add negative diseases for this patient'
         )
-    disease_names: set[str] = set(request.negative_diseases)
-    diseases: dict[str, int] = fetch_diseases()
-    disease_ids: list[int] = [
-        id_ for name, id_ in diseases.items()
-        if name in disease_names
-    ]
-    data: list[dict[str, Any]] = []
-    for disease_id in disease_ids:
-        data.append({
-            'patient_id': patient_id,
-            'disease_id': disease_id
-        })
-    if not data:
-        data.append({
-            'patient_id': patient_id,
-            'disease_id': None
-        })
+    data: list[dict[str, Any]] = negative_disease_rows(
+        patient_id, request.negative_diseases, fetch_diseases())
     db.execute(patient_negative_diseases.insert(), data)
     db.commit()
     return {
@@ -175,15 +275,7 @@ def upload_patient_symptoms(patient_id: int, symptom_request: PatientSymptomsReq
         symptoms[name] for name in symptom_names
         if name in symptoms
     ]
-    data: list[dict[str, int | None]] = [
-        {'patient_id': patient_id, 'symptom_id': sid}
-        for sid in symptom_ids
-    ]
-    if not data:
-        data.append({
-            'patient_id': patient_id,
-            'symptom_id': None
-        })
+    data: list[dict[str, Any]] = symptom_rows(patient_id, symptom_ids)
     db.execute(patient_symptoms.insert(), data)
     db.commit()
     return {
@@ -213,80 +305,142 @@ def upload_patient_biomarkers(
         raise HTTPException(status_code=403,
                             detail='Not enough permissions to add biomarkers for this patient')
 
-    biomarker_value_unit: dict[str, tuple[float, str]
-                               ] = request.biomarker_value_unit
-    pairs: list[tuple[str, str]] = [
-        (abbrev, unit) for abbrev, (_, unit) in request.biomarker_value_unit.items()
-    ]
-    biomarker_ids: dict[str, int] = {a: catalog[a].id for a, u in pairs
-                                     if a in catalog and u in catalog[a].units}
-    biomarker_factors: dict[str, float] = {a: catalog[a].units[u]
-                                           for a, u in pairs
-                                           if a in catalog and u in catalog[a].units}
-    data: list[dict[str, Any]] = []
-    for biomarker, (value, _) in biomarker_value_unit.items():
-        data.append(
-            {
-                'patient_id': patient_id,
-                'biomarker_id': biomarker_ids.get(biomarker),
-                'value': value * biomarker_factors.get(biomarker, 1.0)
-            }
-        )
-    if not data:
-        data.append({
-            'patient_id': patient_id,
-            'biomarker_id': None,
-            'value': None
-        })
+    data: list[dict[str, Any]] = biomarker_rows(
+        patient_id, request.biomarker_value_unit, catalog)
     db.execute(patient_biomarkers.insert(), data)
     db.commit()
+    precompute_patient_result(patient_id, db)
     return {
         'patient_id': patient_id,
         'message': 'Patient biomarkers uploaded successfully'
     }
 
 
-@api_router.get('/{patient_id}/calculate')
-def calculate(patient_id: int, user: Annotated[dict[str, str | int], Depends(get_current_user)],
-              biomarker_df: Annotated[DataFrame, Depends(fetch_biomarker_stats)],
-              db: Session = Depends(get_db)) -> dict[str, Any]:
-    """Calculate disease probabilities based on patient symptoms and biomarkers."""
+@api_router.post('/{patient_id}/encounter', dependencies=[Depends(query_budget(16))])
+def upload_patient_encounter(
+    patient_id: int,
+    request: PatientEncounterRequest,
+    user: Annotated[dict[str, str | int], Depends(get_current_user)],
+    http_response: Response,
+    db: Session = Depends(get_db),
+    symptoms: dict[str, int] = Depends(fetch_symptom_ids),
+    catalog: dict[str, BiomarkerInfo] = Depends(fetch_biomarker_catalog),
+    rank: bool = Query(default=False, alias='calculate')
+) -> dict[str, Any]:
+    """Upload negative diseases, symptoms, and biomarkers in a single transaction."""
     if user is None:
-        raise HTTPException(status_code=401, detail='Authentication failed')
+        raise HTTPException(status_code=401,
+                            detail='Authentication failed')
 
     patient: Patient | None = db.query(Patient).filter(Patient.id == patient_id,
                                                        Patient.user_id == user['id']).first()
     if not patient:
         raise HTTPException(status_code=403,
-                            detail='Not enough permissions to access this patient')
+                            detail='Not enough permissions to add lab results for this patient')
+
+    created_at: datetime = datetime.now(timezone.utc)
+    diseases: dict[str, int] = fetch_diseases()
+    negative_diseases: list[str] | None = None
+    positive_symptoms: list[str] | None = None
+    biomarker_row: dict[str, float] | None = None
+    if request.negative_diseases is not None:
+        negative_names: set[str] = set(request.negative_diseases)
+        negative_diseases = [
+            name for name in diseases if name in negative_names]
+        db.execute(patient_negative_diseases.insert(), negative_disease_rows(
+            patient_id, request.negative_diseases, diseases, created_at))
+    if request.symptom_names is not None:
+        positive_symptoms = [
+            name for name in request.symptom_names if name in symptoms]
+        db.execute(patient_symptoms.insert(), symptom_rows(
+            patient_id, [symptoms[name] for name in positive_symptoms], created_at))
+    if request.biomarker_value_unit is not None:
+        biomarker_data: list[dict[str, Any]] = biomarker_rows(
+            patient_id, request.biomarker_value_unit, catalog, created_at)
+        biomarker_row = {
+            abbreviation: row['value']
+            for abbreviation, row in zip(request.biomarker_value_unit, biomarker_data)
+            if row['biomarker_id'] is not None
+        }
+        db.execute(patient_biomarkers.insert(), biomarker_data)
+    db.commit()
+
+    response: dict[str, Any] = {
+        'message': 'Patient encounter uploaded successfully',
+        'patient_id': patient_id,
+        'created_at': created_at.isoformat()
+    }
+    if rank:
+        response.update(score_patient(patient_id, db, negative_diseases,
+                                      positive_symptoms, biomarker_row))
+        set_result_etag(http_response, result_etag(
+            DEFAULT_MODEL, response['snapshot'], response['model_version']))
+    else:
+        precompute_patient_result(patient_id, db)
+    return response
+
 
-    lab_results: dict[str, Any] = get_latest_lab_results(
-        patient_id=patient_id, db=db)
+def set_result_etag(response: Response, etag: str) -> None:
+    """Tag a ranking response so clients revalidate it with If-None-Match."""
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
 
-    negative_diseases: list[str] = lab_results.get('negative_diseases', [])
-    print(f'Negative diseases: {negative_diseases}')
 
-    positive_symptoms: list[str] = lab_results.get('symptoms', [])
-    print(f'Positive symptoms: {positive_symptoms}')
+@api_router.get('/{patient_id}/calculate', dependencies=[Depends(query_budget(14))],
+                response_model=None)
+def calculate(patient_id: int, user: Annotated[dict[str, str | int], Depends(get_current_user)],
+              response: Response,
+              db: Session = Depends(get_db),
+              model: str = Query(default=DEFAULT_MODEL),
+              mc_mode: Literal['fast', 'full'] = MC_MODE,
+              if_none_match: Annotated[str | None, Header()] = None) -> dict[str, Any] | Response:
+    """
+    Calculate disease probabilities based on patient symptoms and biomarkers.
+
+    `mc_mode=fast` stops drawing Monte Carlo samples once the ranking and confidence
+    intervals are stable, and `mc_mode=full` uses every draw, as reports do. The number of
+    draws used is returned in `mc_draws`.
+
+    The response carries an ETag for the lab snapshot and model version it was ranked from.
+    A request whose If-None-Match still matches gets 304 Not Modified without a ranking.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication failed')
+
+    if model not in model_registry.names():
+        raise HTTPException(status_code=404, detail=f'Model {model} not found')
 
-    biomarker_result = lab_results.get('biomarkers', {})
-    print(f'Biomarker results: {biomarker_result}')
+    patient: Patient | None = db.query(Patient).filter(Patient.id == patient_id,
+                                                       Patient.user_id == user['id']).first()
+    if not patient:
+        raise HTTPException(status_code=403,
+                            detail='Not enough permissions to access this patient')
 
-    biomarker_row: dict[str, float] = {
-        row.abbreviation: row.value for row in biomarker_result}
+    snapshot: str = get_lab_snapshot(patient_id, db)
+    if if_none_match:
+        etag: str = result_etag(
+            model, snapshot, scoring_version(model_registry.get(model).version, mc_mode))
+        if etag_matches(if_none_match, etag):
+            not_modified: Response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+            set_result_etag(not_modified, etag)
+            return not_modified
 
-    print(biomarker_row)
+    ranking: dict[str, Any] = score_patient(patient_id, db, model_name=model,
+                                            snapshot=snapshot, mc_mode=mc_mode)
+    set_result_etag(response, result_etag(model, ranking['snapshot'], ranking['model_version']))
+    return ranking
 
-    results = calculate_mean_confidence_intervals(
-        negative_diseases=negative_diseases,
-        patient_symptoms=positive_symptoms,
-        patient_biomarkers=biomarker_row,
-        biomarker_stats_df=biomarker_df
-    )
 
+@api_router.get('/{patient_id}/results', dependencies=[Depends(query_budget(2))])
+def get_patient_results(patient_id: int,
+                        user: Annotated[dict[str, str | int], Depends(get_current_user)],
+                        db: Session = Depends(get_db),
+                        limit: int = Query(default=20, ge=1, le=100)) -> dict[str, Any]:
+    """Get previously computed disease rankings for a patient, newest first."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication failed')
+    results = get_patient_results_history(patient_id, int(user['id']), db, limit)
     return {
-        'negative_diseases': negative_diseases,
-        'symptoms': positive_symptoms,
-        'biomarkers': biomarker_row,
-        'results': results
+        'patient_id': patient_id,
+        'results': [result_summary(result) for result in results]
     }
@@ -5,10 +5,12 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from apis.routes.auth import get_current_user
 from apis.services.symptoms import fetch_symptom_categories
+from apis.tools.timing import TimedRoute
 
 api_router: APIRouter = APIRouter(
     prefix='/api/symptoms',
-    tags=['symptoms']
+    tags=['symptoms'],
+    route_class=TimedRoute
 )
 
 
@@ -0,0 +1,132 @@
+"""Download model artifacts from an object store into the local artifact cache."""
+import hashlib
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from apis.config import (
+    ARTIFACT_DIR, ARTIFACT_STORE, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, BUCKET_NAME
+)
+
+
+class ArtifactStore(ABC):
+    """Remote location the model artifacts are downloaded from."""
+
+    @abstractmethod
+    def etag(self, name: str) -> str:
+        """Get the entity tag of an artifact, which changes whenever its content does."""
+
+    @abstractmethod
+    def download(self, name: str, path: Path) -> None:
+        """Download an artifact to a local path."""
+
+
+class S3ArtifactStore(ArtifactStore):
+    """Artifacts stored as objects of an S3 bucket."""
+
+    def __init__(self, bucket: str, access_key_id: str | None,
+                 secret_access_key: str | None) -> None:
+        import boto3
+
+        self.bucket: str = bucket
+        self.client = boto3.client('s3', aws_access_key_id=access_key_id,
+                                   aws_secret_access_key=secret_access_key)
+
+    def etag(self, name: str) -> str:
+        return self.client.head_object(Bucket=self.bucket, Key=name)['ETag'].strip('"')
+
+    def download(self, name: str, path: Path) -> None:
+        self.client.download_file(self.bucket, name, str(path))
+
+
+class FileSystemArtifactStore(ArtifactStore):
+    """Artifacts stored as files of a local directory, for offline and test runs."""
+
+    def __init__(self, root: Path) -> None:
+        self.root: Path = root
+
+    def etag(self, name: str) -> str:
+        return file_md5(self.root / name)
+
+    def download(self, name: str, path: Path) -> None:
+        shutil.copyfile(self.root / name, path)
+
+
+def fetch_artifact_store() -> ArtifactStore:
+    """Get the configured artifact store."""
+    if ARTIFACT_STORE == 'filesystem':
+        return FileSystemArtifactStore(ARTIFACT_DIR)
+    return S3ArtifactStore(BUCKET_NAME, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)
+
+
+def file_md5(path: Path) -> str:
+    """Get the MD5 hex digest of a file, which is the ETag of a single-part S3 upload."""
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_cached(path: Path, etag: str) -> bool:
+    """
+    Check whether the local copy of an artifact matches the remote entity tag.
+
+    Multipart uploads have ETags that are not the MD5 of the content, so the ETag seen at
+    download time is kept next to the artifact together with the MD5 of the copy.
+    """
+    if not path.exists():
+        return False
+    md5: str = file_md5(path)
+    if md5 == etag:
+        return True
+    marker: Path = path.with_name(f'{path.name}.etag')
+    if not marker.exists():
+        return False
+    cached: dict[str, str] = json.loads(marker.read_text(encoding='utf-8'))
+    return cached.get('etag') == etag and cached.get('md5') == md5
+
+
+def stage_artifact(store: ArtifactStore, name: str, path: Path) -> tuple[Path, str] | None:
+    """
+    Download an artifact next to its local copy unless that copy is current.
+
+    Returns the staged file and its entity tag, to be activated once it has been checked.
+    """
+    etag: str = store.etag(name)
+    if is_cached(path, etag):
+        return None
+    staged: Path = path.with_name(f'{path.name}.part')
+    store.download(name, staged)
+    return staged, etag
+
+
+def activate_artifact(staged: Path, etag: str, path: Path) -> None:
+    """Move a staged artifact into place and remember its entity tag."""
+    os.replace(staged, path)
+    path.with_name(f'{path.name}.etag').write_text(
+        json.dumps({'etag': etag, 'md5': file_md5(path)}), encoding='utf-8')
+
+
+def stage_artifacts(store: ArtifactStore,
+                    artifacts: dict[str, Path]) -> dict[str, tuple[Path, str]]:
+    """Stage the artifacts that changed, in parallel, keyed by name."""
+    with ThreadPoolExecutor(max_workers=max(1, len(artifacts)),
+                            thread_name_prefix='artifacts') as executor:
+        futures = {
+            name: executor.submit(stage_artifact, store, name, path)
+            for name, path in artifacts.items()
+        }
+        staged = {name: future.result() for name, future in futures.items()}
+    return {name: result for name, result in staged.items() if result is not None}
+
+
+def sync_artifacts(store: ArtifactStore, artifacts: dict[str, Path]) -> list[str]:
+    """Download the artifacts that changed and return their names."""
+    staged: dict[str, tuple[Path, str]] = stage_artifacts(store, artifacts)
+    for name, (path, etag) in staged.items():
+        activate_artifact(path, etag, artifacts[name])
+    return list(staged)
@@ -1,20 +1,25 @@
 """Service to handle biomarker statistics."""
+from __future__ import annotations
+
 from collections import defaultdict
 from functools import lru_cache
-
-import pandas as pd
-from pandas import DataFrame
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from apis.config import BIOMARKERS_RANGES_PATH
 from apis.db.database import SessionLocal
 from apis.models.model import Biomarker, biomarker_units, Unit
 from apis.models.biomarker import BiomarkerInfo
 
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
-@lru_cache(maxsize=1)
-def fetch_biomarker_stats() -> DataFrame:
-    """Get cached biomarker statistics dataframe."""
-    biomarker_df: DataFrame = pd.read_csv(BIOMARKERS_RANGES_PATH)
+
+def fetch_biomarker_stats(path: Path = BIOMARKERS_RANGES_PATH) -> DataFrame:
+    """Read the biomarker statistics dataframe."""
+    import pandas as pd
+
+    biomarker_df: DataFrame = pd.read_csv(path)
     biomarker_df['disease'] = biomarker_df['disease'].astype(str).str.strip()
     return biomarker_df
 
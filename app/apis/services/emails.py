@@ -0,0 +1,322 @@
+"""Queue emails in the outbox table and deliver them from a background worker."""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any
+
+import resend
+from jinja2 import Template
+from sqlalchemy.orm import Session
+
+from apis.config import (
+    EMAIL_BACKOFF_MAX_SECONDS, EMAIL_BACKOFF_SECONDS, EMAIL_BATCH_SIZE,
+    EMAIL_CIRCUIT_RESET_SECONDS, EMAIL_CIRCUIT_THRESHOLD, EMAIL_POLL_INTERVAL,
+    EMAIL_RETENTION_DAYS, EMAIL_SENDER, FAST_API_PORT, PASSWORD_RESET_EMAIL_TEMPLATE,
+    RENDER_EXTERNAL_HOST, RESEND_API_KEY, RESEND_MAX_RETRIES, STREAMLIT_BASE_URL,
+    SUPPORT_REQUEST_TEMPLATE, VERIFICATION_EMAIL_TEMPLATE
+)
+from apis.db.database import SessionLocal
+from apis.models.contact import ContactRequest
+from apis.models.model import EmailOutbox
+from apis.tools.metrics import REGISTRY
+
+resend.api_key = RESEND_API_KEY
+
+logger = logging.getLogger(__name__)
+
+EMAILS_DELIVERED = REGISTRY.counter(
+    'emails_delivered_total', 'Outbox delivery attempts by outcome.', ('outcome',))
+
+
+PURGE_INTERVAL_SECONDS: float = 3600
+
+
+class EmailDeliveryError(Exception):
+    """Raised when the email provider does not accept a message."""
+
+
+@lru_cache(maxsize=None)
+def fetch_template(path: Path) -> Template:
+    """Get an email template, compiled on first use."""
+    with open(path, encoding='utf-8') as file:
+        return Template(file.read())
+
+
+def load_templates() -> None:
+    """Compile every email template ahead of the first request."""
+    for path in (PASSWORD_RESET_EMAIL_TEMPLATE, SUPPORT_REQUEST_TEMPLATE,
+                 VERIFICATION_EMAIL_TEMPLATE):
+        fetch_template(path)
+
+
+class ResendSender:
+    """Deliver emails through the Resend API."""
+
+    def send(self, params: dict[str, Any]) -> str:
+        """Send an email and return the provider's ID for it."""
+        email: resend.Email = resend.Emails.send(params)
+        if not email or 'id' not in email:
+            raise EmailDeliveryError('Resend did not return an email ID')
+        return email['id']
+
+
+class FakeSender:
+    """Keep emails in memory instead of delivering them, for local runs and tests."""
+
+    def __init__(self) -> None:
+        self.sent: list[dict[str, Any]] = []
+        self.failures: int = 0
+
+    def fail_next(self, count: int = 1) -> None:
+        """Make the next `count` sends fail."""
+        self.failures = count
+
+    def send(self, params: dict[str, Any]) -> str:
+        """Record an email and return a fake ID for it."""
+        if self.failures > 0:
+            self.failures -= 1
+            raise EmailDeliveryError('Simulated delivery failure')
+        self.sent.append(params)
+        return f'fake-{len(self.sent)}'
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing provider for a while.
+
+    After `threshold` consecutive failures the circuit opens and calls are refused for
+    `reset_after` seconds. Then a single trial call is let through, and other callers are
+    refused until it is recorded. Its success closes the circuit and its failure opens it
+    again.
+    """
+
+    def __init__(self, threshold: int, reset_after: float) -> None:
+        self.threshold: int = threshold
+        self.reset_after: float = reset_after
+        self.failures: int = 0
+        self.opened_at: float | None = None
+        self.trial: bool = False
+        self.lock: Lock = Lock()
+
+    def is_open(self) -> bool:
+        """Check whether calls are refused, without taking the trial call."""
+        with self.lock:
+            return self.opened_at is not None and (
+                self.trial or time.monotonic() - self.opened_at < self.reset_after)
+
+    def allow(self) -> bool:
+        """Check whether a call may be made, taking the trial call of a half-open circuit."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit at the threshold."""
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class OutboxWorker:
+    """
+    Deliver pending outbox emails in batches on a background thread.
+
+    A failed email is retried with exponential backoff until it has been attempted
+    `max_attempts` times, after which it is marked as failed. Rows are claimed with
+    SKIP LOCKED where the database supports it, so several API processes can drain the
+    same outbox without sending an email twice.
+
+    The body of a sent or failed email is cleared, since it may hold a live link such as
+    a password reset token, and the row itself is deleted once it is older than
+    `retention`.
+    """
+
+    def __init__(self, sender: ResendSender | FakeSender, breaker: CircuitBreaker,
+                 batch_size: int, poll_interval: float, max_attempts: int,
+                 backoff: float, backoff_max: float,
+                 retention: timedelta = timedelta(days=30)) -> None:
+        self.sender: ResendSender | FakeSender = sender
+        self.breaker: CircuitBreaker = breaker
+        self.batch_size: int = batch_size
+        self.poll_interval: float = poll_interval
+        self.max_attempts: int = max_attempts
+        self.backoff: float = backoff
+        self.backoff_max: float = backoff_max
+        self.retention: timedelta = retention
+        self.purged_at: float | None = None
+        self.wakeup: Event = Event()
+        self.stopping: Event = Event()
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        """Start draining the outbox."""
+        self.stopping.clear()
+        self.thread = Thread(target=self.run, name='email-outbox', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop draining the outbox, letting the current batch finish."""
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def wake(self) -> None:
+        """Drain the outbox now instead of at the next poll."""
+        self.wakeup.set()
+
+    def run(self) -> None:
+        """Drain the outbox until stopped."""
+        while not self.stopping.is_set():
+            try:
+                drained: int = self.drain()
+                if self.purged_at is None or \
+                        time.monotonic() - self.purged_at >= PURGE_INTERVAL_SECONDS:
+                    self.purge()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('Failed to drain the email outbox')
+                drained = 0
+            if drained < self.batch_size:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        """Get the backoff before the next attempt of an email."""
+        return timedelta(seconds=min(self.backoff_max, self.backoff * 2 ** (attempts - 1)))
+
+    def purge(self) -> int:
+        """Delete sent and failed emails older than the retention and return how many."""
+        self.purged_at = time.monotonic()
+        with SessionLocal() as db:
+            purged: int = db.query(EmailOutbox).filter(
+                EmailOutbox.status.in_(('sent', 'failed')),
+                EmailOutbox.created_at < datetime.now(timezone.utc) - self.retention
+            ).delete(synchronize_session=False)
+            db.commit()
+        return purged
+
+    def drain(self) -> int:
+        """Attempt one batch of due emails and return how many were attempted."""
+        if self.breaker.is_open():
+            return 0
+        attempted: int = 0
+        with SessionLocal() as db:
+            now: datetime = datetime.now(timezone.utc)
+            emails: list[EmailOutbox] = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            for email in emails:
+                if not self.breaker.allow():
+                    break
+                attempted += 1
+                email.attempts += 1
+                try:
+                    email.provider_id = self.sender.send({
+                        'from': email.sender,
+                        'to': email.recipients,
+                        'subject': email.subject,
+                        'html': email.html
+                    })
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    self.breaker.record_failure()
+                    email.last_error = str(exc)[:1000]
+                    if email.attempts >= self.max_attempts:
+                        email.status = 'failed'
+                        email.html = ''
+                        EMAILS_DELIVERED.inc('failed')
+                    else:
+                        email.next_attempt_at = now + self.retry_delay(email.attempts)
+                        EMAILS_DELIVERED.inc('retried')
+                    continue
+                self.breaker.record_success()
+                email.status = 'sent'
+                email.html = ''
+                email.sent_at = datetime.now(timezone.utc)
+                EMAILS_DELIVERED.inc('sent')
+            db.commit()
+        return attempted
+
+
+outbox_worker: OutboxWorker = OutboxWorker(
+    sender=FakeSender() if EMAIL_SENDER == 'fake' else ResendSender(),
+    breaker=CircuitBreaker(EMAIL_CIRCUIT_THRESHOLD, EMAIL_CIRCUIT_RESET_SECONDS),
+    batch_size=EMAIL_BATCH_SIZE,
+    poll_interval=EMAIL_POLL_INTERVAL,
+    max_attempts=RESEND_MAX_RETRIES,
+    backoff=EMAIL_BACKOFF_SECONDS,
+    backoff_max=EMAIL_BACKOFF_MAX_SECONDS,
+    retention=timedelta(days=EMAIL_RETENTION_DAYS)
+)
+
+
+def queue_email(db: Session, sender: str, recipients: list[str], subject: str,
+                html: str) -> None:
+    """Add an email to the outbox, committing it with any pending changes of the session."""
+    db.add(EmailOutbox(
+        sender=sender,
+        recipients=recipients,
+        subject=subject,
+        html=html,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc)
+    ))
+    db.commit()
+    outbox_worker.wake()
+
+
+def queue_verification_email(db: Session, to_email: str, verification_code: str) -> None:
+    """Queue a verification email to the user."""
+    if RENDER_EXTERNAL_HOST is None:
+        verification_url = f'http://localhost:{FAST_API_PORT}/auth/verify/{verification_code}'
+    else:
+        verification_url = f'{RENDER_EXTERNAL_HOST}/auth/verify/{verification_code}'
+    html: str = fetch_template(VERIFICATION_EMAIL_TEMPLATE).render(
+        verification_url=verification_url)
+    queue_email(db, 'FebriLogic <verify@febrilogic.com>', [to_email],
+                'Verify your email', html)
+
+
+def queue_password_reset_email(db: Session, email: str, token: str) -> None:
+    """Queue a password reset email to the user."""
+    html: str = fetch_template(PASSWORD_RESET_EMAIL_TEMPLATE).render(
+        reset_link=f'{STREAMLIT_BASE_URL}/reset-password?token={token}',
+        current_year=datetime.now().year
+    )
+    queue_email(db, 'FebriLogic <recovery@febrilogic.com>', [email],
+                'Password Reset', html)
+
+
+def queue_support_request_email(db: Session, contact_request: ContactRequest) -> None:
+    """Queue a contact request email to the support team."""
+    html: str = fetch_template(SUPPORT_REQUEST_TEMPLATE).render(
+        name=contact_request.name,
+        email=contact_request.email,
+        message=contact_request.message,
+        current_year=datetime.now().year
+    )
+    queue_email(db, 'FebriLogic <noreply@febrilogic.com>',
+                ['FebriLogic Support <support@febrilogic.com>'],
+                contact_request.subject, html)
@@ -0,0 +1,158 @@
+"""Stream patient lab history as one row per encounter."""
+import csv
+import io
+import json
+from itertools import chain, groupby
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from apis.config import EXPORT_BATCH_SIZE
+from apis.models.model import (
+    Biomarker, Disease, Patient, Symptom,
+    patient_biomarkers, patient_negative_diseases, patient_symptoms
+)
+from apis.services.biomarkers import fetch_biomarkers
+from apis.services.imports import LIST_SEPARATOR, chunked
+from apis.services.model import active_model, model_executor
+from apis.tools.afi_model import CompiledModel
+
+PATIENT_FIELDS: list[str] = [
+    'patient_id', 'patient_number', 'age', 'sex', 'race', 'city', 'country_id', 'created_at'
+]
+
+SCORE_FIELDS: list[str] = [
+    'symptoms_top1', 'symptoms_top2', 'symptoms_top3',
+    'biomarkers_top1', 'biomarkers_top2', 'biomarkers_top3'
+]
+
+
+def iter_encounters(user_id: int, db: Session) -> Iterator[dict[str, Any]]:
+    """
+    Yield the lab snapshot of every encounter of the user's patients.
+
+    An encounter is a distinct submission time of negative diseases, symptoms, or biomarkers.
+    Sections not submitted at that time carry over from the patient's previous encounter,
+    so each row holds the inputs the model would have scored at that point.
+    """
+    events = union_all(
+        select(patient_negative_diseases.c.patient_id, patient_negative_diseases.c.created_at,
+               literal('negative_diseases').label('kind'), Disease.name.label('name'),
+               null().label('value'))
+        .outerjoin(Disease, Disease.id == patient_negative_diseases.c.disease_id),
+        select(patient_symptoms.c.patient_id, patient_symptoms.c.created_at,
+               literal('symptoms').label('kind'), Symptom.name.label('name'),
+               null().label('value'))
+        .outerjoin(Symptom, Symptom.id == patient_symptoms.c.symptom_id),
+        select(patient_biomarkers.c.patient_id, patient_biomarkers.c.created_at,
+               literal('biomarkers').label('kind'), Biomarker.abbreviation.label('name'),
+               patient_biomarkers.c.value)
+        .outerjoin(Biomarker, Biomarker.id == patient_biomarkers.c.biomarker_id)
+    ).subquery()
+    patients = (
+        select(Patient.id, Patient.age, Patient.sex, Patient.race, Patient.city,
+               Patient.country_id,
+               func.row_number().over(order_by=Patient.id).label('patient_number'))
+        .where(Patient.user_id == user_id)
+        .subquery()
+    )
+    statement = (
+        select(patients, events.c.created_at, events.c.kind, events.c.name, events.c.value)
+        .join(events, events.c.patient_id == patients.c.id)
+        .order_by(patients.c.id, events.c.created_at)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    rows = db.execute(statement)
+    for _patient_id, patient_rows in groupby(rows, key=lambda row: row.id):
+        first = next(patient_rows)
+        patient: dict[str, Any] = {
+            'patient_id': first.id,
+            'patient_number': first.patient_number,
+            'age': first.age,
+            'sex': first.sex,
+            'race': first.race,
+            'city': first.city,
+            'country_id': first.country_id
+        }
+        snapshot: dict[str, Any] = {
+            'negative_diseases': [],
+            'symptoms': [],
+            'biomarkers': {}
+        }
+        for created_at, encounter_rows in groupby(chain([first], patient_rows),
+                                                  key=lambda row: row.created_at):
+            submitted: dict[str, Any] = {}
+            for row in encounter_rows:
+                if row.kind == 'biomarkers':
+                    values: dict[str, float] = submitted.setdefault(row.kind, {})
+                    if row.name is not None:
+                        values[row.name] = row.value
+                else:
+                    names: list[str] = submitted.setdefault(row.kind, [])
+                    if row.name is not None:
+                        names.append(row.name)
+            snapshot.update(submitted)
+            yield {
+                **patient,
+                'created_at': created_at.isoformat() if created_at else None,
+                'negative_diseases': list(snapshot['negative_diseases']),
+                'symptoms': list(snapshot['symptoms']),
+                'biomarkers': dict(snapshot['biomarkers'])
+            }
+
+
+def score_encounters(encounters: Iterable[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    """
+    Yield batches of encounters with the top-ranked diseases of each layer added, scored
+    with every Monte Carlo draw since exports serve as reports.
+    """
+    model: CompiledModel = active_model.get()
+    for batch in chunked(encounters, EXPORT_BATCH_SIZE):
+        scored = model_executor.run_batch(
+            model, [(encounter['negative_diseases'], encounter['symptoms'],
+                     encounter['biomarkers'], encounter['country_id']) for encounter in batch],
+            block=True, mc_mode='full')
+        for encounter, (results, _model_version) in zip(batch, scored):
+            encounter.update({field: results.get(field) for field in SCORE_FIELDS})
+        yield batch
+
+
+def export_patients(user_id: int, db: Session, file_format: str,
+                    include_scores: bool = False) -> Iterator[str]:
+    """Yield the user's encounters as NDJSON or CSV text in bounded batches."""
+    encounters = iter_encounters(user_id, db)
+    batches = score_encounters(encounters) if include_scores \
+        else chunked(encounters, EXPORT_BATCH_SIZE)
+    if file_format == 'ndjson':
+        for batch in batches:
+            yield ''.join(json.dumps(encounter) + '\n' for encounter in batch)
+        return
+
+    biomarkers: list[dict[str, str]] = sorted(
+        fetch_biomarkers(), key=lambda biomarker: biomarker['abbreviation'])
+    header: list[str] = PATIENT_FIELDS + ['negative_diseases', 'symptom_names']
+    for biomarker in biomarkers:
+        header += [biomarker['abbreviation'], f"{biomarker['abbreviation']}_unit"]
+    if include_scores:
+        header += SCORE_FIELDS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for batch in batches:
+        for encounter in batch:
+            line: list[Any] = [encounter[field] for field in PATIENT_FIELDS]
+            line += [LIST_SEPARATOR.join(encounter['negative_diseases']),
+                     LIST_SEPARATOR.join(encounter['symptoms'])]
+            for biomarker in biomarkers:
+                value: float | None = encounter['biomarkers'].get(
+                    biomarker['abbreviation'])
+                line += [value, biomarker['standard_unit'] if value is not None else None]
+            if include_scores:
+                line += [encounter[field] for field in SCORE_FIELDS]
+            writer.writerow(line)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,356 @@
+"""Bulk import patients and their lab results from CSV or NDJSON files."""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Iterable, Iterator, TextIO
+
+import numpy as np
+from sqlalchemy import Table, insert, select, text
+from sqlalchemy.orm import Session
+
+from apis.config import IMPORT_CHUNK_SIZE, IMPORT_MAX_ERRORS
+from apis.db.database import SessionLocal
+from apis.models.biomarker import BiomarkerInfo
+from apis.models.model import (
+    Patient, User, patient_biomarkers, patient_negative_diseases, patient_symptoms
+)
+from apis.services.biomarkers import fetch_biomarker_catalog
+from apis.services.countries import fetch_countries
+from apis.services.diseases import fetch_diseases
+from apis.services.symptoms import fetch_symptom_ids
+
+PATIENT_COLUMNS: tuple[str, ...] = (
+    'id', 'age', 'city', 'country_id', 'race', 'sex', 'user_id', 'created_at'
+)
+
+LIST_SEPARATOR: str = ';'
+
+# Key of the records standing in for unparseable lines, which no real field can collide with.
+PARSE_ERROR: str = '__error__'
+
+
+def parse_csv(stream: TextIO) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Yield (line number, record) pairs from a CSV file.
+
+    Negative diseases and symptoms are separated by semicolons, and each biomarker is stored
+    in a column named after its abbreviation with the unit in a `<abbreviation>_unit` column.
+    Any other columns are ignored.
+    """
+    reader = csv.DictReader(stream)
+    fields: set[str] = {
+        'age', 'city', 'country_id', 'race', 'sex', 'created_at',
+        'negative_diseases', 'symptom_names'
+    }
+    columns: set[str] = set(reader.fieldnames or [])
+    biomarker_columns: list[str] = [
+        column for column in reader.fieldnames or []
+        if f'{column}_unit' in columns
+    ]
+    for row in reader:
+        biomarker_value_unit: dict[str, tuple[str, str]] = {
+            abbreviation: (row[abbreviation], row.get(f'{abbreviation}_unit') or '')
+            for abbreviation in biomarker_columns
+            if (row.get(abbreviation) or '').strip()
+        }
+        record: dict[str, Any] = {field: row.get(field) for field in fields}
+        record['negative_diseases'] = [
+            name.strip() for name in (row.get('negative_diseases') or '').split(LIST_SEPARATOR)
+            if name.strip()
+        ]
+        record['symptom_names'] = [
+            name.strip() for name in (row.get('symptom_names') or '').split(LIST_SEPARATOR)
+            if name.strip()
+        ]
+        record['biomarker_value_unit'] = biomarker_value_unit
+        yield reader.line_num, record
+
+
+def parse_ndjson(stream: TextIO) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield (line number, record) pairs from a newline-delimited JSON file."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = {PARSE_ERROR: f'Invalid JSON: {e.msg}'}
+        if not isinstance(record, dict):
+            record = {PARSE_ERROR: 'Expected a JSON object'}
+        yield line_number, record
+
+
+def chunked(records: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Split an iterable into lists of at most `size` items."""
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class PatientImporter:
+    """Validate and write patient records in bounded chunks."""
+
+    def __init__(self, db: Session, user_id: int, chunk_size: int = IMPORT_CHUNK_SIZE,
+                 max_errors: int = IMPORT_MAX_ERRORS) -> None:
+        import pandas as pd
+
+        self.db: Session = db
+        self.user_id: int = user_id
+        self.chunk_size: int = chunk_size
+        self.max_errors: int = max_errors
+        self.use_copy: bool = db.get_bind().dialect.name == 'postgresql'
+        self.diseases: dict[str, int] = fetch_diseases()
+        self.symptoms: dict[str, int] = fetch_symptom_ids()
+        self.country_ids: set[int] = {
+            int(country['id']) for country in fetch_countries()}
+        catalog: dict[str, BiomarkerInfo] = fetch_biomarker_catalog()
+        self.biomarker_ids: dict[str, int] = {
+            abbreviation: info.id for abbreviation, info in catalog.items()}
+        self.factors: pd.Series = pd.Series({
+            (abbreviation, unit): factor
+            for abbreviation, info in catalog.items()
+            for unit, factor in info.units.items()
+        }, dtype=float)
+        self.imported: int = 0
+        self.failed: int = 0
+        self.errors: list[dict[str, Any]] = []
+
+    def run(self, records: Iterable[tuple[int, dict[str, Any]]]) -> dict[str, Any]:
+        """Import all records and return a summary with per-row errors."""
+        for chunk in chunked(records, self.chunk_size):
+            self.import_chunk(chunk)
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors
+        }
+
+    def report(self, line_number: int, error: str) -> None:
+        """Record a failed row, keeping at most `max_errors` messages."""
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'error': error})
+
+    def validate(self, line_number: int, record: dict[str, Any]) -> dict[str, Any] | None:
+        """Return a normalized record, or None after reporting why it is invalid."""
+        if PARSE_ERROR in record:
+            self.report(line_number, record[PARSE_ERROR])
+            return None
+        try:
+            age = int(record.get('age'))
+            country_id = int(record.get('country_id'))
+        except (TypeError, ValueError):
+            self.report(line_number, 'Age and country_id must be integers')
+            return None
+        sex: str = str(record.get('sex') or '').strip()
+        if not sex:
+            self.report(line_number, 'Sex is required')
+            return None
+        if country_id not in self.country_ids:
+            self.report(line_number, f'Unknown country_id {country_id}')
+            return None
+        try:
+            created_at = datetime.fromisoformat(record['created_at']) \
+                if record.get('created_at') else datetime.now(timezone.utc)
+        except (TypeError, ValueError):
+            self.report(line_number, 'created_at must be an ISO 8601 timestamp')
+            return None
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        negative_diseases: Any = record.get('negative_diseases') or []
+        symptom_names: Any = record.get('symptom_names') or []
+        if not all(isinstance(names, list) and all(isinstance(name, str) for name in names)
+                   for names in (negative_diseases, symptom_names)):
+            self.report(line_number, 'Negative diseases and symptoms must be lists of names')
+            return None
+        biomarker_value_unit: Any = record.get('biomarker_value_unit') or {}
+        if not isinstance(biomarker_value_unit, dict):
+            self.report(line_number, 'Biomarkers must map abbreviations to [value, unit] pairs')
+            return None
+        unknown: list[str] = [
+            name for name in negative_diseases if name not in self.diseases
+        ] + [name for name in symptom_names if name not in self.symptoms]
+        unknown += [name for name in biomarker_value_unit
+                    if name not in self.biomarker_ids]
+        if unknown:
+            self.report(line_number, f"Unknown names: {', '.join(unknown)}")
+            return None
+        try:
+            biomarkers: list[tuple[str, float, str]] = [
+                (abbreviation, float(value), str(unit).strip())
+                for abbreviation, (value, unit) in biomarker_value_unit.items()
+            ]
+        except (TypeError, ValueError):
+            self.report(line_number, 'Biomarker values must be [value, unit] pairs')
+            return None
+        return {
+            'line': line_number,
+            'age': age,
+            'city': record.get('city') or None,
+            'country_id': country_id,
+            'race': record.get('race') or None,
+            'sex': sex,
+            'created_at': created_at,
+            'disease_ids': [self.diseases[name] for name in negative_diseases],
+            'symptom_ids': [self.symptoms[name] for name in symptom_names],
+            'biomarkers': biomarkers
+        }
+
+    def convert_units(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Convert every biomarker in the chunk to its standard unit in one vectorized pass."""
+        import pandas as pd
+
+        positions: list[int] = []
+        keys: list[tuple[str, str]] = []
+        values: list[float] = []
+        for position, row in enumerate(rows):
+            for abbreviation, value, unit in row['biomarkers']:
+                positions.append(position)
+                keys.append((abbreviation, unit))
+                values.append(value)
+        if not keys:
+            return rows
+        factors: np.ndarray = self.factors.reindex(
+            pd.MultiIndex.from_tuples(keys)).to_numpy()
+        converted: np.ndarray = np.asarray(values, dtype=float) * factors
+        invalid: set[int] = set()
+        for position in np.asarray(positions)[np.isnan(factors)]:
+            invalid.add(int(position))
+        for row in rows:
+            row['biomarkers'] = []
+        for position, (abbreviation, _unit), value in zip(positions, keys, converted):
+            rows[position]['biomarkers'].append(
+                (self.biomarker_ids[abbreviation], float(value)))
+        for position in sorted(invalid):
+            self.report(rows[position]['line'], 'Unknown biomarker unit')
+        return [row for position, row in enumerate(rows) if position not in invalid]
+
+    def import_chunk(self, chunk: list[tuple[int, dict[str, Any]]]) -> None:
+        """Validate, convert, and write a chunk of records in one transaction."""
+        rows: list[dict[str, Any]] = [
+            row for row in (self.validate(line_number, record) for line_number, record in chunk)
+            if row is not None
+        ]
+        rows = self.convert_units(rows)
+        if not rows:
+            return
+        try:
+            patient_ids: list[int] = self.insert_patients(rows)
+            diseases: list[tuple[Any, ...]] = []
+            symptoms: list[tuple[Any, ...]] = []
+            biomarkers: list[tuple[Any, ...]] = []
+            for patient_id, row in zip(patient_ids, rows):
+                created_at: datetime = row['created_at']
+                diseases.extend((patient_id, disease_id, created_at)
+                                for disease_id in row['disease_ids'] or [None])
+                symptoms.extend((patient_id, symptom_id, created_at)
+                                for symptom_id in row['symptom_ids'] or [None])
+                biomarkers.extend((patient_id, biomarker_id, value, created_at)
+                                  for biomarker_id, value in row['biomarkers'] or [(None, None)])
+            self.write(patient_negative_diseases,
+                       ('patient_id', 'disease_id', 'created_at'), diseases)
+            self.write(patient_symptoms,
+                       ('patient_id', 'symptom_id', 'created_at'), symptoms)
+            self.write(patient_biomarkers,
+                       ('patient_id', 'biomarker_id', 'value', 'created_at'), biomarkers)
+            self.db.commit()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self.db.rollback()
+            for row in rows:
+                self.report(row['line'], f'Database error: {e.__class__.__name__}')
+            return
+        self.imported += len(rows)
+
+    def insert_patients(self, rows: list[dict[str, Any]]) -> list[int]:
+        """Insert the patients of a chunk and return their IDs in input order."""
+        if self.use_copy:
+            patient_ids: list[int] = list(self.db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('patients', 'id')) "
+                     'FROM generate_series(1, :n)'),
+                {'n': len(rows)}
+            ).scalars())
+            self.write(Patient.__table__, PATIENT_COLUMNS, [
+                (patient_id, row['age'], row['city'], row['country_id'], row['race'],
+                 row['sex'], self.user_id, row['created_at'])
+                for patient_id, row in zip(patient_ids, rows)
+            ])
+            return patient_ids
+        return list(self.db.execute(
+            insert(Patient).returning(
+                Patient.id, sort_by_parameter_order=True),
+            [
+                {
+                    'age': row['age'],
+                    'city': row['city'],
+                    'country_id': row['country_id'],
+                    'race': row['race'],
+                    'sex': row['sex'],
+                    'user_id': self.user_id,
+                    'created_at': row['created_at']
+                }
+                for row in rows
+            ]
+        ).scalars())
+
+    def write(self, table: Table, columns: tuple[str, ...], rows: list[tuple[Any, ...]]) -> None:
+        """Write rows with Postgres COPY, falling back to a batched executemany."""
+        if not rows:
+            return
+        if not self.use_copy:
+            self.db.execute(table.insert(), [
+                dict(zip(columns, row)) for row in rows])
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ])
+        buffer.seek(0)
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+
+def import_patients(stream: TextIO, file_format: str, user_id: int, db: Session) -> dict[str, Any]:
+    """Import patients from a CSV or NDJSON text stream for the given user."""
+    records = parse_csv(stream) if file_format == 'csv' else parse_ndjson(stream)
+    return PatientImporter(db, user_id).run(records)
+
+
+def main() -> None:
+    """Import patients from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Bulk import patients and their lab results.')
+    parser.add_argument('path', help='CSV or NDJSON file to import')
+    parser.add_argument('--email', required=True,
+                        help='Email of the user who owns the imported patients')
+    parser.add_argument('--format', choices=['csv', 'ndjson'],
+                        help='File format (defaults to the file extension)')
+    args = parser.parse_args()
+    file_format: str = args.format or (
+        'csv' if args.path.lower().endswith('.csv') else 'ndjson')
+    with SessionLocal() as db:
+        user_id: int | None = db.execute(
+            select(User.id).where(User.email == args.email)).scalar_one_or_none()
+        if user_id is None:
+            parser.error(f'User with email {args.email} not found')
+        with open(args.path, encoding='utf-8-sig', newline='') as stream:
+            summary: dict[str, Any] = import_patients(
+                stream, file_format, user_id, db)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,626 @@
+"""Load, reload, and run the disease ranking model on a bounded pool of workers."""
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Lock, Semaphore, Thread
+from typing import Any
+
+import numpy as np
+
+from apis.config import (
+    BASE_DIR, BIOMARKERS_RANGES_OBJECT, BIOMARKERS_RANGES_PATH, COMPILED_MODEL_DIR,
+    COUNTRY_PRIORS_OBJECT, COUNTRY_PRIORS_PATH, MC_FAST_MIN_DRAWS, MC_FAST_TOLERANCE, MC_MODE,
+    MC_SEED, MODEL_CACHE_SIZE, MODEL_EXECUTOR, MODEL_OBJECTS, MODEL_QUEUE_SIZE,
+    MODEL_RELOAD_INTERVAL, MODEL_WORKERS, SYMPTOM_WEIGHTS_OBJECT, SYMPTOM_WEIGHTS_PATH
+)
+from apis.services.artifacts import (
+    ArtifactStore, activate_artifact, fetch_artifact_store, stage_artifacts
+)
+from apis.services.biomarkers import fetch_biomarker_stats
+from apis.services.countries import fetch_countries
+from apis.tools.afi_model import (
+    CompiledModel, calculate_mean_confidence_intervals, compile_model, country_log_prior,
+    load_compiled_model, load_country_priors, save_compiled_model
+)
+from apis.tools.metrics import REGISTRY
+from apis.tools.profiling import RequestProfile, request_profile
+from apis.tools.timing import record
+
+logger = logging.getLogger(__name__)
+
+MODEL_REJECTED = REGISTRY.counter(
+    'model_rejected_total', 'Model runs rejected because the queue was full.')
+
+MODEL_WAIT_SECONDS = REGISTRY.histogram(
+    'model_wait_seconds', 'Time model runs spent queued before a worker started them.')
+
+MODEL_EXECUTION_SECONDS = REGISTRY.histogram(
+    'model_execution_seconds', 'Time workers spent running the model.')
+
+MODEL_COMPUTE_SECONDS = REGISTRY.histogram(
+    'model_compute_seconds',
+    'Time workers spent running the model by number of symptoms and biomarkers.',
+    ('symptoms', 'biomarkers'))
+
+MODEL_RELOADS = REGISTRY.counter(
+    'model_reloads_total', 'Model artifact reloads by outcome.', ('outcome',))
+
+MODEL_LOADS = REGISTRY.counter(
+    'model_registry_loads_total', 'Named models loaded into or evicted from the registry.',
+    ('model', 'outcome'))
+
+DEFAULT_MODEL: str = 'default'
+
+
+SIZE_BUCKETS: tuple[tuple[int, str], ...] = (
+    (0, '0'), (1, '1'), (3, '2-3'), (7, '4-7'), (15, '8-15')
+)
+
+
+def size_bucket(count: int) -> str:
+    """Group a number of model inputs into a coarse metric label."""
+    for upper, label in SIZE_BUCKETS:
+        if count <= upper:
+            return label
+    return '16+'
+
+
+class ModelBusyError(Exception):
+    """Raised when every model worker is busy and the queue is full."""
+
+
+class ModelValidationError(ValueError):
+    """Raised when new model artifacts cannot be compiled into a usable model."""
+
+
+class UnknownModelError(KeyError):
+    """Raised when a model name is not configured."""
+
+
+def artifact_version(weights_path: Path, stats_path: Path,
+                     priors_path: Path | None = None) -> str:
+    """
+    Get a hash identifying the content of the symptom weights, biomarker statistics, and
+    country priors, if any.
+    """
+    digest = hashlib.sha256()
+    for path in (weights_path, stats_path, priors_path):
+        if path is None:
+            continue
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def resolve_country_priors(priors_path: Path) -> dict[int, dict[str, float]]:
+    """
+    Read the prior weights of a country priors file by country ID.
+
+    Countries are matched by common or official name, ignoring case. Rows of unknown
+    countries are skipped with a warning.
+    """
+    country_ids: dict[str, int] = {}
+    for country in fetch_countries():
+        for key in ('common_name', 'official_name'):
+            country_ids[str(country[key]).strip().lower()] = int(country['id'])
+    priors: dict[int, dict[str, float]] = {}
+    for name, weights in load_country_priors(priors_path).items():
+        country_id: int | None = country_ids.get(name.lower())
+        if country_id is None:
+            logger.warning('Skipping priors of unknown country %s', name)
+            continue
+        priors.setdefault(country_id, {}).update(weights)
+    return priors
+
+
+def validate_model(model: CompiledModel) -> None:
+    """Check that a compiled model has the shape and content the scoring code expects."""
+    n_diseases, n_symptoms = len(model.disease_names), len(model.symptoms)
+    if n_diseases == 0 or n_symptoms == 0:
+        raise ModelValidationError('The symptom weights have no diseases or no symptoms')
+    if model.weights.ndim != 3 or model.weights.shape[1] == 0 or \
+            model.weights.shape[::2] != (n_diseases, n_symptoms):
+        raise ModelValidationError(
+            f'The symptom weights have shape {model.weights.shape}, expected '
+            f'({n_diseases}, n_iter, {n_symptoms})')
+    if not np.isfinite(model.weights).all():
+        raise ModelValidationError('The symptom weights contain missing or infinite values')
+    expected: tuple[int, int] = (len(model.expanded_index), len(model.biomarker_names))
+    if model.biomarker_means.shape != expected or model.biomarker_sds.shape != expected:
+        raise ModelValidationError(
+            f'The biomarker statistics have shape {model.biomarker_means.shape}, '
+            f'expected {expected}')
+    if not model.biomarker_names or not np.isfinite(model.biomarker_means).any():
+        raise ModelValidationError(
+            'The biomarker statistics have no usable pooled mean and SD columns')
+    if model.log_priors.shape != (len(model.prior_countries), n_diseases) or \
+            not np.isfinite(model.log_priors).all():
+        raise ModelValidationError(
+            f'The country priors have shape {model.log_priors.shape}, expected '
+            f'({len(model.prior_countries)}, {n_diseases}) finite values')
+
+
+def publish_model(model: CompiledModel, directory: Path) -> None:
+    """
+    Write a compiled model to its version directory.
+
+    The files are written to a temporary directory that is then renamed, so other processes
+    only ever see complete models. When several processes compile the same version at
+    once, the first rename wins and the others discard their copies.
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging: Path = Path(tempfile.mkdtemp(prefix='.staging-', dir=directory.parent))
+    save_compiled_model(model, staging)
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def load_model(weights_path: Path, stats_path: Path,
+               priors_path: Path | None = COUNTRY_PRIORS_PATH) -> CompiledModel:
+    """
+    Get the model of the artifact files, memory-mapped from its compiled version directory.
+
+    The artifacts are compiled and validated the first time a version is seen. Every API
+    and model worker process then maps the same read-only arrays, so the model is held in
+    memory once per host rather than once per process. Country priors are compiled into
+    the model, so scoring a patient never reads the priors file or the countries table.
+    """
+    version: str = artifact_version(weights_path, stats_path, priors_path)
+    directory: Path = COMPILED_MODEL_DIR / version
+    if not directory.exists():
+        try:
+            country_priors: dict[int, dict[str, float]] = \
+                resolve_country_priors(priors_path) if priors_path else {}
+            model: CompiledModel = compile_model(
+                weights_path, fetch_biomarker_stats(stats_path), version,
+                country_priors=country_priors)
+        except (KeyError, TypeError, ValueError, IndexError) as exc:
+            raise ModelValidationError(
+                f'The model artifacts are malformed: {exc!r}') from exc
+        validate_model(model)
+        unknown: set[str] = {
+            disease for weights in country_priors.values() for disease in weights
+        } - {name.strip().lower() for name in model.disease_names}
+        if unknown:
+            logger.warning('Ignoring priors of unknown diseases %s', sorted(unknown))
+        publish_model(model, directory)
+    return load_compiled_model(directory)
+
+
+def prune_models(keep: set[str]) -> None:
+    """
+    Delete compiled model versions other than those in `keep`.
+
+    Processes still mapping a deleted version keep their mapping until they switch models.
+    """
+    if not COMPILED_MODEL_DIR.exists():
+        return
+    for directory in COMPILED_MODEL_DIR.iterdir():
+        if directory.is_dir() and directory.name not in keep and \
+                not directory.name.startswith('.staging-'):
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class ActiveModel:
+    """
+    Reference to the compiled model used by new scoring runs.
+
+    Runs take the reference once and keep using that model to the end, so swapping in a
+    new model never affects a run already in progress.
+    """
+
+    def __init__(self, weights_path: Path, stats_path: Path,
+                 priors_path: Path | None = None) -> None:
+        self.weights_path: Path = weights_path
+        self.stats_path: Path = stats_path
+        self.priors_path: Path | None = priors_path
+        self.model: CompiledModel | None = None
+        self.lock: Lock = Lock()
+
+    def get(self) -> CompiledModel:
+        """Get the active model, compiling it from the artifact files on first use."""
+        model: CompiledModel | None = self.model
+        if model is None:
+            with self.lock:
+                if self.model is None:
+                    self.model = load_model(
+                        self.weights_path, self.stats_path, self.priors_path)
+                model = self.model
+        return model
+
+    def refresh(self) -> CompiledModel:
+        """Recompile the model if the artifact files changed and make it active."""
+        with self.lock:
+            if self.model is None or self.model.version != artifact_version(
+                    self.weights_path, self.stats_path, self.priors_path):
+                self.model = load_model(self.weights_path, self.stats_path, self.priors_path)
+            return self.model
+
+    def swap(self, model: CompiledModel) -> None:
+        """Make an already compiled model active."""
+        self.model = model
+
+
+active_model: ActiveModel = ActiveModel(
+    SYMPTOM_WEIGHTS_PATH, BIOMARKERS_RANGES_PATH, COUNTRY_PRIORS_PATH)
+
+reload_lock: Lock = Lock()
+
+
+def scoring_version(model_version: str, mc_mode: str = MC_MODE) -> str:
+    """
+    Get the version stored with rankings of a model scored in a Monte Carlo mode.
+
+    Fast rankings use fewer draws than full ones, so they are tagged to be stored and
+    cached separately.
+    """
+    return model_version if mc_mode == 'full' else f'{model_version}+{mc_mode}'
+
+
+def fetch_model_version(mc_mode: str = MC_MODE) -> str:
+    """Get the version of the active model scored in a Monte Carlo mode."""
+    return scoring_version(active_model.get().version, mc_mode)
+
+
+class ModelRegistry:
+    """
+    Compiled models by name and version, keeping the most recently used ones loaded.
+
+    The default model is the hot-reloaded active model. Every other name maps to its own
+    symptom weights file scored with the shared biomarker statistics and country priors. A
+    model is loaded on first use and whenever its files change, and the least recently used
+    models are evicted once more than `maxsize` are loaded.
+    """
+
+    def __init__(self, weights_paths: dict[str, Path], stats_path: Path,
+                 maxsize: int, priors_path: Path | None = None) -> None:
+        self.weights_paths: dict[str, Path] = weights_paths
+        self.stats_path: Path = stats_path
+        self.priors_path: Path | None = priors_path
+        self.maxsize: int = maxsize
+        self.models: OrderedDict[tuple[str, str], CompiledModel] = OrderedDict()
+        self.versions: dict[str, tuple[tuple[int, ...], str]] = {}
+        self.lock: Lock = Lock()
+
+    def names(self) -> list[str]:
+        """Get the names of every configured model."""
+        return [DEFAULT_MODEL, *self.weights_paths]
+
+    def version(self, name: str) -> str:
+        """Get the artifact version of a model, rehashing its files only when they change."""
+        weights_path: Path = self.weights_paths[name]
+        paths: list[Path] = [weights_path, self.stats_path]
+        if self.priors_path is not None:
+            paths.append(self.priors_path)
+        signature: tuple[int, ...] = tuple(
+            value for stat in (path.stat() for path in paths)
+            for value in (stat.st_mtime_ns, stat.st_size))
+        cached: tuple[tuple[int, ...], str] | None = self.versions.get(name)
+        if cached is None or cached[0] != signature:
+            cached = self.versions[name] = (
+                signature, artifact_version(weights_path, self.stats_path, self.priors_path))
+        return cached[1]
+
+    def get(self, name: str = DEFAULT_MODEL) -> CompiledModel:
+        """Get the current model of a name. Raises UnknownModelError if it is not configured."""
+        if name == DEFAULT_MODEL:
+            return active_model.get()
+        if name not in self.weights_paths:
+            raise UnknownModelError(name)
+        with self.lock:
+            key: tuple[str, str] = (name, self.version(name))
+            model: CompiledModel | None = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                return model
+            model = self.models[key] = load_model(
+                self.weights_paths[name], self.stats_path, self.priors_path)
+            MODEL_LOADS.inc(name, 'loaded')
+            for stale in [other for other in self.models if other[0] == name and other != key]:
+                del self.models[stale]
+            while len(self.models) > self.maxsize:
+                evicted, _model = self.models.popitem(last=False)
+                MODEL_LOADS.inc(evicted[0], 'evicted')
+            return model
+
+    def loaded_versions(self) -> set[str]:
+        """Get the versions of the models currently loaded."""
+        with self.lock:
+            return {version for _name, version in self.models}
+
+
+model_registry: ModelRegistry = ModelRegistry(
+    {name: BASE_DIR / 'data' / 'private' / key for name, key in MODEL_OBJECTS.items()},
+    BIOMARKERS_RANGES_PATH, MODEL_CACHE_SIZE, COUNTRY_PRIORS_PATH)
+
+
+def activate_model(staged: dict[str, tuple[Path, str]],
+                   artifacts: dict[str, Path]) -> CompiledModel:
+    """Compile and validate staged artifacts, then move them into place and activate them."""
+    paths: dict[str, Path] = {
+        name: staged[name][0] if name in staged else path
+        for name, path in artifacts.items()
+    }
+    try:
+        model: CompiledModel = load_model(
+            paths[SYMPTOM_WEIGHTS_OBJECT], paths[BIOMARKERS_RANGES_OBJECT],
+            paths.get(COUNTRY_PRIORS_OBJECT))
+    except ModelValidationError:
+        for staged_path, _etag in staged.values():
+            staged_path.unlink(missing_ok=True)
+        MODEL_RELOADS.inc('invalid')
+        raise
+    for name, (staged_path, etag) in staged.items():
+        activate_artifact(staged_path, etag, artifacts[name])
+    active_model.swap(model)
+    return model
+
+
+def model_artifacts() -> dict[str, Path]:
+    """Get the local paths of the default model's artifacts by object name."""
+    artifacts: dict[str, Path] = {
+        SYMPTOM_WEIGHTS_OBJECT: SYMPTOM_WEIGHTS_PATH,
+        BIOMARKERS_RANGES_OBJECT: BIOMARKERS_RANGES_PATH
+    }
+    if COUNTRY_PRIORS_PATH is not None:
+        artifacts[COUNTRY_PRIORS_OBJECT] = COUNTRY_PRIORS_PATH
+    return artifacts
+
+
+def reload_model(store: ArtifactStore | None = None) -> bool:
+    """
+    Fetch the model artifacts and activate them if they changed.
+
+    Changed artifacts are downloaded next to the current ones and compiled and validated
+    off the request path. Only a valid model replaces the files and the active model;
+    otherwise the staged files are discarded and ModelValidationError is raised.
+    Returns whether a new model was activated.
+    """
+    artifacts: dict[str, Path] = model_artifacts()
+    with reload_lock:
+        previous: CompiledModel | None = active_model.model
+        staged: dict[str, tuple[Path, str]] = stage_artifacts(
+            store or fetch_artifact_store(), artifacts)
+        if staged:
+            model: CompiledModel = activate_model(staged, artifacts)
+        elif previous is not None and active_model.refresh() is not previous:
+            # The files were already updated by another API process sharing them.
+            model = active_model.get()
+        else:
+            MODEL_RELOADS.inc('unchanged')
+            return False
+    MODEL_RELOADS.inc('activated')
+    logger.info('Activated model %s (previously %s)', model.version,
+                previous.version if previous else None)
+    prune_models({model.version} | ({previous.version} if previous else set()) |
+                 model_registry.loaded_versions())
+    return True
+
+
+class ModelReloader:
+    """Poll the artifact store for new model artifacts on a background thread."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval: float = interval
+        self.stopping: Event = Event()
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        """Start polling, unless the interval is not positive."""
+        if self.interval <= 0:
+            return
+        self.stopping.clear()
+        self.thread = Thread(target=self.run, name='model-reloader', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(5.0)
+            self.thread = None
+
+    def run(self) -> None:
+        """Reload the model every interval until stopped."""
+        while not self.stopping.wait(self.interval):
+            try:
+                reload_model()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('Failed to reload the model artifacts')
+
+
+model_reloader: ModelReloader = ModelReloader(MODEL_RELOAD_INTERVAL)
+
+
+def load_worker_model() -> None:
+    """Compile the model once when a worker process starts."""
+    active_model.get()
+
+
+def monte_carlo_settings(mc_mode: str = MC_MODE) -> dict[str, Any]:
+    """Get the Monte Carlo arguments of calculate_mean_confidence_intervals for a mode."""
+    return {
+        'mode': mc_mode,
+        'min_draws': MC_FAST_MIN_DRAWS,
+        'tolerance': MC_FAST_TOLERANCE,
+        'seed': MC_SEED
+    }
+
+
+def score(model: CompiledModel, negative_diseases: list[str], positive_symptoms: list[str],
+          biomarker_row: dict[str, float], submitted_at: float,
+          country_id: int | None = None,
+          mc_mode: str = MC_MODE) -> tuple[dict[str, Any], str, dict[str, float]]:
+    """
+    Rank diseases with a compiled model, using its priors for the country if it has any.
+
+    Returns the results, the model version tagged with the Monte Carlo mode, and the
+    seconds spent queued, running the model, and in each phase of the model.
+    """
+    started_at: float = time.time()
+    timings: dict[str, float] = {'queue': started_at - submitted_at}
+    results: dict[str, Any] = calculate_mean_confidence_intervals(
+        negative_diseases=negative_diseases,
+        patient_symptoms=positive_symptoms,
+        patient_biomarkers=biomarker_row,
+        model=model,
+        timings=timings,
+        log_prior=country_log_prior(model, country_id),
+        **monte_carlo_settings(mc_mode)
+    )
+    timings['model'] = time.time() - started_at
+    return results, scoring_version(model.version, mc_mode), timings
+
+
+ModelRun = tuple[list[str], list[str], dict[str, float], int | None]
+
+
+def score_batch(model: CompiledModel, runs: list[ModelRun], submitted_at: float,
+                mc_mode: str = MC_MODE) -> list[tuple[dict[str, Any], str, dict[str, float]]]:
+    """
+    Rank diseases for each run of negative diseases, positive symptoms, biomarkers, and
+    country ID in turn. Every run after the first counts as queued from when the previous
+    one finished.
+    """
+    scored: list[tuple[dict[str, Any], str, dict[str, float]]] = []
+    for negative_diseases, positive_symptoms, biomarker_row, country_id in runs:
+        scored.append(score(model, negative_diseases, positive_symptoms, biomarker_row,
+                            submitted_at if not scored else time.time(), country_id, mc_mode))
+    return scored
+
+
+def score_in_worker(model_name: str, model_version: str, runs: list[ModelRun],
+                    submitted_at: float,
+                    mc_mode: str = MC_MODE) -> list[tuple[dict[str, Any], str, dict[str, float]]]:
+    """Rank diseases in a worker process, first recompiling the model if it was reloaded."""
+    model: CompiledModel = model_registry.get(model_name)
+    if model.version != model_version and model_name == DEFAULT_MODEL:
+        model = active_model.refresh()
+    return score_batch(model, runs, submitted_at, mc_mode)
+
+
+class ModelExecutor:
+    """
+    Bounded executor running the model in worker processes, worker threads, or inline.
+
+    At most `workers + queue_size` runs are admitted at once. Further runs either wait for
+    a free slot or are rejected with ModelBusyError, so a burst of scoring requests cannot
+    occupy the request threadpool shared with the database routes.
+    """
+
+    def __init__(self, mode: str, workers: int, queue_size: int) -> None:
+        self.mode: str = mode
+        self.workers: int = workers
+        self.slots: Semaphore = Semaphore(workers + queue_size)
+        self.pending: int = 0
+        self.executor: Executor | None = None
+        self.lock: Lock = Lock()
+
+    def get_executor(self) -> Executor | None:
+        """Create the worker pool on first use."""
+        with self.lock:
+            if self.executor is None and self.mode == 'process':
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=load_worker_model
+                )
+            elif self.executor is None and self.mode == 'thread':
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='model')
+            return self.executor
+
+    def queue_depth(self) -> int:
+        """Get the number of admitted runs not yet picked up by a worker."""
+        return max(0, self.pending - self.workers)
+
+    def run(self, model: CompiledModel, negative_diseases: list[str],
+            positive_symptoms: list[str], biomarker_row: dict[str, float],
+            block: bool = False, model_name: str = DEFAULT_MODEL,
+            country_id: int | None = None,
+            mc_mode: str = MC_MODE) -> tuple[dict[str, Any], str]:
+        """
+        Rank diseases on a worker, waiting for a slot only when `block` is set.
+
+        Worker processes look the model up by `model_name`. `country_id` selects the
+        model's priors for the patient's country, and `mc_mode` whether to use every Monte
+        Carlo draw or stop once the ranking is stable. Returns the results and the
+        version of the model that produced them, tagged with the mode.
+        """
+        return self.run_batch(
+            model, [(negative_diseases, positive_symptoms, biomarker_row, country_id)],
+            block, model_name, mc_mode)[0]
+
+    def run_batch(self, model: CompiledModel, runs: list[ModelRun], block: bool = False,
+                  model_name: str = DEFAULT_MODEL,
+                  mc_mode: str = MC_MODE) -> list[tuple[dict[str, Any], str]]:
+        """
+        Rank diseases for several runs of negative diseases, positive symptoms, biomarkers,
+        and country ID as one task on a worker, taking a single slot.
+
+        Returns the results and model version of each run, in order.
+        """
+        if not self.slots.acquire(blocking=block):
+            MODEL_REJECTED.inc()
+            raise ModelBusyError('Model workers are busy')
+        with self.lock:
+            self.pending += 1
+        profile: RequestProfile | None = request_profile.get()
+        if profile is not None:
+            for negative_diseases, positive_symptoms, biomarker_row, country_id in runs:
+                profile.add_inputs(model_name, model.version, negative_diseases,
+                                   positive_symptoms, biomarker_row, country_id,
+                                   monte_carlo_settings(mc_mode))
+        try:
+            # A profiled request runs the model on its own thread, where it is sampled.
+            executor: Executor | None = self.get_executor() if profile is None else None
+            if executor is None:
+                scored = score_batch(model, runs, time.time(), mc_mode)
+            elif self.mode == 'process':
+                scored = executor.submit(
+                    score_in_worker, model_name, model.version, runs, time.time(), mc_mode
+                ).result()
+            else:
+                scored = executor.submit(
+                    score_batch, model, runs, time.time(), mc_mode
+                ).result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+            self.slots.release()
+        for (_negative, symptoms, biomarkers, _country), (_results, _version, timings) in \
+                zip(runs, scored):
+            MODEL_WAIT_SECONDS.observe(timings['queue'])
+            MODEL_EXECUTION_SECONDS.observe(timings['model'])
+            MODEL_COMPUTE_SECONDS.observe(timings['model'], size_bucket(len(symptoms)),
+                                          size_bucket(len(biomarkers)))
+            for phase, seconds in timings.items():
+                record(phase, seconds)
+        return [(results, version) for results, version, _timings in scored]
+
+    def shutdown(self) -> None:
+        """Stop the worker pool, dropping queued runs."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+model_executor: ModelExecutor = ModelExecutor(
+    MODEL_EXECUTOR, MODEL_WORKERS, MODEL_QUEUE_SIZE)
+
+REGISTRY.gauge('model_queue_depth', 'Model runs waiting for a worker.',
+               callback=model_executor.queue_depth)
+
+REGISTRY.gauge('model_runs_in_flight', 'Model runs queued or running.',
+               callback=lambda: model_executor.pending)
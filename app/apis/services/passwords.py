@@ -0,0 +1,39 @@
+"""Hash and verify passwords on a bounded pool of threads."""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from apis.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+bcrypt_context: CryptContext = CryptContext(schemes=['bcrypt'],
+                                            deprecated='auto',
+                                            bcrypt__rounds=BCRYPT_ROUNDS)
+
+password_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+
+
+def submit_hash(password: str) -> Future:
+    """Queue hashing a password with the configured bcrypt cost."""
+    return password_executor.submit(bcrypt_context.hash, password)
+
+
+def submit_verify(password: str, hashed_password: str) -> Future:
+    """
+    Queue checking a password against its hash.
+
+    The future resolves to whether the password matches and, when the hash was made with
+    a different bcrypt cost than configured, a new hash to store in its place.
+    """
+    return password_executor.submit(bcrypt_context.verify_and_update, password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await asyncio.wrap_future(submit_hash(password))
+
+
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Check a password against its hash without blocking the event loop."""
+    return await asyncio.wrap_future(submit_verify(password, hashed_password))
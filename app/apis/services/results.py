@@ -0,0 +1,255 @@
+"""Compute, store, and reuse disease rankings for patients."""
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from apis.config import MC_MODE, SCORING_WORKERS
+from apis.db.database import SessionLocal
+from apis.db.patients import get_latest_lab_results, get_lab_snapshot, snapshot_country
+from apis.db.results import get_patient_result, save_patient_result
+from apis.models.model import PatientResult
+from apis.services.model import (
+    DEFAULT_MODEL, active_model, fetch_model_version, model_executor, model_registry,
+    scoring_version
+)
+from apis.services.shadow import shadow_scorer
+from apis.tools.afi_model import CompiledModel
+from apis.tools.metrics import REGISTRY
+from apis.tools.profiling import request_profile
+from apis.tools.timing import timed
+
+logger = logging.getLogger(__name__)
+
+RANKING_FIELDS: tuple[str, ...] = (
+    'symptoms_top1', 'symptoms_top2', 'symptoms_top3',
+    'biomarkers_top1', 'biomarkers_top2', 'biomarkers_top3',
+    'symptom_mean', 'symptom_ci_low', 'symptom_ci_high',
+    'biomarker_mean', 'biomarker_ci_low', 'biomarker_ci_high'
+)
+
+scoring_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+    max_workers=SCORING_WORKERS, thread_name_prefix='scoring')
+
+scoring_jobs: dict[tuple[int, str, str], Future] = {}
+
+scoring_jobs_lock: Lock = Lock()
+
+SCORING_REQUESTS = REGISTRY.counter(
+    'scoring_requests_total',
+    'Ranking requests by whether they were stored, coalesced with an in-flight run, or computed.',
+    ('source',))
+
+
+def run_model(model: CompiledModel, negative_diseases: list[str],
+              positive_symptoms: list[str], biomarker_row: dict[str, float],
+              block: bool = False, model_name: str = DEFAULT_MODEL,
+              country_id: int | None = None,
+              mc_mode: str = MC_MODE) -> tuple[dict[str, Any], str]:
+    """
+    Rank diseases for the given lab results of a patient in a country on the model executor.
+
+    Returns the response and the version of the model that produced it, tagged with the
+    Monte Carlo mode.
+    """
+    results, model_version = model_executor.run(
+        model, negative_diseases, positive_symptoms, biomarker_row, block=block,
+        model_name=model_name, country_id=country_id, mc_mode=mc_mode)
+    return {
+        'negative_diseases': negative_diseases,
+        'symptoms': positive_symptoms,
+        'biomarkers': biomarker_row,
+        'results': results
+    }, model_version
+
+
+def result_response(result: PatientResult) -> dict[str, Any]:
+    """Build the calculation response from a stored ranking."""
+    return {
+        'negative_diseases': result.negative_diseases,
+        'symptoms': result.symptoms,
+        'biomarkers': result.biomarkers,
+        'results': result.results,
+        'snapshot': result.snapshot,
+        'model_version': result.model_version
+    }
+
+
+def result_etag(model_name: str, snapshot: str, model_version: str) -> str:
+    """
+    Build the entity tag of a ranking, which changes with the lab snapshot or model version.
+
+    Clients send it back in If-None-Match to skip downloading a ranking they already have.
+    """
+    return f'"{model_name}.{snapshot}.{model_version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check whether an If-None-Match header lists an entity tag, weakly compared."""
+    if not if_none_match:
+        return False
+    tags: set[str] = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return etag in tags or '*' in tags
+
+
+def result_summary(result: PatientResult) -> dict[str, Any]:
+    """Build a compact ranking from a stored result for history listings."""
+    return {
+        'snapshot': result.snapshot,
+        'model_version': result.model_version,
+        'created_at': result.created_at,
+        **{field: result.results.get(field) for field in RANKING_FIELDS}
+    }
+
+
+def compute_result(patient_id: int, db: Session, snapshot: str, model: CompiledModel,
+                   negative_diseases: list[str] | None = None,
+                   positive_symptoms: list[str] | None = None,
+                   biomarker_row: dict[str, float] | None = None,
+                   block: bool = False, model_name: str = DEFAULT_MODEL,
+                   mc_mode: str = MC_MODE) -> dict[str, Any]:
+    """
+    Rank diseases for a lab snapshot in the patient's country and store the ranking.
+
+    Only rankings of the default model in the default Monte Carlo mode are added to the
+    population aggregates, so rescoring a snapshot in the other mode is not counted twice.
+    """
+    if None in (negative_diseases, positive_symptoms, biomarker_row):
+        lab_results: dict[str, Any] = get_latest_lab_results(
+            patient_id=patient_id, db=db)
+        if negative_diseases is None:
+            negative_diseases = lab_results.get('negative_diseases', [])
+        if positive_symptoms is None:
+            positive_symptoms = lab_results.get('symptoms', [])
+        if biomarker_row is None:
+            biomarker_result = lab_results.get('biomarkers', {})
+            biomarker_row = {
+                row.abbreviation: row.value for row in biomarker_result}
+    logger.debug('Scoring patient %d with %d negative diseases, %d symptoms, and %d biomarkers',
+                 patient_id, len(negative_diseases), len(positive_symptoms), len(biomarker_row))
+
+    response, model_version = run_model(
+        model, negative_diseases, positive_symptoms, biomarker_row, block, model_name,
+        snapshot_country(snapshot), mc_mode)
+    save_patient_result(patient_id, snapshot, model_version, response, db,
+                        aggregate=model_name == DEFAULT_MODEL and mc_mode == MC_MODE)
+    response.update({
+        'snapshot': snapshot,
+        'model_version': model_version
+    })
+    return response
+
+
+def score_patient(patient_id: int, db: Session,
+                  negative_diseases: list[str] | None = None,
+                  positive_symptoms: list[str] | None = None,
+                  biomarker_row: dict[str, float] | None = None,
+                  model_name: str = DEFAULT_MODEL,
+                  snapshot: str | None = None,
+                  mc_mode: str = MC_MODE) -> dict[str, Any]:
+    """
+    Rank diseases for the patient's latest lab results with a named model, using every
+    Monte Carlo draw in 'full' mode or stopping once the ranking is stable in 'fast' mode.
+
+    The response includes the mode, so clients can tell fast and full rankings apart.
+    Rankings of the default model are also passed to the shadow model, if one is set, to
+    be ranked in the same mode.
+    Raises UnknownModelError for a model name that is not configured and ModelBusyError
+    when the model queue is full.
+    """
+    response: dict[str, Any] = {
+        **fetch_patient_ranking(patient_id, db, negative_diseases, positive_symptoms,
+                                biomarker_row, model_name, snapshot, mc_mode),
+        'mc_mode': mc_mode
+    }
+    if model_name == DEFAULT_MODEL:
+        shadow_scorer.submit(response, mc_mode)
+    return response
+
+
+def fetch_patient_ranking(patient_id: int, db: Session,
+                          negative_diseases: list[str] | None,
+                          positive_symptoms: list[str] | None,
+                          biomarker_row: dict[str, float] | None,
+                          model_name: str, snapshot: str | None = None,
+                          mc_mode: str = MC_MODE) -> dict[str, Any]:
+    """
+    Get the stored ranking of the patient's latest lab results or compute it.
+
+    The stored ranking is returned when neither the lab snapshot nor the model version has
+    changed since it was computed in the same Monte Carlo mode. Concurrent calls for the
+    same snapshot, model version, and mode, including a background job already scoring it,
+    share one computation instead of each running the model. Lab results and the snapshot
+    that are not passed in are loaded from the database.
+    """
+    if snapshot is None:
+        snapshot = get_lab_snapshot(patient_id, db)
+    with timed('model_load'):
+        model: CompiledModel = model_registry.get(model_name)
+    model_version: str = scoring_version(model.version, mc_mode)
+    stored: PatientResult | None = get_patient_result(
+        patient_id, snapshot, model_version, db)
+    # A profiled request recomputes the ranking, since profiling a stored one shows nothing.
+    if stored is not None and request_profile.get() is None:
+        SCORING_REQUESTS.inc('stored')
+        return result_response(stored)
+
+    key: tuple[int, str, str] = (patient_id, snapshot, model_version)
+    with scoring_jobs_lock:
+        job: Future | None = scoring_jobs.get(key)
+        if job is None:
+            job = scoring_jobs[key] = Future()
+            job.set_running_or_notify_cancel()
+            leader: bool = True
+        else:
+            leader = False
+    if not leader:
+        SCORING_REQUESTS.inc('coalesced')
+        with timed('coalesced'):
+            return dict(job.result())
+
+    SCORING_REQUESTS.inc('computed')
+    try:
+        response: dict[str, Any] = compute_result(
+            patient_id, db, snapshot, model,
+            negative_diseases, positive_symptoms, biomarker_row, model_name=model_name,
+            mc_mode=mc_mode)
+        job.set_result(response)
+    except Exception as exc:
+        job.set_exception(exc)
+        raise
+    finally:
+        with scoring_jobs_lock:
+            scoring_jobs.pop(key, None)
+    return response
+
+
+def run_scoring_job(patient_id: int) -> dict[str, Any]:
+    """Rank diseases for the patient's latest lab results unless already stored."""
+    with SessionLocal() as db:
+        snapshot: str = get_lab_snapshot(patient_id, db)
+        model: CompiledModel = active_model.get()
+        stored: PatientResult | None = get_patient_result(
+            patient_id, snapshot, scoring_version(model.version), db)
+        if stored is not None:
+            return result_response(stored)
+        return compute_result(patient_id, db, snapshot, model, block=True)
+
+
+def precompute_patient_result(patient_id: int, db: Session) -> None:
+    """Queue a background job ranking diseases for the patient's latest lab results."""
+    key: tuple[int, str, str] = (
+        patient_id, get_lab_snapshot(patient_id, db), fetch_model_version())
+    with scoring_jobs_lock:
+        if key in scoring_jobs:
+            return
+        job: Future = scoring_executor.submit(run_scoring_job, patient_id)
+        scoring_jobs[key] = job
+
+    def forget(_job: Future) -> None:
+        with scoring_jobs_lock:
+            scoring_jobs.pop(key, None)
+
+    job.add_done_callback(forget)
@@ -0,0 +1,106 @@
+"""Score a candidate model on a sample of real traffic and compare its rankings."""
+import logging
+import random
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Semaphore
+from typing import Any
+
+from apis.config import MC_MODE, MODEL_EXECUTOR, SHADOW_MODEL, SHADOW_SAMPLE_RATE
+from apis.db.patients import snapshot_country
+from apis.services.model import ModelBusyError, ModelExecutor, model_registry
+from apis.tools.afi_model import CompiledModel
+from apis.tools.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RANKINGS: tuple[str, ...] = ('symptoms', 'biomarkers')
+
+SHADOW_RUNS = REGISTRY.counter(
+    'shadow_runs_total', 'Shadow model runs by outcome.', ('outcome',))
+
+SHADOW_TOP1_AGREEMENT = REGISTRY.counter(
+    'shadow_top1_agreement_total',
+    'Shadow runs by ranking and whether the top disease matched the served model.',
+    ('ranking', 'agrees'))
+
+SHADOW_TOP3_OVERLAP = REGISTRY.histogram(
+    'shadow_top3_overlap',
+    'Fraction of the served top 3 diseases also in the top 3 of the shadow model.',
+    ('ranking',), buckets=(0.0, 1 / 3, 2 / 3, 1.0))
+
+
+def ranking_agreement(served: dict[str, Any], candidate: dict[str, Any]) -> dict[str, Any]:
+    """Compare the top 3 diseases of two rankings of the same lab results."""
+    agreement: dict[str, Any] = {}
+    for ranking in RANKINGS:
+        top3 = [served.get(f'{ranking}_top{rank}') for rank in (1, 2, 3)]
+        candidate_top3 = {candidate.get(f'{ranking}_top{rank}') for rank in (1, 2, 3)}
+        agreement[f'{ranking}_top1'] = top3[0] == candidate.get(f'{ranking}_top1')
+        agreement[f'{ranking}_top3_overlap'] = sum(
+            disease is not None and disease in candidate_top3 for disease in top3) / 3
+    return agreement
+
+
+class ShadowScorer:
+    """
+    Rank a sample of served requests with a candidate model in the background.
+
+    The candidate never affects the response: it runs after the served ranking is ready,
+    on a single thread and its own model worker, so it never takes a slot or a worker from
+    the served requests. It uses the Monte Carlo mode of the served ranking, so both rank
+    the same computation. Requests arriving while `max_pending` shadow runs are outstanding
+    are skipped.
+    """
+
+    def __init__(self, model_name: str, sample_rate: float, max_pending: int = 8) -> None:
+        self.model_name: str = model_name
+        self.sample_rate: float = sample_rate
+        self.slots: Semaphore = Semaphore(max_pending)
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='shadow')
+        self.model_executor: ModelExecutor = ModelExecutor(MODEL_EXECUTOR, 1, 0)
+
+    def submit(self, response: dict[str, Any], mc_mode: str = MC_MODE) -> None:
+        """Queue a served response ranked in a Monte Carlo mode for a shadow run if sampled."""
+        if not self.model_name or random.random() >= self.sample_rate:
+            return
+        if not self.slots.acquire(blocking=False):
+            SHADOW_RUNS.inc('skipped')
+            return
+        try:
+            job: Future = self.executor.submit(self.compare, response, mc_mode)
+        except RuntimeError:
+            self.slots.release()
+            return
+        job.add_done_callback(lambda _job: self.slots.release())
+
+    def compare(self, response: dict[str, Any], mc_mode: str = MC_MODE) -> None:
+        """Rank the lab results of a served response with the candidate and log agreement."""
+        try:
+            model: CompiledModel = model_registry.get(self.model_name)
+            results, version = self.model_executor.run(
+                model, response['negative_diseases'], response['symptoms'],
+                response['biomarkers'], model_name=self.model_name,
+                country_id=snapshot_country(response.get('snapshot', '')), mc_mode=mc_mode)
+        except ModelBusyError:
+            SHADOW_RUNS.inc('skipped')
+            return
+        except Exception:  # pylint: disable=broad-exception-caught
+            SHADOW_RUNS.inc('failed')
+            logger.exception('Shadow run of model %s failed', self.model_name)
+            return
+        SHADOW_RUNS.inc('compared')
+        agreement: dict[str, Any] = ranking_agreement(response['results'], results)
+        for ranking in RANKINGS:
+            SHADOW_TOP1_AGREEMENT.inc(ranking, str(agreement[f'{ranking}_top1']).lower())
+            SHADOW_TOP3_OVERLAP.observe(agreement[f'{ranking}_top3_overlap'], ranking)
+        logger.info('Shadow model %s (%s) against served model %s: %s', self.model_name,
+                    version, response.get('model_version'), agreement)
+
+    def shutdown(self) -> None:
+        """Stop shadow runs, dropping queued ones."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.model_executor.shutdown()
+
+
+shadow_scorer: ShadowScorer = ShadowScorer(SHADOW_MODEL, SHADOW_SAMPLE_RATE)
@@ -0,0 +1,57 @@
+"""Limit how often a client or account may attempt to log in."""
+import time
+from threading import Lock
+
+from apis.tools.metrics import REGISTRY
+
+LOGIN_THROTTLED = REGISTRY.counter(
+    'login_throttled_total', 'Login attempts rejected by the throttle.', ('scope',))
+
+
+class LoginThrottle:
+    """
+    Count attempts per key in fixed windows of `window` seconds.
+
+    Counters of past windows are dropped whenever the number of tracked keys exceeds
+    `max_keys`, so memory stays bounded during a flood from many addresses.
+    """
+
+    def __init__(self, scope: str, limit: int, window: int, max_keys: int = 10000) -> None:
+        self.scope: str = scope
+        self.limit: int = limit
+        self.window: int = window
+        self.max_keys: int = max_keys
+        self.attempts: dict[str, tuple[float, int]] = {}
+        self.lock: Lock = Lock()
+
+    def hit(self, key: str) -> int:
+        """Record an attempt and return the seconds to wait if the limit is exceeded, else 0."""
+        now: float = time.monotonic()
+        with self.lock:
+            started_at, count = self.attempts.get(key, (now, 0))
+            if now - started_at >= self.window:
+                started_at, count = now, 0
+            count += 1
+            self.attempts[key] = (started_at, count)
+            if len(self.attempts) > self.max_keys:
+                self.attempts = {
+                    k: v for k, v in self.attempts.items() if now - v[0] < self.window
+                }
+        if count > self.limit:
+            LOGIN_THROTTLED.inc(self.scope)
+            return max(1, int(started_at + self.window - now))
+        return 0
+
+    def reset(self, key: str) -> None:
+        """Forget the attempts of a key, e.g. after a successful login."""
+        with self.lock:
+            self.attempts.pop(key, None)
+
+    def release(self, key: str) -> None:
+        """Stop counting the latest attempt of a key, e.g. one that logged in successfully."""
+        with self.lock:
+            started_at, count = self.attempts.get(key, (0.0, 0))
+            if count > 1:
+                self.attempts[key] = (started_at, count - 1)
+            else:
+                self.attempts.pop(key, None)
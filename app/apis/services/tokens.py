@@ -0,0 +1,53 @@
+"""Remember the claims of verified access tokens until they expire."""
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from apis.tools.metrics import REGISTRY
+
+TOKEN_CACHE_REQUESTS = REGISTRY.counter(
+    'token_cache_requests_total', 'Access token lookups by cache hit or miss.', ('result',))
+
+
+class TokenCache:
+    """
+    Bounded LRU of decoded access token claims keyed by the SHA-256 digest of the token.
+
+    Entries are kept only until the token's `exp` claim, so an expired token is never
+    accepted from the cache and is verified, and rejected, by the JWT library instead.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize: int = maxsize
+        self.entries: OrderedDict[bytes, tuple[dict[str, str | int], float]] = OrderedDict()
+        self.lock: Lock = Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """Hash a token so the cache never holds the bearer credential itself."""
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict[str, str | int] | None:
+        """Get a copy of the claims of a previously verified, unexpired token."""
+        key: bytes = self.digest(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        TOKEN_CACHE_REQUESTS.inc('hit' if entry is not None else 'miss')
+        return dict(entry[0]) if entry is not None else None
+
+    def put(self, token: str, claims: dict[str, str | int], expires_at: float) -> None:
+        """Remember the claims of a verified token until `expires_at`."""
+        if self.maxsize <= 0 or expires_at <= time.time():
+            return
+        key: bytes = self.digest(token)
+        with self.lock:
+            self.entries[key] = (claims, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
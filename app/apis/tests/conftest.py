@@ -0,0 +1,44 @@
+"""Configure the API tests to run against a temporary SQLite database."""
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+TEST_DIR: Path = Path(tempfile.mkdtemp(prefix='febrilogic-tests-'))
+
+for name, value in {
+    'POSTGRES_DATABASE_URL': f'sqlite:///{TEST_DIR / "febrilogic.sqlite"}',
+    'SECRET_KEY': 'test-secret-key',
+    'SYMPTOM_WEIGHTS_OBJECT': 'test_symptom_weights.csv',
+    'BIOMARKERS_RANGES_OBJECT': 'test_biomarker_stats.csv',
+    'VERIFICATION_EMAIL_TEMPLATE': 'html/verification_email.html',
+    'SUPPORT_REQUEST_TEMPLATE': 'html/support_email.html',
+    'PASSWORD_RESET_EMAIL_TEMPLATE': 'html/password_reset_email.html',
+    'EMAIL_SENDER': 'fake',
+    'MODEL_EXECUTOR': 'inline',
+    'ARTIFACT_STORE': 'filesystem',
+    'COMPILED_MODEL_DIR': str(TEST_DIR / 'compiled'),
+    'METRICS_DIR': str(TEST_DIR / 'metrics'),
+    'PROFILE_DIR': str(TEST_DIR / 'profiles')
+}.items():
+    os.environ[name] = value
+
+# The settings are read when the application modules are first imported.
+# pylint: disable=wrong-import-position
+from sqlalchemy.orm import Session
+
+from apis.db.database import Base, SessionLocal, engine
+
+
+@pytest.fixture(name='db')
+def fixture_db() -> Iterator[Session]:
+    """Get a session of an empty database, recreated for every test."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session: Session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
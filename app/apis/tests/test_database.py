@@ -0,0 +1,47 @@
+"""Check that startup brings existing databases up to the current schema."""
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from apis import main
+from apis.db.database import engine, upgrade_schema
+from apis.models.model import Country, Patient, User
+
+
+def index_names(table: str) -> set[str]:
+    """Get the names of the indexes of a table."""
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+
+def test_prepare_runs_on_sqlite(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Startup creates the schema and applies its upgrades twice without failing."""
+    db.close()
+    monkeypatch.setattr(main, 'fetch_artifact_store', lambda: None)
+    monkeypatch.setattr(main, 'sync_artifacts', lambda store, artifacts: [])
+    for _ in range(2):
+        monkeypatch.setattr(main, 'prepared', False)
+        main.prepare()
+    assert 'ix_patient_symptoms_patient_id' in index_names('patient_symptoms')
+    assert 'ix_patients_updated_at' in index_names('patients')
+
+
+def test_upgrade_adds_patients_updated_at(db: Session) -> None:
+    """Patients created before updated_at existed get their creation time."""
+    db.add_all([
+        Country(id=1, common_name='Egypt', official_name='Arab Republic of Egypt'),
+        User(id=1, email='doctor@example.com', hashed_password='x', is_verified=True),
+        Patient(id=1, age=30, sex='Female', country_id=1, user_id=1)
+    ])
+    db.commit()
+    db.close()
+    with engine.begin() as connection:
+        connection.execute(text('DROP INDEX ix_patients_updated_at'))
+        connection.execute(text('ALTER TABLE patients DROP COLUMN updated_at'))
+
+    upgrade_schema()
+
+    with engine.connect() as connection:
+        updated_at, created_at = connection.execute(
+            text('SELECT updated_at, created_at FROM patients WHERE id = 1')).one()
+    assert updated_at == created_at
+    assert 'ix_patients_updated_at' in index_names('patients')
@@ -0,0 +1,162 @@
+"""Tests of the email outbox worker."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import Session
+
+from apis.models.model import EmailOutbox
+from apis.services import emails
+from apis.services.emails import CircuitBreaker, FakeSender, OutboxWorker, queue_email
+
+
+class Clock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.now += seconds
+
+
+@pytest.fixture(name='clock')
+def fixture_clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Replace the monotonic clock of the circuit breaker."""
+    fake: Clock = Clock()
+    monkeypatch.setattr(emails.time, 'monotonic', fake)
+    return fake
+
+
+def make_worker(sender: FakeSender, threshold: int = 10, max_attempts: int = 3) -> OutboxWorker:
+    """Create a worker with a 30 second initial backoff."""
+    return OutboxWorker(sender, CircuitBreaker(threshold, 60), batch_size=10,
+                        poll_interval=1, max_attempts=max_attempts, backoff=30,
+                        backoff_max=3600, retention=timedelta(days=30))
+
+
+def queue(db: Session, count: int = 1) -> None:
+    """Queue emails containing a secret link."""
+    for index in range(count):
+        queue_email(db, 'FebriLogic <test@febrilogic.com>', [f'user{index}@example.com'],
+                    'Password Reset', '<a href="/reset-password?token=secret">Reset</a>')
+
+
+def make_due(db: Session) -> None:
+    """Make every pending email due now."""
+    db.query(EmailOutbox).update({EmailOutbox.next_attempt_at: datetime.now(timezone.utc)})
+    db.commit()
+
+
+def test_sent_email_is_redacted(db: Session) -> None:
+    sender: FakeSender = FakeSender()
+    queue(db)
+
+    assert make_worker(sender).drain() == 1
+
+    email: EmailOutbox = db.query(EmailOutbox).one()
+    assert email.status == 'sent'
+    assert email.provider_id == 'fake-1'
+    assert email.html == ''
+    assert 'token=secret' in sender.sent[0]['html']
+
+
+def test_failed_attempt_backs_off(db: Session) -> None:
+    sender: FakeSender = FakeSender()
+    worker: OutboxWorker = make_worker(sender)
+    queue(db)
+    sender.fail_next()
+
+    started_at: datetime = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert worker.drain() == 1
+
+    email: EmailOutbox = db.query(EmailOutbox).one()
+    assert email.status == 'pending'
+    assert email.attempts == 1
+    assert email.last_error == 'Simulated delivery failure'
+    assert email.next_attempt_at.replace(tzinfo=None) >= started_at + timedelta(seconds=30)
+    assert 'token=secret' in email.html
+    assert worker.drain() == 0
+    assert worker.retry_delay(2) == timedelta(seconds=60)
+    assert worker.retry_delay(20) == timedelta(seconds=3600)
+
+
+def test_email_fails_after_max_attempts(db: Session) -> None:
+    sender: FakeSender = FakeSender()
+    worker: OutboxWorker = make_worker(sender, max_attempts=3)
+    queue(db)
+    sender.fail_next(3)
+
+    for _attempt in range(3):
+        make_due(db)
+        assert worker.drain() == 1
+    make_due(db)
+
+    email: EmailOutbox = db.query(EmailOutbox).one()
+    assert email.status == 'failed'
+    assert email.attempts == 3
+    assert email.html == ''
+    assert worker.drain() == 0
+    assert not sender.sent
+
+
+def test_circuit_opens_and_resets(db: Session, clock: Clock) -> None:
+    sender: FakeSender = FakeSender()
+    worker: OutboxWorker = make_worker(sender, threshold=2)
+    queue(db, count=3)
+    sender.fail_next(2)
+
+    assert worker.drain() == 2
+    assert worker.breaker.is_open()
+    make_due(db)
+    assert worker.drain() == 0
+
+    clock.advance(60)
+    assert not worker.breaker.is_open()
+    assert worker.drain() == 3
+    assert not worker.breaker.is_open()
+    assert worker.breaker.failures == 0
+    assert db.query(EmailOutbox).filter(EmailOutbox.status == 'sent').count() == 3
+
+
+def test_circuit_reopens_when_trial_fails(db: Session, clock: Clock) -> None:
+    sender: FakeSender = FakeSender()
+    worker: OutboxWorker = make_worker(sender, threshold=2)
+    queue(db, count=2)
+    sender.fail_next(3)
+
+    assert worker.drain() == 2
+    clock.advance(60)
+    make_due(db)
+    assert worker.drain() == 1
+    assert worker.breaker.is_open()
+
+
+def test_half_open_circuit_allows_one_trial(clock: Clock) -> None:
+    breaker: CircuitBreaker = CircuitBreaker(threshold=1, reset_after=60)
+    breaker.record_failure()
+    clock.advance(60)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.is_open()
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_purge_deletes_old_delivered_emails(db: Session) -> None:
+    worker: OutboxWorker = make_worker(FakeSender())
+    queue(db, count=3)
+    old: datetime = datetime.now(timezone.utc) - timedelta(days=31)
+    sent, failed, pending = db.query(EmailOutbox).order_by(EmailOutbox.id).all()
+    sent.status, failed.status = 'sent', 'failed'
+    for email in (sent, failed, pending):
+        email.created_at = old
+    db.commit()
+
+    assert worker.purge() == 2
+    assert db.query(EmailOutbox).one().status == 'pending'
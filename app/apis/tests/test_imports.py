@@ -0,0 +1,54 @@
+"""Check that bulk imports report bad rows without aborting."""
+import io
+import json
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from apis.models.model import Country, Disease, Patient, Symptom, SymptomCategory, User
+from apis.services import biomarkers, countries, diseases, symptoms
+from apis.services.imports import PatientImporter, parse_ndjson
+
+
+@pytest.fixture(name='importer')
+def fixture_importer(db: Session) -> PatientImporter:
+    """Get an importer writing two-row chunks for a user, with one country, disease, and symptom."""
+    db.add_all([
+        Country(id=1, common_name='Egypt', official_name='Arab Republic of Egypt'),
+        User(id=1, email='doctor@example.com', hashed_password='x', is_verified=True),
+        SymptomCategory(id=1, name='General'),
+        Disease(id=1, name='Dengue'),
+        Symptom(id=1, name='Fever', definition='Fever', cat_id=1)
+    ])
+    db.commit()
+    for cached in (biomarkers.fetch_biomarker_catalog, countries.fetch_countries,
+                   diseases.fetch_diseases, symptoms.fetch_symptom_categories):
+        cached.cache_clear()
+    return PatientImporter(db, user_id=1, chunk_size=2)
+
+
+def test_ndjson_import_reports_bad_lines(db: Session, importer: PatientImporter) -> None:
+    """Lines that are not valid patient objects are reported and the others are imported."""
+    patient = {'age': 30, 'sex': 'Female', 'country_id': 1,
+               'negative_diseases': ['Dengue'], 'symptom_names': ['Fever']}
+    lines = [
+        json.dumps(patient),
+        '42',
+        '[1, 2]',
+        '"x"',
+        '{"age": ',
+        json.dumps({**patient, 'error': 'not a parse failure'}),
+        json.dumps({**patient, 'symptom_names': 5}),
+        json.dumps({**patient, 'biomarker_value_unit': ['WBC']})
+    ]
+
+    summary = importer.run(parse_ndjson(io.StringIO('\n'.join(lines))))
+
+    assert summary['imported'] == 2
+    assert summary['failed'] == 6
+    assert summary['errors'][:4] == [
+        {'line': line, 'error': 'Expected a JSON object'} for line in (2, 3, 4)
+    ] + [{'line': 5, 'error': 'Invalid JSON: Expecting value'}]
+    assert [error['line'] for error in summary['errors'][4:]] == [7, 8]
+    assert db.execute(select(func.count()).select_from(Patient)).scalar_one() == 2
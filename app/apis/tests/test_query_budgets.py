@@ -0,0 +1,172 @@
+"""Check that the data routes stay within their declared SQL statement budgets."""
+import csv
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from apis.db.database import engine
+from apis.db.instrumentation import QueryLog, assert_max_queries, query_budget
+from apis.db.patients import get_lab_snapshot, list_patients
+from apis.main import api
+from apis.models.model import (
+    Biomarker, Country, Disease, Patient, Symptom, SymptomCategory, Unit, User,
+    biomarker_units
+)
+from apis.routes.auth import create_access_token
+from apis.services import biomarkers, diseases
+from apis.services.model import active_model
+from apis.tests.conftest import TEST_DIR
+from apis.tools.afi_model import compile_model
+
+DISEASES: tuple[str, ...] = ('Dengue', 'Malaria', 'Typhoid')
+
+SYMPTOMS: tuple[str, ...] = ('Fever', 'Rash', 'Headache')
+
+PATIENTS: int = 5
+
+
+def write_symptom_weights(path: Path, iterations: int = 50) -> None:
+    """Write random symptom weights of every disease."""
+    rng = np.random.default_rng(0)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['disease', 'iteration', *SYMPTOMS])
+        for disease in DISEASES:
+            for iteration in range(iterations):
+                writer.writerow([disease, iteration, *rng.normal(size=len(SYMPTOMS))])
+
+
+@pytest.fixture(name='model', autouse=True)
+def fixture_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Score with a small model compiled from random weights."""
+    weights_path: Path = TEST_DIR / 'budget_weights.csv'
+    write_symptom_weights(weights_path)
+    stats = pd.DataFrame({
+        'disease': list(DISEASES),
+        'pooled_mean_WBC': [3.0, 8.0, 6.0],
+        'pooled_sd_WBC': [1.0, 2.0, 1.5]
+    })
+    monkeypatch.setattr(active_model, 'model', compile_model(weights_path, stats, 'test'))
+
+
+@pytest.fixture(name='client')
+def fixture_client(db: Session) -> TestClient:
+    """Get a client of a user with patients, and reference data loaded from scratch."""
+    db.add_all([
+        Country(id=1, common_name='Egypt', official_name='Arab Republic of Egypt'),
+        User(id=1, email='doctor@example.com', hashed_password='x', is_verified=True),
+        SymptomCategory(id=1, name='General'),
+        Unit(id=1, symbol='10^3/uL'),
+        Biomarker(id=1, abbreviation='WBC', name='White Blood Cells',
+                  standard_unit='10^3/uL', reference_range='4 - 11'),
+        *(Disease(id=index, name=name) for index, name in enumerate(DISEASES, 1)),
+        *(Symptom(id=index, name=name, definition=name, cat_id=1)
+          for index, name in enumerate(SYMPTOMS, 1)),
+        *(Patient(id=index, age=30 + index, sex='Female', country_id=1, user_id=1)
+          for index in range(1, PATIENTS + 1))
+    ])
+    db.flush()
+    db.execute(biomarker_units.insert(), [{'biomarker_id': 1, 'unit_id': 1, 'factor': 1.0}])
+    db.commit()
+    for cached in (biomarkers.fetch_biomarker_catalog, diseases.fetch_diseases):
+        cached.cache_clear()
+    token: str = create_access_token('doctor@example.com', 1, timedelta(minutes=5))
+    # The client is not entered, so the lifespan's artifact downloads and workers never run.
+    return TestClient(api, headers={'Authorization': f'Bearer {token}'})
+
+
+@pytest.fixture(name='query_logs')
+def fixture_query_logs(monkeypatch: pytest.MonkeyPatch) -> dict[str, QueryLog]:
+    """
+    Fail a request that executes more SQL statements than its route's budget, and collect
+    the statements of every request by route.
+    """
+    logs: dict[str, QueryLog] = {}
+    report = QueryLog.report
+
+    def collect(queries: QueryLog, route: str) -> None:
+        logs[route] = queries
+        report(queries, route)
+
+    monkeypatch.setattr('apis.db.instrumentation.QUERY_BUDGET_STRICT', True)
+    monkeypatch.setattr(QueryLog, 'report', collect)
+    return logs
+
+
+ENCOUNTER: dict = {
+    'negative_diseases': ['Typhoid'],
+    'symptom_names': ['Fever', 'Rash'],
+    'biomarker_value_unit': {'WBC': [3.5, '10^3/uL']}
+}
+
+
+def test_list_patients_within_budget(client: TestClient,
+                                     query_logs: dict[str, QueryLog]) -> None:
+    response = client.get('/api/patients')
+
+    assert response.status_code == 200
+    assert len(response.json()['patients']) == PATIENTS
+    queries: QueryLog = query_logs['/api/patients']
+    assert queries.budget == 2
+    assert 0 < queries.count <= 2
+
+
+def test_encounter_with_ranking_within_budget(client: TestClient,
+                                              query_logs: dict[str, QueryLog]) -> None:
+    response = client.post('/api/patients/1/encounter', params={'calculate': True},
+                           json=ENCOUNTER)
+
+    assert response.status_code == 200
+    assert response.json()['results']['symptoms_top1'] is not None
+    queries: QueryLog = query_logs['/api/patients/{patient_id}/encounter']
+    assert queries.budget == 16
+    assert 0 < queries.count <= 16
+
+
+def test_calculate_within_budget(client: TestClient,
+                                 query_logs: dict[str, QueryLog]) -> None:
+    client.post('/api/patients/1/encounter', params={'calculate': True}, json=ENCOUNTER)
+
+    for patient_id in (1, 2):
+        response = client.get(f'/api/patients/{patient_id}/calculate')
+        assert response.status_code == 200
+        queries: QueryLog = query_logs['/api/patients/{patient_id}/calculate']
+        assert queries.budget == 14
+        assert 0 < queries.count <= 14
+
+
+def test_route_over_budget_fails_in_strict_mode(client: TestClient,
+                                                query_logs: dict[str, QueryLog],
+                                                monkeypatch: pytest.MonkeyPatch) -> None:
+    route = next(route for route in api.routes
+                 if getattr(route, 'path', None) == '/api/patients/{patient_id}/calculate')
+    monkeypatch.setitem(api.dependency_overrides, route.dependencies[0].dependency,
+                        query_budget(1))
+
+    with pytest.raises(AssertionError, match='over its budget of 1'):
+        client.get('/api/patients/1/calculate')
+    assert query_logs['/api/patients/{patient_id}/calculate'].count > 1
+
+
+@pytest.mark.usefixtures('client')
+def test_patient_queries_do_not_grow_with_patients(db: Session) -> None:
+    with assert_max_queries(1):
+        assert len(list_patients(1, db, limit=100, search='Egypt')) == PATIENTS
+    with assert_max_queries(1):
+        get_lab_snapshot(1, db)
+
+
+def test_failed_statement_does_not_skew_timers() -> None:
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM missing_table'))
+        assert connection.info['statement_started_at'] == []
+        connection.execute(text('SELECT 1'))
+        assert connection.info['statement_started_at'] == []
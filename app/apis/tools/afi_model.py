@@ -1,13 +1,50 @@
-"""AFI model for disease diagnosis using symptoms and biomarkers."""
-from typing import Any
+"""
+AFI model for disease diagnosis using symptoms and biomarkers.
+
+pandas and scipy are imported inside the functions that need them, so importing the
+model does not slow down application startup.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import csv
+import json
+import time
 import numpy as np
-import pandas as pd
-from scipy.stats import norm
 
 from apis.config import SYMPTOM_WEIGHTS_PATH
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass(frozen=True)
+class CompiledModel:
+    """
+    Symptom weights and biomarker statistics prepared once for repeated scoring.
+
+    `weights` has shape (n_diseases, n_iter, n_symptoms). `biomarker_means` and
+    `biomarker_sds` have shape (n_expanded_diseases, n_biomarkers), with NaN where the
+    biomarker statistics have no usable value. `log_priors` has shape
+    (n_countries, n_diseases) and holds the log prior weight of every disease in each
+    country of `prior_countries`, which maps country IDs to rows.
+    """
+    version: str
+    disease_names: list[str]
+    symptoms: list[str]
+    symptom_index: dict[str, int]
+    weights: np.ndarray
+    expanded_index: dict[str, int]
+    biomarker_names: list[str]
+    biomarker_means: np.ndarray
+    biomarker_sds: np.ndarray
+    log_priors: np.ndarray
+    prior_countries: dict[int, int]
+
 
 def disease_to_biomarker_row_name(display_name: str) -> str | None:
     """Map symptom-layer disease names to `disease` column in biomarker stats CSV."""
@@ -84,6 +121,24 @@ def softmax_columns(scores) -> np.ndarray:
     return e / np.sum(e, axis=0, keepdims=True)
 
 
+def load_country_priors(csv_path: str | Path) -> dict[str, dict[str, float]]:
+    """
+    Returns dictionary mapping country name to disease name to prior weight, read from a
+    CSV file with country, disease, and weight columns. Weights must be positive.
+    """
+    priors: dict[str, dict[str, float]] = {}
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            weight = float(row['weight'])
+            if not np.isfinite(weight) or weight <= 0:
+                raise ValueError(
+                    f"Prior weight {row['weight']} of {row['disease']} in "
+                    f"{row['country']} is not positive")
+            priors.setdefault(row['country'].strip(), {})[
+                row['disease'].strip().lower()] = weight
+    return priors
+
+
 def load_mc_symptom_weights(
         csv_path: str,
         negative_diseases: list[str]
@@ -92,6 +147,8 @@ def load_mc_symptom_weights(
     Returns diseases, symptoms, and weights_by_disease dictionary mapping disease to 
     DataFrame of shape (n_iter, n_symptoms).
     """
+    import pandas as pd
+
     diseases: dict[str, list[dict[str, float]]] = {}
     symptoms: list[str] = []
     with open(csv_path, 'r', encoding='utf-8') as f:
@@ -128,6 +185,8 @@ def load_legacy_symptom_weights(
     Returns diseases, symptoms, and weights_by_disease dictionary mapping disease to 
     DataFrame of shape (n_replicates, n_symptoms) by replicating legacy weights.
     """
+    import pandas as pd
+
     diseases: dict[str, dict[str, float]] = {}
     symptoms: list[str] = []
     with open(csv_path, 'r', encoding='utf-8') as f:
@@ -264,6 +323,9 @@ def update_with_all_biomarkers_mc(
     biomarker_row: dict[str, Any]
 ) -> np.ndarray:
     """Returns updated probabilities after applying all available biomarkers sequentially."""
+    import pandas as pd
+    from scipy.stats import norm
+
     biomarker_names = sorted(
         col.replace('pooled_mean_', '')
         for col in biomarker_stats_df.columns
@@ -404,38 +466,382 @@ def fraction_mc_draws_true_in_topk_base(
     return hits / n_iter if n_iter else 0.0
 
 
-def calculate_mean_confidence_intervals(
-        negative_diseases: list[str],
-        patient_symptoms: list[str],
-        patient_biomarkers: dict[str, float],
-        biomarker_stats_df) -> dict[str, Any]:
-    """Returns result dictionary containing mean and confidence intervals."""
+def compile_model(
+    csv_path: str,
+    biomarker_stats_df: pd.DataFrame,
+    version: str = '',
+    n_replicates: int = 500,
+    country_priors: dict[int, dict[str, float]] | None = None
+) -> CompiledModel:
+    """
+    Returns a CompiledModel holding the symptom weights of every disease as one tensor and
+    the biomarker statistics of every expanded disease as mean and SD matrices.
+    `country_priors` maps country IDs to prior weights by lowercase disease name, compiled
+    into one row of log priors per country. Diseases without a weight get weight 1.
+    """
+    import pandas as pd
 
     disease_names, symptoms, weights_by_disease, n_iter = load_symptom_weights_auto(
-        csv_path=SYMPTOM_WEIGHTS_PATH, negative_diseases=negative_diseases)
-    biomarker_stats_df['disease'] = biomarker_stats_df['disease'].astype(
-        str).str.strip()
+        csv_path=csv_path, negative_diseases=[], n_replicates=n_replicates)
+    if disease_names:
+        weights = np.stack([
+            weights_by_disease[d][symptoms].to_numpy(dtype=float) for d in disease_names
+        ])
+    else:
+        weights = np.zeros((0, n_iter, len(symptoms)))
 
-    symptoms, weights_by_disease = extend_weights_for_patient_symptoms(
-        weights_by_disease, disease_names, symptoms, patient_symptoms
+    df = biomarker_stats_df.copy()
+    df['disease'] = df['disease'].astype(str).str.strip()
+    biomarker_names = sorted(
+        col.replace('pooled_mean_', '')
+        for col in df.columns
+        if col.startswith('pooled_mean_') and
+        f"pooled_sd_{col.replace('pooled_mean_', '')}" in df.columns
+    )
+    exp_names, _ = expand_probability_matrix(
+        disease_names, np.zeros((len(disease_names), 0)))
+    means = np.full((len(exp_names), len(biomarker_names)), np.nan)
+    sds = np.full((len(exp_names), len(biomarker_names)), np.nan)
+    for i, display_name in enumerate(exp_names):
+        bio_key = disease_to_biomarker_row_name(display_name)
+        if bio_key is None:
+            bio_key = display_name.strip()
+        row = get_biomarker_stats_row(df, bio_key)
+        if row is None:
+            continue
+        for j, biomarker in enumerate(biomarker_names):
+            means[i, j] = pd.to_numeric(
+                row[f'pooled_mean_{biomarker}'], errors='coerce')
+            sds[i, j] = pd.to_numeric(
+                row[f'pooled_sd_{biomarker}'], errors='coerce')
+    usable = np.isfinite(means) & np.isfinite(sds) & (sds > 0)
+    means[~usable] = np.nan
+    sds[~usable] = np.nan
+
+    countries = sorted(country_priors or {})
+    log_priors = np.zeros((len(countries), len(disease_names)))
+    for i, country_id in enumerate(countries):
+        weights_by_name = country_priors[country_id]
+        for j, name in enumerate(disease_names):
+            log_priors[i, j] = np.log(weights_by_name.get(name.strip().lower(), 1.0))
+
+    return CompiledModel(
+        version=version,
+        disease_names=disease_names,
+        symptoms=symptoms,
+        symptom_index={s: i for i, s in enumerate(symptoms)},
+        weights=weights,
+        expanded_index={d: i for i, d in enumerate(exp_names)},
+        biomarker_names=biomarker_names,
+        biomarker_means=means,
+        biomarker_sds=sds,
+        log_priors=log_priors,
+        prior_countries={country_id: i for i, country_id in enumerate(countries)}
     )
-    sum_sym_c1 = np.zeros(n_iter)
-    sum_sym_c2 = np.zeros(n_iter)
-    sum_sym_c3 = np.zeros(n_iter)
-    sum_bio_c1 = np.zeros(n_iter)
-    sum_bio_c2 = np.zeros(n_iter)
-    sum_bio_c3 = np.zeros(n_iter)
-
-    scores_sym_base = symptom_raw_scores_mc(
-        disease_names, symptoms, weights_by_disease, patient_symptoms, n_iter
+
+
+COMPILED_ARRAYS: tuple[str, ...] = (
+    'weights', 'biomarker_means', 'biomarker_sds', 'log_priors')
+
+
+def save_compiled_model(model: CompiledModel, directory: Path) -> None:
+    """
+    Writes the arrays of a compiled model as .npy files and the names as model.json, so
+    that the model can be memory-mapped by any number of processes.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in COMPILED_ARRAYS:
+        np.save(directory / f'{name}.npy', getattr(model, name))
+    expanded_names = sorted(model.expanded_index, key=model.expanded_index.get)
+    with open(directory / 'model.json', 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': model.version,
+            'disease_names': model.disease_names,
+            'symptoms': model.symptoms,
+            'expanded_names': expanded_names,
+            'biomarker_names': model.biomarker_names,
+            'prior_countries': sorted(model.prior_countries, key=model.prior_countries.get)
+        }, f)
+
+
+def load_compiled_model(directory: Path) -> CompiledModel:
+    """
+    Returns a CompiledModel whose arrays are read-only memory maps of the files written
+    by save_compiled_model. Processes mapping the same files share their pages. Models
+    compiled before country priors existed load without any.
+    """
+    with open(directory / 'model.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(directory / f'{name}.npy', mmap_mode='r')
+        for name in COMPILED_ARRAYS if (directory / f'{name}.npy').exists()
+    }
+    arrays.setdefault('log_priors', np.zeros((0, len(meta['disease_names']))))
+    return CompiledModel(
+        version=meta['version'],
+        disease_names=meta['disease_names'],
+        symptoms=meta['symptoms'],
+        symptom_index={s: i for i, s in enumerate(meta['symptoms'])},
+        expanded_index={d: i for i, d in enumerate(meta['expanded_names'])},
+        biomarker_names=meta['biomarker_names'],
+        prior_countries={
+            country_id: i for i, country_id in enumerate(meta.get('prior_countries', []))
+        },
+        **arrays
     )
+
+
+def country_log_prior(model: CompiledModel, country_id: int | None) -> np.ndarray | None:
+    """
+    Returns the log prior weights of every disease of the model in a country, or None when
+    the model has no priors for it.
+    """
+    row = model.prior_countries.get(country_id)
+    return None if row is None else model.log_priors[row]
+
+
+def compiled_symptom_raw_scores(
+    model: CompiledModel,
+    keep: list[int],
+    positive_symptoms: list[str],
+    draws: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Pre-softmax AHP scores of the kept diseases, summing the weight tensor over positive
+    symptoms. Shape (len(keep), n_iter), or (len(keep), len(draws)) when only the
+    iterations in `draws` are used. Matches symptom_raw_scores_mc.
+    """
+    n_iter = (model.weights.shape[1] if draws is None else len(draws)) if keep else 0
+    pos_set = set(positive_symptoms)
+    use_idx = [model.symptom_index[c] for c in model.symptoms if c in pos_set]
+    if not use_idx:
+        return np.zeros((len(keep), n_iter))
+    if draws is None:
+        return model.weights[:, :, use_idx].sum(axis=2)[keep]
+    return model.weights[np.ix_(keep, draws, use_idx)].sum(axis=2)
+
+
+MC_MODES: tuple[str, ...] = ('fast', 'full')
+
+
+@lru_cache(maxsize=16)
+def draw_order(n_iter: int, seed: int) -> np.ndarray:
+    """
+    Returns a read-only permutation of the iteration indices, the same for every call with
+    the same seed, so fast scoring of the same inputs always uses the same draws.
+    """
+    order = np.random.default_rng(seed).permutation(n_iter)
+    order.flags.writeable = False
+    return order
+
+
+def score_compiled_draws(
+    model: CompiledModel,
+    keep: list[int],
+    patient_symptoms: list[str],
+    patient_biomarkers: dict[str, Any],
+    log_prior: np.ndarray | None = None,
+    draws: np.ndarray | None = None
+) -> dict[str, Any]:
+    """
+    Returns the symptom scores and probabilities, the expanded disease names, and the
+    biomarker probabilities of the kept diseases over the iterations in `draws`, or every
+    iteration, with their aggregates and the seconds spent in each layer.
+    """
+    started_at = time.perf_counter()
+    disease_names = [model.disease_names[i] for i in keep]
+    scores_sym_base = compiled_symptom_raw_scores(
+        model, keep, patient_symptoms, draws)
+    if log_prior is not None:
+        scores_sym_base = scores_sym_base + log_prior[keep][:, None]
     probs_sym_base = softmax_columns(scores_sym_base)
     exp_names, probs_sym_exp = expand_probability_matrix(
         disease_names, probs_sym_base)
+    symptoms_seconds = time.perf_counter() - started_at
+
+    biomarkers_started_at = time.perf_counter()
+    if patient_biomarkers:
+        priors_bio = np.array(probs_sym_exp, dtype=float, copy=True)
+        probs_bio = update_with_compiled_biomarkers(
+            model, exp_names, priors_bio, patient_biomarkers
+        )
+    else:
+        probs_bio = np.array(probs_sym_exp, dtype=float, copy=True)
+    biomarkers_seconds = time.perf_counter() - biomarkers_started_at
+
+    return summarize_scored_draws({
+        'scores_sym_base': scores_sym_base,
+        'probs_sym_base': probs_sym_base,
+        'exp_names': exp_names,
+        'probs_bio': probs_bio,
+        'symptoms_seconds': symptoms_seconds,
+        'biomarkers_seconds': biomarkers_seconds
+    })
+
+
+def summarize_scored_draws(scored: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns `scored` with the mean raw symptom scores, the aggregates of both layers, and
+    the top-3 diseases of both layers over its draws.
+    """
+    mean_raw_base = np.mean(scored['scores_sym_base'], axis=1)
+    symptoms_aggregate = aggregate_mc(scored['probs_sym_base'])
+    biomarkers_aggregate = aggregate_mc(scored['probs_bio'])
+    return {
+        **scored,
+        'mean_raw_base': mean_raw_base,
+        'symptoms': symptoms_aggregate,
+        'biomarkers': biomarkers_aggregate,
+        'top3': (tuple(np.argsort(-mean_raw_base)[:3]),
+                 tuple(np.argsort(-biomarkers_aggregate[0])[:3]))
+    }
+
+
+def merge_scored_draws(previous: dict[str, Any], block: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns the scores and probabilities of the draws of `previous` followed by those of
+    `block`, with aggregates over all of them and the seconds spent scoring `block`.
+    """
+    return summarize_scored_draws({
+        **block,
+        **{key: np.concatenate((previous[key], block[key]), axis=1)
+           for key in ('scores_sym_base', 'probs_sym_base', 'probs_bio')}
+    })
+
+
+def draws_converged(previous: dict[str, Any], current: dict[str, Any],
+                    tolerance: float) -> bool:
+    """
+    Returns whether the top-3 diseases of both layers kept their order and no confidence
+    interval bound moved by `tolerance` or more between two scorings.
+    """
+    if previous['top3'] != current['top3']:
+        return False
+    return all(
+        np.max(np.abs(current[layer][k] - previous[layer][k]), initial=0.0) < tolerance
+        for layer in ('symptoms', 'biomarkers') for k in (1, 2)
+    )
+
+
+def update_with_compiled_biomarkers(
+    model: CompiledModel,
+    disease_names_expanded: list[str],
+    priors_mc: np.ndarray,
+    biomarker_row: dict[str, Any]
+) -> np.ndarray:
+    """
+    Returns updated probabilities after applying all available biomarkers sequentially,
+    using the precomputed biomarker statistics. Matches update_with_all_biomarkers_mc.
+    """
+    from scipy.stats import norm
+
+    rows = [model.expanded_index[d] for d in disease_names_expanded]
+    posteriors = np.array(priors_mc, dtype=float, copy=True)
+
+    for j, biomarker in enumerate(model.biomarker_names):
+        if posteriors.size == 0:
+            break
+        if biomarker not in biomarker_row or str(biomarker_row.get(biomarker, "")).strip() in (
+            '',
+            'NA',
+            'nan',
+            'None',
+        ):
+            continue
+        try:
+            observed = float(biomarker_row[biomarker])
+        except (TypeError, ValueError):
+            continue
+
+        means = model.biomarker_means[rows, j]
+        sds = model.biomarker_sds[rows, j]
+        usable = np.isfinite(means)
+        lik = np.ones(len(rows))
+        if np.any(usable):
+            lik[usable] = norm.pdf(
+                observed, loc=means[usable], scale=sds[usable])
+            lik[usable & (~np.isfinite(lik) | (lik <= 0))] = 1e-5
 
-    mean_s_base, lo_s_base, hi_s_base = aggregate_mc(probs_sym_base)
+        posteriors *= lik[:, None]
+        col_sums = posteriors.sum(axis=0, keepdims=True)
+        bad = ~np.isfinite(col_sums) | (col_sums == 0)
+        if np.any(bad):
+            posteriors = np.array(priors_mc, dtype=float, copy=True)
+            break
+        posteriors /= col_sums
+
+    return posteriors
+
+
+def calculate_mean_confidence_intervals(
+        negative_diseases: list[str],
+        patient_symptoms: list[str],
+        patient_biomarkers: dict[str, float],
+        biomarker_stats_df=None,
+        model: CompiledModel | None = None,
+        timings: dict[str, float] | None = None,
+        log_prior: np.ndarray | None = None,
+        mode: str = 'full',
+        min_draws: int = 64,
+        tolerance: float = 0.01,
+        seed: int = 0) -> dict[str, Any]:
+    """
+    Returns result dictionary containing mean and confidence intervals.
+    The model is compiled from SYMPTOM_WEIGHTS_PATH and biomarker_stats_df when not given.
+    When `timings` is given, the seconds spent scoring symptoms, updating with biomarkers,
+    and aggregating the draws are stored in it.
+    `log_prior`, from country_log_prior, is added to the symptom scores of every draw
+    before the softmax, shifting the symptom layer towards diseases common in a region.
+
+    In 'full' mode every iteration of the weight tensor is used. In 'fast' mode a seeded
+    subsample of `min_draws` iterations is scored and doubled until the top-3 diseases of
+    both layers keep their order and every confidence interval bound moves less than
+    `tolerance`, or every iteration is used. The number of draws used is reported as
+    'mc_draws' out of 'mc_draws_total'.
+    """
+    if model is None:
+        model = compile_model(SYMPTOM_WEIGHTS_PATH, biomarker_stats_df)
+    if mode not in MC_MODES:
+        raise ValueError(f'Unknown Monte Carlo mode {mode}, expected one of {MC_MODES}')
+    started_at = time.perf_counter()
+
+    negative = set(negative_diseases)
+    keep = [i for i, d in enumerate(model.disease_names) if d not in negative]
+    disease_names = [model.disease_names[i] for i in keep]
+
+    n_iter = model.weights.shape[1]
+    symptoms_seconds = biomarkers_seconds = 0.0
+    if mode == 'fast' and keep and 0 < min_draws < n_iter:
+        order = draw_order(n_iter, seed)
+        n_draws = 0
+        scored = None
+        while n_draws < n_iter:
+            # Only the draws added to the prefix are scored, sorted to read the weight tensor
+            # in memory order; aggregates ignore order.
+            next_draws = min(2 * n_draws, n_iter) if n_draws else min_draws
+            block = score_compiled_draws(
+                model, keep, patient_symptoms, patient_biomarkers, log_prior,
+                np.sort(order[n_draws:next_draws]))
+            symptoms_seconds += block['symptoms_seconds']
+            biomarkers_seconds += block['biomarkers_seconds']
+            previous = scored
+            scored = block if previous is None else merge_scored_draws(previous, block)
+            n_draws = next_draws
+            if previous is not None and draws_converged(previous, scored, tolerance):
+                break
+    else:
+        scored = score_compiled_draws(
+            model, keep, patient_symptoms, patient_biomarkers, log_prior)
+        symptoms_seconds = scored['symptoms_seconds']
+        biomarkers_seconds = scored['biomarkers_seconds']
+        n_draws = n_iter
+
+    probs_sym_base = scored['probs_sym_base']
+    exp_names = scored['exp_names']
+
+    mean_s_base, lo_s_base, hi_s_base = scored['symptoms']
     mean_s, lo_s, hi_s = mean_s_base, lo_s_base, hi_s_base
-    mean_raw_base = np.mean(scores_sym_base, axis=1)
+    mean_raw_base = scored['mean_raw_base']
     order_base = np.argsort(-mean_raw_base)
     i_top = int(order_base[0]) if len(order_base) > 0 else 0
     top_disease_symptoms = disease_names[i_top] if disease_names else ""
@@ -455,33 +861,14 @@ def calculate_mean_confidence_intervals(
             order_base) > 2 else None
     )
 
-    if patient_biomarkers:
-        priors_bio = np.array(probs_sym_exp, dtype=float, copy=True)
-        probs_bio = update_with_all_biomarkers_mc(
-            exp_names, priors_bio, biomarker_stats_df, patient_biomarkers
-        )
-    else:
-        probs_bio = np.array(probs_sym_exp, dtype=float, copy=True)
-
-    s1, s2, s3 = cohort_accuracy_per_iteration(
-        probs_sym_base, disease_names, ""
-    )
     sym_frac_top1 = fraction_mc_draws_true_in_topk_base(
         probs_sym_base, disease_names, '', 1
     )
     sym_frac_top3 = fraction_mc_draws_true_in_topk_base(
         probs_sym_base, disease_names, '', 3
     )
-    b1, b2, b3 = cohort_accuracy_per_iteration(
-        probs_bio, exp_names, '')
-    sum_sym_c1 += s1
-    sum_sym_c2 += s2
-    sum_sym_c3 += s3
-    sum_bio_c1 += b1
-    sum_bio_c2 += b2
-    sum_bio_c3 += b3
-
-    mean_b, lo_b, hi_b = aggregate_mc(probs_bio)
+
+    mean_b, lo_b, hi_b = scored['biomarkers']
     bio_ranked = rank_by_mean(exp_names, mean_b)
     top_disease_biomarkers = bio_ranked[0][0] if bio_ranked else ''
     top_mean_bio = bio_ranked[0][1] if bio_ranked else float('nan')
@@ -520,5 +907,12 @@ def calculate_mean_confidence_intervals(
         'biomarker_mean': dict(zip(exp_names, mean_b)),
         'biomarker_ci_low': dict(zip(exp_names, lo_b)),
         'biomarker_ci_high': dict(zip(exp_names, hi_b)),
+        'mc_draws': int(n_draws),
+        'mc_draws_total': int(n_iter),
     }
+    if timings is not None:
+        timings['symptoms'] = symptoms_seconds
+        timings['biomarkers'] = biomarkers_seconds
+        timings['aggregation'] = time.perf_counter() - started_at - \
+            symptoms_seconds - biomarkers_seconds
     return result
@@ -0,0 +1,60 @@
+"""Attribute memory use to the API process and its child processes."""
+import os
+from pathlib import Path
+
+PROC: Path = Path('/proc')
+
+
+def memory_usage(pid: int) -> dict[str, int]:
+    """
+    Get the resident, proportional, shared, and private memory of a process in bytes.
+
+    The proportional set size divides each shared page among the processes mapping it,
+    so summing it over processes does not count a shared model more than once. Returns an
+    empty mapping where /proc/<pid>/smaps_rollup is unavailable.
+    """
+    try:
+        text: str = (PROC / str(pid) / 'smaps_rollup').read_text(encoding='utf-8')
+    except OSError:
+        return {}
+    usage: dict[str, int] = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    for line in text.splitlines()[1:]:
+        key, _, rest = line.partition(':')
+        fields: list[str] = rest.split()
+        if not fields:
+            continue
+        size: int = int(fields[0]) * 1024
+        if key == 'Rss':
+            usage['rss'] = size
+        elif key == 'Pss':
+            usage['pss'] = size
+        elif key.startswith('Shared_'):
+            usage['shared'] += size
+        elif key.startswith('Private_'):
+            usage['private'] += size
+    return usage
+
+
+def child_pids(pid: int) -> list[int]:
+    """Get the IDs of the direct child processes of a process."""
+    children: list[int] = []
+    for stat in PROC.glob('[0-9]*/stat'):
+        try:
+            fields: list[str] = stat.read_text(encoding='utf-8').rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(stat.parent.name))
+    return children
+
+
+def memory_attribution() -> dict[tuple[str, ...], float]:
+    """Get the memory of this process and each of its children by pid, role, and kind."""
+    pid: int = os.getpid()
+    processes: list[tuple[int, str]] = [(pid, 'api')]
+    processes += [(child, 'child') for child in child_pids(pid)]
+    return {
+        (str(process), role, kind): float(size)
+        for process, role in processes
+        for kind, size in memory_usage(process).items()
+    }
@@ -0,0 +1,321 @@
+"""In-process metrics rendered in the Prometheus text exposition format."""
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+LabelValues = tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: tuple[str, ...], values: LabelValues,
+                  extra: dict[str, str] | None = None) -> str:
+    """Format label names and values as a Prometheus label set."""
+    pairs: list[tuple[str, str]] = list(zip(names, values))
+    pairs += list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class Metric(ABC):
+    """Base class of a metric family with optional labels."""
+    kind: str = 'untyped'
+    # Whether merged states keep one sample per worker, under an extra `worker` label.
+    per_worker: bool = False
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labels: tuple[str, ...] = labels
+        self.lock: Lock = Lock()
+
+    @abstractmethod
+    def state(self) -> list[list[Any]]:
+        """Return the values of every label set as JSON-serializable rows."""
+
+    @abstractmethod
+    def merge(self, states: list[tuple[str, list[list[Any]]]]) -> list[list[Any]]:
+        """Combine the states of several worker processes, keyed by worker, into one."""
+
+    @abstractmethod
+    def samples(self, state: list[list[Any]], names: tuple[str, ...]) -> list[str]:
+        """Return the sample lines of a state of the metric family with label `names`."""
+
+    def render(self, merged: list[list[Any]] | None = None) -> str:
+        """Render the metric family, or a merged state of it, with its help and type lines."""
+        lines: list[str] = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}'
+        ]
+        if merged is None:
+            return '\n'.join(lines + self.samples(self.state(), self.labels))
+        names: tuple[str, ...] = self.labels + ('worker',) if self.per_worker else self.labels
+        return '\n'.join(lines + self.samples(merged, names))
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set."""
+    kind: str = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Increase the counter of the label set."""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        """Get the current value of the label set."""
+        with self.lock:
+            return self.values.get(labels, 0.0)
+
+    def state(self) -> list[list[Any]]:
+        with self.lock:
+            return [[list(labels), value] for labels, value in self.values.items()]
+
+    def merge(self, states: list[tuple[str, list[list[Any]]]]) -> list[list[Any]]:
+        totals: dict[LabelValues, float] = {}
+        for _worker, state in states:
+            for labels, value in state:
+                totals[tuple(labels)] = totals.get(tuple(labels), 0.0) + value
+        return [[list(labels), value] for labels, value in totals.items()]
+
+    def samples(self, state: list[list[Any]], names: tuple[str, ...]) -> list[str]:
+        if not state and not names:
+            state = [[[], 0.0]]
+        return [f'{self.name}{format_labels(names, tuple(labels))} {value}'
+                for labels, value in state]
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down, or is read from a callback when rendered.
+
+    A callback of a gauge with labels returns the value of every label set.
+    """
+    kind: str = 'gauge'
+    per_worker: bool = True
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 callback: Callable[[], float | dict[LabelValues, float]] | None = None) -> None:
+        super().__init__(name, documentation, labels)
+        self.values: dict[LabelValues, float] = {}
+        self.callback: Callable[[], float | dict[LabelValues, float]] | None = callback
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set the gauge of the label set."""
+        with self.lock:
+            self.values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Increase the gauge of the label set."""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """Decrease the gauge of the label set."""
+        self.inc(*labels, amount=-amount)
+
+    def state(self) -> list[list[Any]]:
+        if self.callback is not None and not self.labels:
+            return [[[], self.callback()]]
+        if self.callback is not None:
+            values = self.callback()
+        else:
+            with self.lock:
+                values = dict(self.values)
+        if not values and not self.labels:
+            values[()] = 0.0
+        return [[list(labels), value] for labels, value in values.items()]
+
+    def merge(self, states: list[tuple[str, list[list[Any]]]]) -> list[list[Any]]:
+        return [[[*labels, worker], value]
+                for worker, state in states for labels, value in state]
+
+    def samples(self, state: list[list[Any]], names: tuple[str, ...]) -> list[str]:
+        return [f'{self.name}{format_labels(names, tuple(labels))} {value}'
+                for labels, value in state]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+    kind: str = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: dict[LabelValues, list[int]] = {}
+        self.sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record an observation for the label set."""
+        index: int = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.counts.setdefault(
+                labels, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self.sums[labels] = self.sums.get(labels, 0.0) + value
+
+    def state(self) -> list[list[Any]]:
+        with self.lock:
+            return [[list(labels), list(counts), self.sums[labels]]
+                    for labels, counts in self.counts.items()]
+
+    def merge(self, states: list[tuple[str, list[list[Any]]]]) -> list[list[Any]]:
+        totals: dict[LabelValues, list[Any]] = {}
+        for _worker, state in states:
+            for labels, counts, total in state:
+                merged = totals.setdefault(tuple(labels), [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        return [[list(labels), counts, total] for labels, (counts, total) in totals.items()]
+
+    def samples(self, state: list[list[Any]], names: tuple[str, ...]) -> list[str]:
+        lines: list[str] = []
+        for labels, bucket_counts, total in state:
+            values: LabelValues = tuple(labels)
+            cumulative: int = 0
+            for bound, count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += count
+                le: str = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{format_labels(names, values, {'le': le})} "
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{self.name}_sum{format_labels(names, values)} {total}')
+            lines.append(
+                f'{self.name}_count{format_labels(names, values)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """
+    Collection of metric families rendered together.
+
+    Forked API workers each count in their own memory. Once `share` is given a directory,
+    every worker writes its state there and rendering merges the states of all of them:
+    counters and histograms are summed, and gauges get a `worker` label per process. A
+    scrape reaching any worker then reports the whole server.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.lock: Lock = Lock()
+        self.directory: Path | None = None
+
+    def register(self, metric: Metric) -> Metric:
+        """Register a metric family, returning the existing one with the same name."""
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        """Create or get a counter."""
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+              callback: Callable[[], float | dict[LabelValues, float]] | None = None) -> Gauge:
+        """Create or get a gauge."""
+        return self.register(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Create or get a histogram."""
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def share(self, directory: Path | None) -> None:
+        """Merge the metrics of every process writing to `directory` when rendering."""
+        self.directory = directory
+
+    def dump(self) -> None:
+        """Write the state of this process to the shared directory, replacing the last one."""
+        if self.directory is None:
+            return
+        with self.lock:
+            metrics = list(self.metrics.values())
+        path: Path = self.directory / f'{os.getpid()}.json'
+        staging: Path = path.with_suffix('.tmp')
+        with open(staging, 'w', encoding='utf-8') as file:
+            json.dump({metric.name: metric.state() for metric in metrics}, file)
+        os.replace(staging, path)
+
+    def load(self) -> dict[str, list[tuple[str, list[list[Any]]]]]:
+        """Read the states of every process in the shared directory by metric name."""
+        states: dict[str, list[tuple[str, list[list[Any]]]]] = {}
+        for path in sorted(self.directory.glob('*.json')):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    dumped: dict[str, list[list[Any]]] = json.load(file)
+            except (OSError, ValueError):
+                logger.warning('Skipping unreadable metrics file %s', path)
+                continue
+            for name, state in dumped.items():
+                states.setdefault(name, []).append((path.stem, state))
+        return states
+
+    def render(self) -> str:
+        """Render every metric family in the Prometheus text format."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        if self.directory is None:
+            return '\n'.join(metric.render() for metric in metrics) + '\n'
+        self.dump()
+        states: dict[str, list[tuple[str, list[list[Any]]]]] = self.load()
+        return '\n'.join(
+            metric.render(metric.merge(states.get(metric.name, []))) for metric in metrics
+        ) + '\n'
+
+
+REGISTRY: Registry = Registry()
+
+
+class MetricsWriter:
+    """Write the metrics of a worker process to the shared directory on a background thread."""
+
+    def __init__(self, registry: Registry, interval: float) -> None:
+        self.registry: Registry = registry
+        self.interval: float = interval
+        self.stopping: Event = Event()
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        """Start writing, unless the registry is not shared."""
+        if self.registry.directory is None:
+            return
+        self.stopping.clear()
+        self.thread = Thread(target=self.run, name='metrics-writer', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop writing, after writing the final state."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(5.0)
+            self.thread = None
+            self.registry.dump()
+
+    def run(self) -> None:
+        """Write the metrics every interval until stopped."""
+        while not self.stopping.wait(self.interval):
+            try:
+                self.registry.dump()
+            except OSError:
+                logger.exception('Failed to write the shared metrics')
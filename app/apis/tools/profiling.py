@@ -0,0 +1,186 @@
+"""Measure the phases of application startup and profile individual requests."""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+HEAVY_MODULES: tuple[str, ...] = ('boto3', 'pandas', 'scipy')
+
+
+class StartupProfile:
+    """Durations of named startup phases, measured from when the profile was created."""
+
+    def __init__(self) -> None:
+        self.started_at: float = time.perf_counter()
+        self.marked_at: float = self.started_at
+        self.phases: list[tuple[str, float]] = []
+
+    def start(self) -> None:
+        """Restart the clock, dropping any recorded phases."""
+        self.started_at = self.marked_at = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name: str) -> None:
+        """Record the time since the previous mark as a phase."""
+        now: float = time.perf_counter()
+        self.phases.append((name, now - self.marked_at))
+        self.marked_at = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the time spent in the block as a phase."""
+        self.marked_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name)
+
+    def log(self) -> None:
+        """Log every phase, the total, and which heavy modules were loaded during startup."""
+        phases: str = ' '.join(f'{name}={duration:.3f}s' for name, duration in self.phases)
+        loaded: list[str] = [module for module in HEAVY_MODULES if module in sys.modules]
+        logger.info('Startup profile: %s total=%.3fs heavy_modules_loaded=%s',
+                    phases, time.perf_counter() - self.started_at,
+                    ','.join(loaded) or 'none')
+
+
+startup_profile: StartupProfile = StartupProfile()
+
+
+def collapse_stack(frame) -> str:
+    """Format a stack as semicolon-separated frames from the outermost to the innermost."""
+    frames: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+                      f'{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class RequestProfile:
+    """
+    Sampled stacks, top allocation sites, and anonymized model inputs of one request.
+
+    Stacks of the thread running the endpoint are sampled every `interval` seconds and
+    saved in the collapsed format read by flamegraph.pl and speedscope. Allocations are
+    traced with tracemalloc, which is process-wide, so only one request is profiled at a
+    time. The model inputs are saved without patient identifiers, so the case can be
+    replayed against the compiled model with `python -m apis.tools.replay`.
+    """
+
+    lock: threading.Lock = threading.Lock()
+
+    def __init__(self, interval: float) -> None:
+        self.id: str = uuid4().hex
+        self.interval: float = interval
+        self.stacks: Counter[str] = Counter()
+        self.inputs: list[dict[str, Any]] = []
+        self.allocations: list[dict[str, Any]] = []
+        self.stopping: threading.Event = threading.Event()
+        self.tracing: bool = False
+
+    @classmethod
+    def claim(cls, interval: float) -> 'RequestProfile | None':
+        """Create a profile unless another request is being profiled."""
+        if not cls.lock.acquire(blocking=False):
+            return None
+        return cls(interval)
+
+    def release(self) -> None:
+        """Let another request be profiled."""
+        self.lock.release()
+
+    def sample(self, thread_id: int) -> None:
+        """Sample the stack of a thread until stopped."""
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)  # pylint: disable=protected-access
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    @contextmanager
+    def record(self) -> Iterator[None]:
+        """Sample the current thread and trace allocations while the block runs."""
+        self.stopping.clear()
+        sampler: threading.Thread = threading.Thread(
+            target=self.sample, args=(threading.get_ident(),), name='profiler', daemon=True)
+        self.tracing = not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start(16)
+        sampler.start()
+        try:
+            yield
+        finally:
+            self.stopping.set()
+            sampler.join()
+            snapshot = tracemalloc.take_snapshot()
+            if self.tracing:
+                tracemalloc.stop()
+            self.allocations = [
+                {'site': str(statistic.traceback[0]), 'bytes': statistic.size,
+                 'count': statistic.count}
+                for statistic in snapshot.statistics('lineno')[:25]
+            ]
+
+    def add_inputs(self, model_name: str, model_version: str, negative_diseases: list[str],
+                   positive_symptoms: list[str], biomarker_row: dict[str, float],
+                   country_id: int | None = None,
+                   monte_carlo: dict[str, Any] | None = None) -> None:
+        """
+        Keep the inputs of a model run for replaying it, with the country of its priors and
+        the Monte Carlo settings passed to calculate_mean_confidence_intervals.
+        """
+        self.inputs.append({
+            'model': model_name,
+            'model_version': model_version,
+            'negative_diseases': list(negative_diseases),
+            'patient_symptoms': list(positive_symptoms),
+            'patient_biomarkers': dict(biomarker_row),
+            'country_id': country_id,
+            'monte_carlo': dict(monte_carlo or {})
+        })
+
+    def collapsed(self) -> str:
+        """Format the sampled stacks in the collapsed stack format."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def save(self, directory: Path, route: str, phases: dict[str, float]) -> None:
+        """Write the collapsed stacks and a JSON report of the request to a directory."""
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f'{self.id}.folded').write_text(self.collapsed(), encoding='utf-8')
+        (directory / f'{self.id}.json').write_text(json.dumps({
+            'id': self.id,
+            'route': route,
+            'interval': self.interval,
+            'samples': sum(self.stacks.values()),
+            'phases': phases,
+            'allocations': self.allocations,
+            'inputs': self.inputs
+        }, indent=2), encoding='utf-8')
+
+
+request_profile: ContextVar[RequestProfile | None] = ContextVar(
+    'request_profile', default=None)
+
+
+@contextmanager
+def profiled() -> Iterator[None]:
+    """Profile the block if the current request is being profiled."""
+    profile: RequestProfile | None = request_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.record():
+        yield
+
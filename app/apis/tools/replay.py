@@ -0,0 +1,50 @@
+"""Replay the model inputs saved with a request profile against the compiled model."""
+import argparse
+import json
+import time
+from typing import Any
+
+from apis.config import COMPILED_MODEL_DIR
+from apis.tools.afi_model import (
+    calculate_mean_confidence_intervals, country_log_prior, load_compiled_model
+)
+
+
+def main() -> None:
+    """Replay the model inputs of a saved request profile."""
+    parser = argparse.ArgumentParser(
+        description='Replay the model inputs of a request profile against the compiled model.')
+    parser.add_argument('path', help='JSON report of a request profile')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Number of times to run each input')
+    args = parser.parse_args()
+    with open(args.path, encoding='utf-8') as file:
+        report: dict[str, Any] = json.load(file)
+    for case in report['inputs']:
+        model = load_compiled_model(COMPILED_MODEL_DIR / case['model_version'])
+        # Profiles saved before the Monte Carlo settings were recorded used every draw.
+        monte_carlo: dict[str, Any] = case.get('monte_carlo') or {'mode': 'full'}
+        timings: dict[str, float] = {}
+        started_at: float = time.perf_counter()
+        for _ in range(args.repeat):
+            results: dict[str, Any] = calculate_mean_confidence_intervals(
+                negative_diseases=case['negative_diseases'],
+                patient_symptoms=case['patient_symptoms'],
+                patient_biomarkers=case['patient_biomarkers'],
+                model=model,
+                timings=timings,
+                log_prior=country_log_prior(model, case.get('country_id')),
+                **monte_carlo
+            )
+        elapsed: float = (time.perf_counter() - started_at) / args.repeat
+        print(f"{case['model']} {case['model_version']} ({monte_carlo['mode']}): "
+              f"{elapsed * 1000:.1f} ms per run, "
+              f"last run {', '.join(f'{k}={v * 1000:.1f} ms' for k, v in timings.items())}")
+        print('  symptoms top 3:',
+              [results[f'symptoms_top{rank}'] for rank in (1, 2, 3)])
+        print('  biomarkers top 3:',
+              [results[f'biomarkers_top{rank}'] for rank in (1, 2, 3)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Time the phases of a request for the Server-Timing header and the request log."""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Coroutine, Iterator
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from apis.tools.profiling import profiled
+
+
+class RequestTimings:
+    """
+    Durations in seconds of the phases of one request, summed over repeated phases, and
+    counts of the operations it performed.
+    """
+
+    def __init__(self) -> None:
+        self.started_at: float = time.perf_counter()
+        self.endpoint_finished_at: float | None = None
+        self.phases: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.lock: Lock = Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time spent in a phase."""
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Count an operation."""
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def finish(self) -> dict[str, float]:
+        """Record the total duration of the request and return every phase."""
+        self.add('total', time.perf_counter() - self.started_at)
+        with self.lock:
+            return dict(self.phases)
+
+    def server_timing(self) -> str:
+        """Format the phases as a Server-Timing header value in milliseconds."""
+        with self.lock:
+            return ', '.join(f'{phase};dur={seconds * 1000:.1f}'
+                             for phase, seconds in self.phases.items())
+
+
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    'request_timings', default=None)
+
+
+def record(phase: str, seconds: float) -> None:
+    """Add time spent in a phase to the current request, if there is one."""
+    timings: RequestTimings | None = request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Count an operation of the current request, if there is one."""
+    timings: RequestTimings | None = request_timings.get()
+    if timings is not None:
+        timings.increment(name, amount)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to a phase of the current request."""
+    started_at: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started_at)
+
+
+def finish_endpoint() -> None:
+    """Note that the endpoint returned, so the rest of the handler counts as serialization."""
+    timings: RequestTimings | None = request_timings.get()
+    if timings is not None:
+        timings.endpoint_finished_at = time.perf_counter()
+
+
+class TimedRoute(APIRoute):
+    """
+    Route recording the time spent in its endpoint and serializing its response, and
+    profiling the endpoint when the request is being profiled.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        endpoint: Callable[..., Any] = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            async def call(**values: Any) -> Any:
+                try:
+                    with timed('endpoint'), profiled():
+                        return await endpoint(**values)
+                finally:
+                    finish_endpoint()
+        else:
+            def call(**values: Any) -> Any:
+                try:
+                    with timed('endpoint'), profiled():
+                        return endpoint(**values)
+                finally:
+                    finish_endpoint()
+        self.dependant.call = call
+        handler: Callable[[Request], Coroutine[Any, Any, Response]] = \
+            super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            response: Response = await handler(request)
+            timings: RequestTimings | None = request_timings.get()
+            if timings is not None and timings.endpoint_finished_at is not None:
+                timings.add('serialize', time.perf_counter() - timings.endpoint_finished_at)
+            return response
+
+        return timed_handler
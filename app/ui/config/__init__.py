@@ -1,10 +1,13 @@
 """Configuration settings for the Streamlit app."""
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Final
+from typing import Any, Callable, Final
 
 import streamlit as st
 from streamlit_cookies_controller import CookieController
 
+from config.client import ApiClient
+
 
 FAST_API_BASE_URL: Final[str] = st.secrets.get('FAST_API_BASE_URL')
 
@@ -13,6 +16,10 @@ FAST_API_CONNECT_TIMEOUT: Final[int] = st.secrets.get(
 
 FAST_API_READ_TIMEOUT: Final[int] = st.secrets.get('FAST_API_READ_TIMEOUT', 30)
 
+FAST_API_MAX_RETRIES: Final[int] = st.secrets.get('FAST_API_MAX_RETRIES', 2)
+
+FAST_API_POOL_SIZE: Final[int] = st.secrets.get('FAST_API_POOL_SIZE', 10)
+
 FEBRILOGIC_LOGO: Final[str] = Path(
     __file__).parent.parent / 'assets' / 'febrilogic.png'
 
@@ -31,3 +38,35 @@ STREAMLIT_BASE_URL: Final[str] = st.secrets.get(
 )
 
 controller = CookieController()
+
+
+@st.cache_resource
+def get_api_client() -> ApiClient:
+    """Get the API client shared by every session of the app."""
+    return ApiClient(FAST_API_BASE_URL, (FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT),
+                     FAST_API_MAX_RETRIES, FAST_API_POOL_SIZE)
+
+
+def notify_next_page(message: str, icon: str) -> None:
+    """Show a toast on the page the user is switched to next."""
+    st.session_state.notice = (message, icon)
+
+
+def show_notice() -> None:
+    """Show the toast left by the previous page, if any."""
+    notice: tuple[str, str] | None = st.session_state.pop('notice', None)
+    if notice:
+        st.toast(notice[0], icon=notice[1])
+
+
+def prefetch(key: str, fetch: Callable[[], Any]) -> None:
+    """Start fetching data for the next page in the background, once per session."""
+    futures: dict[str, Future] = st.session_state.setdefault('prefetched', {})
+    if key not in futures:
+        futures[key] = get_api_client().submit(fetch)
+
+
+def prefetched(key: str, fetch: Callable[[], Any]) -> Future:
+    """Get the request a previous page prefetched, or start it now if it did not."""
+    future: Future | None = st.session_state.get('prefetched', {}).pop(key, None)
+    return get_api_client().submit(fetch) if future is None else future
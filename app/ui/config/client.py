@@ -0,0 +1,207 @@
+"""Call the FastAPI backend over a pooled keep-alive session."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ApiError(requests.HTTPError):
+    """Error response from the FastAPI backend, carrying its detail message."""
+
+    def __init__(self, response: requests.Response) -> None:
+        try:
+            detail: Any = response.json().get('detail', 'Unknown error')
+        except ValueError:
+            detail = response.text or 'Unknown error'
+        self.status_code: int = response.status_code
+        self.detail: str = str(detail)
+        super().__init__(self.detail, response=response)
+
+
+class ApiClient:
+    """
+    Client for every FastAPI endpoint used by the pages.
+
+    Requests share a pool of keep-alive connections, so each page does not open a new TCP
+    and TLS connection. Failed connections are retried for every method, while 502, 503
+    and 504 responses are retried, honoring Retry-After, only for GET requests.
+
+    Independent requests can run concurrently on the client's thread pool, sized like the
+    connection pool, with `gather` or `submit`.
+    """
+
+    def __init__(self, base_url: str, timeout: tuple[float, float],
+                 max_retries: int = 2, pool_size: int = 10) -> None:
+        self.base_url: str = base_url.rstrip('/')
+        self.timeout: tuple[float, float] = timeout
+        retry: Retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(('GET',)),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter: HTTPAdapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session: requests.Session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix='api')
+
+    def submit(self, call: Callable[[], Any]) -> Future:
+        """Run a call in the background; it must not use Streamlit elements."""
+        return self.executor.submit(call)
+
+    def gather(self, **calls: Callable[[], Any]) -> dict[str, Any]:
+        """Run independent calls concurrently and return their results by name."""
+        futures: dict[str, Future] = {name: self.submit(call) for name, call in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def send(self, method: str, path: str, token: str | None = None,
+             **kwargs: Any) -> requests.Response:
+        """Send a request, raising ApiError for error responses."""
+        headers: dict[str, str] = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        response: requests.Response = self.session.request(
+            method, f'{self.base_url}{path}', headers=headers, timeout=self.timeout, **kwargs)
+        if not response.ok:
+            raise ApiError(response)
+        return response
+
+    def request(self, method: str, path: str, token: str | None = None,
+                **kwargs: Any) -> dict[str, Any]:
+        """Send a request and return its JSON body, raising ApiError for error responses."""
+        return self.send(method, path, token, **kwargs).json()
+
+    def login(self, email: str, password: str) -> str:
+        """Get an access token for a user."""
+        return self.request('POST', '/auth/token',
+                            data={'username': email, 'password': password}
+                            ).get('access_token', '')
+
+    def register(self, email: str, password: str) -> None:
+        """Register a user, who then receives a verification email."""
+        self.request('POST', '/auth', json={'email': email, 'password': password})
+
+    def request_password_reset(self, email: str) -> None:
+        """Send a password reset email to a user."""
+        self.request('POST', '/auth/request-password-reset', json={'email': email})
+
+    def reset_password(self, reset_token: str, new_password: str) -> None:
+        """Set a new password using the token from a password reset email."""
+        self.request('POST', '/auth/reset-password',
+                     json={'token': reset_token, 'new_password': new_password})
+
+    def change_password(self, token: str, current_password: str, new_password: str) -> None:
+        """Change the password of the logged-in user."""
+        self.request('POST', '/auth/change-password', token,
+                     json={'current_password': current_password,
+                           'new_password': new_password})
+
+    def patients(self, token: str, after: int = 0, limit: int | None = None, search: str = '',
+                 updated_since: str | None = None) -> dict[str, Any]:
+        """
+        Get a page of the logged-in user's patients after the patient ID `after`.
+
+        Returns the patients and `next_after`, the `after` of the next page or None.
+        """
+        params: dict[str, Any] = {'after': after}
+        if limit is not None:
+            params['limit'] = limit
+        if search:
+            params['search'] = search
+        if updated_since:
+            params['updated_since'] = updated_since
+        return self.request('GET', '/api/patients', token, params=params)
+
+    def changed_patients(self, token: str, updated_since: str) -> list[dict[str, Any]]:
+        """Get every patient of the logged-in user added or changed since a time."""
+        patients: list[dict[str, Any]] = []
+        after: int | None = 0
+        while after is not None:
+            page: dict[str, Any] = self.patients(token, after, updated_since=updated_since)
+            patients.extend(page['patients'])
+            after = page['next_after']
+        return patients
+
+    def save_patient(self, token: str, patient: dict[str, Any],
+                     patient_id: int | None = None) -> int:
+        """Add a patient, or update one if `patient_id` is given, and return its ID."""
+        path: str = '/api/patients' if patient_id is None else f'/api/patients/{patient_id}'
+        return self.request('POST', path, token, json=patient).get('patient_id')
+
+    def countries(self, token: str) -> list[dict[str, Any]]:
+        """Get every country."""
+        return self.request('GET', '/api/countries', token).get('countries', [])
+
+    def diseases(self, token: str) -> list[str]:
+        """Get the names of every disease."""
+        return self.request('GET', '/api/diseases', token).get('diseases', [])
+
+    def symptoms(self, token: str) -> dict[str, list[list[str]]]:
+        """Get the symptom names and definitions of every symptom category."""
+        return self.request('GET', '/api/symptoms/categories-definitions', token).get(
+            'category_symptom_definition', {})
+
+    def biomarkers(self, token: str) -> list[dict[str, str]]:
+        """Get every biomarker with its standard unit and reference range."""
+        return self.request('GET', '/api/biomarkers', token).get('biomarkers', [])
+
+    def biomarker_units(self, token: str) -> dict[str, list[str]]:
+        """Get the units each biomarker can be entered in."""
+        return self.request('GET', '/api/biomarkers/units', token).get('biomarker_units', {})
+
+    def submit_encounter(
+        self, token: str, patient_id: int, encounter: dict[str, Any]
+    ) -> tuple[dict[str, Any], str | None, str | None]:
+        """
+        Upload the lab results of a patient and return the disease rankings, their ETag, and
+        the Monte Carlo mode the API ranked them in.
+        """
+        response: requests.Response = self.send(
+            'POST', f'/api/patients/{patient_id}/encounter', token,
+            json=encounter, params={'calculate': True})
+        body: dict[str, Any] = response.json()
+        return body.get('results', {}), response.headers.get('ETag'), body.get('mc_mode')
+
+    def calculate(self, token: str, patient_id: int, etag: str | None = None,
+                  mc_mode: str | None = None) -> tuple[dict[str, Any] | None, str | None]:
+        """
+        Rank the diseases of a patient from their latest lab results.
+
+        `mc_mode` is 'fast' or 'full', or None for the API's default Monte Carlo mode.
+        Returns the rankings and their ETag. When `etag` is given and the lab results and
+        model have not changed since, the rankings are None and the cached ones still apply.
+        """
+        response: requests.Response = self.send(
+            'GET', f'/api/patients/{patient_id}/calculate', token,
+            headers={'If-None-Match': etag} if etag else {},
+            params={'mc_mode': mc_mode} if mc_mode else {})
+        if response.status_code == 304:
+            return None, response.headers.get('ETag', etag)
+        return response.json().get('results', {}), response.headers.get('ETag')
+
+    def results(self, token: str, patient_id: int, limit: int = 20) -> list[dict[str, Any]]:
+        """Get the previously computed disease rankings of a patient, newest first."""
+        return self.request('GET', f'/api/patients/{patient_id}/results', token,
+                            params={'limit': limit}).get('results', [])
+
+    def disease_trends(self, token: str, weeks: int, country_id: int | None = None,
+                       ranking: str | None = None) -> list[dict[str, Any]]:
+        """Get the mean probability of every disease by country and week, for admins."""
+        params: dict[str, Any] = {'weeks': weeks}
+        if country_id is not None:
+            params['country_id'] = country_id
+        if ranking is not None:
+            params['ranking'] = ranking
+        return self.request('GET', '/api/analytics/diseases', token,
+                            params=params).get('trends', [])
+
+    def contact(self, token: str, message: dict[str, str]) -> None:
+        """Send a support request."""
+        self.request('POST', '/api/contact', token, json=message)
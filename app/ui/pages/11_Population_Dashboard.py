@@ -0,0 +1,109 @@
+"""Show Population Dashboard page for FebriLogic."""
+from typing import Any, Final
+
+import streamlit as st
+from pandas import DataFrame
+from requests.exceptions import ConnectionError as RequestConnectionError
+
+from config import controller, FEBRILOGIC_LOGO, get_api_client
+from config.client import ApiError
+
+st.set_page_config(
+    page_title='Population Dashboard',
+    page_icon=':material/public:',
+    layout='wide',
+    initial_sidebar_state='expanded'
+)
+
+st.logo(FEBRILOGIC_LOGO, size='large', link='https://www.febrilogic.com')
+
+if 'token' not in st.session_state:
+    token: str = controller.get('token')
+    if token:
+        st.session_state['token'] = token
+else:
+    token: str = st.session_state['token']
+
+if token:
+    controller.set('token', token)
+else:
+    st.error('Please log in to access the population dashboard.')
+    st.stop()
+
+st.title('🌍 Population Dashboard')
+
+ALL_COUNTRIES: Final[str] = 'All countries'
+
+RANKINGS: Final[dict[str, str]] = {
+    'Symptoms': 'symptoms',
+    'Symptoms + Biomarkers': 'biomarkers'
+}
+
+client = get_api_client()
+
+
+@st.cache_data(show_spinner=False, ttl=5 * 60)
+def fetch_trends(access_token: str, weeks: int, ranking: str) -> list[dict[str, Any]]:
+    """Fetch the mean disease probabilities by country and week from the FastAPI server."""
+    return client.disease_trends(access_token, weeks, ranking=ranking)
+
+
+if not st.session_state.get('countries_loaded', False):
+    try:
+        with st.spinner('Loading country information...', show_time=True):
+            st.session_state.countries = client.countries(token)
+            st.session_state.countries_loaded = True
+    except ApiError as e:
+        st.error(f'Error loading country information: {e.detail}')
+        st.stop()
+    except RequestConnectionError:
+        st.error('Please check your internet connection or try again later.')
+        st.stop()
+
+cols = st.columns(3, gap='medium', border=False)
+country: str = cols[0].selectbox(
+    label='Country',
+    options=[ALL_COUNTRIES] + sorted(
+        country['common_name'] for country in st.session_state.countries)
+)
+ranking_label: str = cols[1].radio(label='Ranking', options=list(RANKINGS), horizontal=True)
+weeks: int = cols[2].slider(label='Weeks', min_value=4, max_value=52, value=12, step=4)
+
+try:
+    with st.spinner('Loading disease trends...', show_time=True):
+        trends: list[dict[str, Any]] = fetch_trends(token, weeks, RANKINGS[ranking_label])
+except ApiError as e:
+    st.error(f'Error loading disease trends: {e.detail}')
+    st.stop()
+except RequestConnectionError:
+    st.error('Please check your internet connection or try again later.')
+    st.stop()
+
+trends_df: DataFrame = DataFrame(
+    trends, columns=['week', 'country', 'disease', 'results', 'mean'])
+if country != ALL_COUNTRIES:
+    trends_df = trends_df[trends_df['country'] == country]
+
+if trends_df.empty:
+    st.info('No disease rankings were stored for this selection yet.', icon='ℹ️')
+    st.stop()
+
+# Means of several countries are weighted by the number of rankings behind each.
+trends_df['probability_sum'] = trends_df['mean'] * trends_df['results']
+weekly_df: DataFrame = trends_df.groupby(['week', 'disease'], as_index=False)[
+    ['probability_sum', 'results']].sum()
+weekly_df['mean'] = weekly_df['probability_sum'] / weekly_df['results']
+
+latest_week: str = weekly_df['week'].max()
+latest_df: DataFrame = weekly_df[weekly_df['week'] == latest_week].sort_values(
+    'mean', ascending=False)
+latest_df = latest_df[['disease', 'mean', 'results']].rename(columns={
+    'disease': 'Disease', 'mean': 'Mean', 'results': 'Rankings'})
+latest_df.index = range(1, len(latest_df) + 1)
+
+with st.expander('Mean disease probability by week', expanded=True, icon='📈'):
+    st.line_chart(weekly_df.pivot(index='week', columns='disease', values='mean'))
+
+with st.expander(f'Disease ranking for the week of {latest_week}', expanded=True, icon='📊'):
+    st.dataframe(latest_df, use_container_width=True,
+                 column_config={'Mean': st.column_config.NumberColumn(format='%.3f')})
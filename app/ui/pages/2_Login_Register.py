@@ -1,15 +1,11 @@
 """Show the Login page for FebriLogic."""
 import re
 
-import requests
-from requests.exceptions import HTTPError
+from requests.exceptions import RequestException
 import streamlit as st
 
-from config import (
-    controller,
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
-)
+from config import controller, FEBRILOGIC_LOGO, get_api_client
+from config.client import ApiError
 
 
 st.set_page_config(
@@ -22,6 +18,8 @@ st.logo(FEBRILOGIC_LOGO, size='large', link='https://www.febrilogic.com')
 
 st.title('🔑 Login / Register')
 
+client = get_api_client()
+
 st.session_state.setdefault('login', False)
 st.session_state.setdefault('register', False)
 
@@ -83,21 +81,15 @@ if st.session_state.get('login', False):
     try:
         with center_col:
             with st.spinner('Logging in...', show_time=True):
-                response = requests.post(f'{FAST_API_BASE_URL}/auth/token',
-                                         timeout=(FAST_API_CONNECT_TIMEOUT,
-                                                  FAST_API_READ_TIMEOUT),
-                                         data={'username': st.session_state.get('email', ''),
-                                               'password': st.session_state.get('password', '')})
-                response.raise_for_status()
-            token = response.json().get('access_token', '')
+                token = client.login(st.session_state.get('email', ''),
+                                     st.session_state.get('password', ''))
             st.session_state.token = token
             controller.set('token', token)
         st.switch_page('./pages/4_Patient_Information.py')
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        center_col.error(f'Login unsuccessful: {error_detail}')
+    except ApiError as e:
+        center_col.error(f'Login unsuccessful: {e.detail}')
         st.stop()
-    except requests.exceptions.RequestException as e:
+    except RequestException as e:
         center_col.error(f'Error connecting to the server: {e}')
         st.stop()
 
@@ -106,36 +98,27 @@ if st.session_state.get('register', False):
     try:
         with center_col:
             with st.spinner('Registering...', show_time=True):
-                response = requests.post(f'{FAST_API_BASE_URL}/auth',
-                                         timeout=(FAST_API_CONNECT_TIMEOUT,
-                                                  FAST_API_READ_TIMEOUT),
-                                         json={'email': st.session_state.get('email', ''),
-                                               'password': st.session_state.get('password', '')})
-                response.raise_for_status()
+                client.register(st.session_state.get('email', ''),
+                                st.session_state.get('password', ''))
         center_col.success(
             f"Verification email sent to {st.session_state.get('email', '')}.")
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        center_col.error(f"Registration unsuccessful: {error_detail}")
+    except ApiError as e:
+        center_col.error(f"Registration unsuccessful: {e.detail}")
         st.stop()
-    except requests.exceptions.RequestException as e:
+    except RequestException as e:
         center_col.error(f"Error connecting to the server: {e}")
         st.stop()
 
 if st.session_state.get('reset_password', False):
-    payload: dict[str, str] = {
-        'email': st.session_state.get('email', '')
-    }
     try:
         with center_col:
             with st.spinner('Sending password reset email...', show_time=True):
-                response = requests.post(f'{FAST_API_BASE_URL}/auth/request-password-reset',
-                                         json=payload,
-                                         timeout=(FAST_API_CONNECT_TIMEOUT,
-                                                  FAST_API_READ_TIMEOUT))
-                response.raise_for_status()
+                client.request_password_reset(st.session_state.get('email', ''))
             center_col.success(
                 f"Password reset email sent to {st.session_state.get('email', '')}", icon='✅')
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        center_col.error(f'Password reset unsuccessful: {e.detail}')
+        st.stop()
+    except RequestException as e:
         center_col.error(f'Error connecting to the server: {e}')
         st.stop()
@@ -1,11 +1,7 @@
-import requests
+from requests.exceptions import RequestException
 import streamlit as st
 
-from config import (
-    controller,
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
-)
+from config import controller, FEBRILOGIC_LOGO, get_api_client
 
 st.set_page_config(
     page_title='Reset Password',
@@ -55,22 +51,10 @@ if submitted and new_password == confirm_password:
         with cols[1]:
             with st.spinner('Resetting password...'):
                 if token:
-                    response = requests.post(
-                        f'{FAST_API_BASE_URL}/auth/reset-password',
-                        json={'token': token, 'new_password': new_password},
-                        timeout=(FAST_API_CONNECT_TIMEOUT,
-                                 FAST_API_READ_TIMEOUT)
-                    )
+                    get_api_client().reset_password(token, new_password)
                 else:
-                    response = requests.post(
-                        f'{FAST_API_BASE_URL}/auth/change-password',
-                        headers={'Authorization': f'Bearer {controller_token}'},
-                        json={'current_password': current_password,
-                              'new_password': new_password},
-                        timeout=(FAST_API_CONNECT_TIMEOUT,
-                                 FAST_API_READ_TIMEOUT)
-                    )
-            response.raise_for_status()
+                    get_api_client().change_password(controller_token, current_password,
+                                                     new_password)
             st.success('Password reset successfully.')
-    except requests.RequestException as e:
+    except RequestException as e:
         st.error(f'Error resetting password: {e}')
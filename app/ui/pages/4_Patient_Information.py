@@ -1,16 +1,15 @@
 """Show Patient Information page for FebriLogic."""
-import time
 from datetime import datetime
-from typing import Any, Final
+from typing import Any, Callable, Final
 
-import requests
 import streamlit as st
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError as RequestConnectionError
 
 from config import (
-    controller, FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT,
-    FAST_API_READ_TIMEOUT, FEBRILOGIC_LOGO
+    controller, FEBRILOGIC_LOGO, get_api_client, notify_next_page, prefetch,
+    show_notice
 )
+from config.client import ApiError
 
 st.set_page_config(
     page_title='Patient Information',
@@ -20,6 +19,7 @@ st.set_page_config(
 )
 
 st.logo(FEBRILOGIC_LOGO, size='large', link='https://www.febrilogic.com')
+show_notice()
 
 if 'token' not in st.session_state:
     token: str = controller.get('token')
@@ -36,6 +36,8 @@ else:
 
 st.title('ℹ️ Patient Information')
 
+client = get_api_client()
+
 cols = st.columns(3, gap='small', border=False)
 cols[0].subheader(f"**Date:** {datetime.now().strftime('%d-%m-%Y')}")
 
@@ -46,64 +48,113 @@ if 'patient_info' not in st.session_state:
     st.session_state.submitted = False
 
 
-@st.cache_data(show_spinner=False, ttl=1)
-def get_patient_info() -> list[dict[str, Any]]:
-    """Fetch patient information from the FastAPI server."""
+def merge_patients(fetched: list[dict[str, Any]]) -> None:
+    """Merge fetched patients into the session's patient list by ID."""
+    by_id: dict[int, dict[str, Any]] = {
+        patient['id']: patient for patient in st.session_state.get('patients', [])}
+    by_id.update((patient['id'], patient) for patient in fetched)
+    st.session_state.patients = sorted(by_id.values(),
+                                       key=lambda patient: patient['patient_number'])
+    updated: list[str] = [patient['updated_at'] for patient in fetched
+                          if patient.get('updated_at')]
+    if updated:
+        st.session_state.patients_synced_at = max(
+            [*updated, st.session_state.get('patients_synced_at') or ''])
+
+
+def patient_loader() -> Callable[[], Any]:
+    """
+    Get a call fetching the first page of patients, or only the patients added or changed
+    since the last sync when some are already loaded.
+    """
+    if not st.session_state.get('patients'):
+        return lambda: client.patients(token)
+    synced_at: str = st.session_state.get('patients_synced_at') or '1970-01-01T00:00:00'
+    return lambda: {'changed': client.changed_patients(token, synced_at)}
+
+
+def load_metadata() -> None:
+    """Fetch the patients and countries that are not loaded yet, concurrently."""
+    calls: dict[str, Any] = {}
+    if not st.session_state.get('patients_loaded', False):
+        calls['patients'] = patient_loader()
+    if not st.session_state.get('countries_loaded', False):
+        calls['countries'] = lambda: client.countries(token)
+    if not calls:
+        return
     try:
-        response = requests.get(
-            headers={'Authorization': f'Bearer {token}'},
-            url=f'{FAST_API_BASE_URL}/api/patients',
-            timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT)
-        )
-        response.raise_for_status()
-        return response.json().get('patients', [])
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error fetching patient information: {error_detail}')
+        with st.spinner('Loading patient and country information...', show_time=True):
+            loaded: dict[str, Any] = client.gather(**calls)
+    except ApiError as e:
+        st.error(f'Error loading patient information: {e.detail}')
         st.stop()
-    except requests.exceptions.ConnectionError:
+    except RequestConnectionError:
         st.error('Connection error. Please check your FastAPI server.')
         st.stop()
-
-
-if not st.session_state.get('patients_loaded', False):
-    with st.spinner('Loading patient information...', show_time=True):
-        st.session_state.patients = get_patient_info()
+    if 'patients' in loaded:
+        patients_page: dict[str, Any] = loaded['patients']
+        merge_patients(patients_page.get('changed', patients_page.get('patients', [])))
+        if 'changed' not in patients_page:
+            st.session_state.patients_next_after = patients_page['next_after']
         st.session_state.patients_loaded = True
+    if 'countries' in loaded:
+        st.session_state.countries = loaded['countries']
+        st.session_state.countries_loaded = True
 
 
-def get_countries() -> list[dict[str, Any]]:
-    """Fetch country information from the FastAPI server."""
-    try:
-        response = requests.get(
-            headers={'Authorization': f'Bearer {token}'},
-            url=f'{FAST_API_BASE_URL}/api/countries',
-            timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT)
-        )
-        response.raise_for_status()
-        return response.json().get('countries', [])
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error loading country information: {error_detail}')
-        st.stop()
-    except requests.exceptions.ConnectionError:
-        st.error('Connection error. Please check your internet connection.')
-        st.stop()
-
+load_metadata()
 
-if not st.session_state.get('countries_loaded', False):
-    with st.spinner('Loading country information...', show_time=True):
-        st.session_state.countries = get_countries()
-        st.session_state.countries_loaded = True
+if not st.session_state.get('diseases_loaded', False):
+    prefetch('diseases', lambda: client.diseases(token))
 
 PLACEHOLDER: Final[str] = 'Please select'
 
-cols = st.columns(6, gap='medium', border=False)
+cols = st.columns(6, gap='medium', border=False, vertical_alignment='bottom')
 
-patient_numbers: list[int] = [patient['patient_number']
-                              for patient in st.session_state.patients]
+st.session_state.patient_numbers = [patient['patient_number']
+                                    for patient in st.session_state.patients]
 
-st.session_state.patient_numbers = patient_numbers
+search: str = cols[1].text_input(label='Search patients',
+                                 key='patient_search',
+                                 placeholder='Number, age, country, or city').strip()
+if search and st.session_state.get('patient_search_results', ('', []))[0] != search:
+    try:
+        with st.spinner('Searching patients...'):
+            found: list[dict[str, Any]] = client.patients(token, search=search)['patients']
+    except ApiError as e:
+        st.error(f'Error searching patients: {e.detail}')
+        st.stop()
+    except RequestConnectionError:
+        st.error('Connection error. Please check your FastAPI server.')
+        st.stop()
+    merge_patients(found)
+    st.session_state.patient_search_results = (
+        search, [patient['patient_number'] for patient in found])
+    st.session_state.patient_numbers = [patient['patient_number']
+                                        for patient in st.session_state.patients]
+
+next_after: int | None = st.session_state.get('patients_next_after')
+if cols[2].button(label='Load more', use_container_width=True, icon='⏬',
+                  disabled=next_after is None or bool(search)):
+    try:
+        with st.spinner('Loading more patients...'):
+            page: dict[str, Any] = client.patients(token, after=next_after)
+    except ApiError as e:
+        st.error(f'Error loading patient information: {e.detail}')
+        st.stop()
+    except RequestConnectionError:
+        st.error('Connection error. Please check your FastAPI server.')
+        st.stop()
+    merge_patients(page['patients'])
+    st.session_state.patients_next_after = page['next_after']
+    st.rerun()
+
+patient_numbers: list[int] = st.session_state.patient_numbers
+if search:
+    selected_number: int | str = st.session_state.get('patient_info_selectbox', 'New patient')
+    patient_numbers = st.session_state.patient_search_results[1]
+    if selected_number != 'New patient' and selected_number not in patient_numbers:
+        patient_numbers = [selected_number, *patient_numbers]
 
 st.session_state.patient_number = cols[0].selectbox(label='Select a patient',
                                                     key='patient_info_selectbox',
@@ -215,31 +266,21 @@ for country in countries:
         break
 
 
-def submit_patient_info(url: str, payload: dict[str, Any]) -> None:
+def submit_patient_info(payload: dict[str, Any], existing_id: int | None = None) -> int:
     """Submit patient information to the FastAPI server."""
     try:
         with st.spinner('Submitting patient information...', show_time=True):
-            response = requests.post(
-                url=url,
-                headers={'Authorization': f'Bearer {token}'},
-                json=payload,
-                timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT)
-            )
-            response.raise_for_status()
-        case_id: int = response.json().get('patient_id')
-        return case_id
-    except requests.exceptions.ConnectionError:
+            return client.save_patient(token, payload, existing_id)
+    except RequestConnectionError:
         st.error('Please check your internet connection or try again later.')
         st.stop()
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error submitting patient information: {error_detail}')
+    except ApiError as e:
+        st.error(f'Error submitting patient information: {e.detail}')
         st.stop()
 
 
 if st.session_state.get('ready', False):
     st.session_state.ready = False
-    st.session_state.patients_loaded = False
     patient_id: int = st.session_state.get('patient_id', 0)
     body: dict[str, str | int] = {
         'age': int(patient_age),
@@ -248,7 +289,7 @@ if st.session_state.get('ready', False):
         'race': str(patient_race),
         'sex': str(patient_sex)
     }
-    route: str = f'{FAST_API_BASE_URL}/api/patients'
+    existing_id: int | None = None
     current_patient = next(
         (patient for patient in patients if patient['patient_number'] == st.session_state.patient_number), None)
     if current_patient:
@@ -258,20 +299,18 @@ if st.session_state.get('ready', False):
                 or current_patient['race'] != patient_race \
                 or current_patient['sex'] != patient_sex:
             body['id'] = int(patient_id)
-            route += f'/{patient_id}'
+            existing_id = int(patient_id)
         else:
-            st.warning('No changes detected in patient information.',
-                       icon='⚠️')
-            time.sleep(1.5)
+            notify_next_page('No changes detected in patient information.', '⚠️')
             st.switch_page('./pages/5_Disease-Specific_Tests.py')
-    else:
-        st.session_state.patient_number = len(
-            st.session_state.patient_numbers) + 1
-    patient_id: int = submit_patient_info(route, body)
+    patient_id: int = submit_patient_info(body, existing_id)
     st.session_state.patient_id = patient_id
-    if not st.session_state.patient_number in st.session_state.patient_numbers:
-        st.session_state.patient_numbers.append(
-            st.session_state.patient_number)
-    st.success('Patient information submitted successfully.', icon='✅')
-    time.sleep(1.5)
+    st.session_state.patients_loaded = False
+    load_metadata()
+    st.session_state.patient_numbers = [patient['patient_number']
+                                        for patient in st.session_state.patients]
+    st.session_state.patient_number = next(
+        (patient['patient_number'] for patient in st.session_state.patients
+         if patient['id'] == patient_id), st.session_state.patient_number)
+    notify_next_page('Patient information submitted successfully.', '✅')
     st.switch_page('./pages/5_Disease-Specific_Tests.py')
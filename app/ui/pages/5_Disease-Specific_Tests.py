@@ -1,14 +1,12 @@
 """Show Disease Specific Tests page."""
-import time
-
-import requests
 import streamlit as st
+from requests.exceptions import ConnectionError as RequestConnectionError
 
 from config import (
-    controller,
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
+    controller, FEBRILOGIC_LOGO, get_api_client, notify_next_page, prefetch,
+    prefetched, show_notice
 )
+from config.client import ApiError
 
 st.set_page_config(
     page_title='Disease Specific Tests',
@@ -16,6 +14,7 @@ st.set_page_config(
 )
 
 st.logo(FEBRILOGIC_LOGO, size='large', link='https://www.febrilogic.com')
+show_notice()
 
 if 'token' not in st.session_state:
     token: str = controller.get('token')
@@ -33,8 +32,7 @@ else:
 if not st.session_state.get('patient_numbers', []):
     st.session_state.diseases_loaded = False
     st.session_state.diseases = []
-    st.error('No patient information available.')
-    time.sleep(2)
+    notify_next_page('No patient information available.', '⚠️')
     st.switch_page('./pages/4_Patient_Information.py')
 
 if st.session_state.get('patient_number') == 0:
@@ -56,13 +54,11 @@ def fetch_diseases():
     """Fetch disease information from the FastAPI server."""
     try:
         with st.spinner('Loading disease information...'):
-            response = requests.get(url=f'{FAST_API_BASE_URL}/api/diseases',
-                                    timeout=(FAST_API_CONNECT_TIMEOUT,
-                                             FAST_API_READ_TIMEOUT),
-                                    headers={'Authorization': f'Bearer {token}'})
-            response.raise_for_status()
-        return response.json().get('diseases', [])
-    except requests.exceptions.ConnectionError:
+            return prefetched('diseases', lambda: get_api_client().diseases(token)).result()
+    except ApiError as e:
+        st.error(f'Error fetching diseases: {e.detail}')
+        st.stop()
+    except RequestConnectionError:
         st.error("Failed to connect to the API. Please check your connection.")
         st.stop()
 
@@ -71,6 +67,9 @@ if not st.session_state.get('diseases_loaded', False):
     st.session_state.diseases = fetch_diseases()
     st.session_state.diseases_loaded = True
 
+if not st.session_state.get('symptoms_loaded', False):
+    prefetch('symptoms', lambda: get_api_client().symptoms(token))
+
 diseases: list[str] = st.session_state.get('diseases', [])
 
 disease_set: set[str] = set()
@@ -120,21 +119,6 @@ patient_id: int = st.session_state.get('patient_id')
 if submitted:
     negative_diseases: list[str] = [disease for disease,
                                     checked in checkboxes.items() if checked]
-    try:
-        with st.spinner('Submitting negative diseases for selected patient...'):
-            response = requests.post(
-                url=f'{FAST_API_BASE_URL}/api/patients/{patient_id}/diseases',
-                json={
-                    'negative_diseases': negative_diseases
-                },
-                headers={'Authorization': f'Bearer {token}'},
-                timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT)
-            )
-            response.raise_for_status()
-        st.success('Negative diseases submitted successfully.')
-        time.sleep(2)
-        st.switch_page('./pages/6_Symptom_Checker.py')
-    except requests.exceptions.ConnectionError:
-        st.error('Please check your internet connection or try again later.')
-        time.sleep(2)
-        st.stop()
+    st.session_state.setdefault('encounters', {}).setdefault(
+        patient_id, {})['negative_diseases'] = negative_diseases
+    st.switch_page('./pages/6_Symptom_Checker.py')
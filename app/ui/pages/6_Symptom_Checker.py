@@ -1,15 +1,12 @@
 """Show Symptom Checker page for FebriLogic."""
-import time
-
-import requests
 import streamlit as st
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError as RequestConnectionError
 
 from config import (
-    controller,
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
+    controller, FEBRILOGIC_LOGO, get_api_client, notify_next_page, prefetch,
+    prefetched
 )
+from config.client import ApiError
 
 
 st.set_page_config(
@@ -38,8 +35,7 @@ else:
 if not st.session_state.get('patient_numbers', []):
     st.session_state.diseases_loaded = False
     st.session_state.diseases = []
-    st.error('No patients available. Please add a patient first.')
-    time.sleep(2)
+    notify_next_page('No patients available. Please add a patient first.', '⚠️')
     st.switch_page('./pages/4_Patient_Information.py')
 
 if st.session_state.get('patient_number') == 0:
@@ -68,18 +64,11 @@ def fetch_symptoms():
     """Fetch symptom metadata from the FastAPI server."""
     try:
         with st.spinner('Loading symptom metadata...', show_time=True):
-            response = requests.get(headers={'Authorization': f'Bearer {token}'},
-                                    url=f'{FAST_API_BASE_URL}/api/symptoms/categories-definitions',
-                                    timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT))
-            response.raise_for_status()
-        time.sleep(1.5)
-        return response.json().get(
-            'category_symptom_definition', {})
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error fetching symptoms: {error_detail}')
+            return prefetched('symptoms', lambda: get_api_client().symptoms(token)).result()
+    except ApiError as e:
+        st.error(f'Error fetching symptoms: {e.detail}')
         st.stop()
-    except requests.exceptions.ConnectionError:
+    except RequestConnectionError:
         st.error('Please check your internet connection or try again later.')
         st.stop()
 
@@ -88,6 +77,11 @@ if not st.session_state.get('symptoms_loaded', False):
     st.session_state.category_symptom_definition = fetch_symptoms()
     st.session_state.symptoms_loaded = True
 
+if not st.session_state.get('biomarkers_loaded', False):
+    prefetch('biomarkers', lambda: get_api_client().biomarkers(token))
+if not st.session_state.get('biomarker_units_loaded', False):
+    prefetch('biomarker_units', lambda: get_api_client().biomarker_units(token))
+
 
 category_symptom_definition = st.session_state.get(
     'category_symptom_definition', {}
@@ -156,26 +150,6 @@ for symptom in symptom_names:
 patient_id: int = st.session_state.get('patient_id')
 if st.session_state.get('ready', False):
     st.session_state.ready = False
-    symptom_request: dict[str, dict[str, list[str]]] = {
-        'symptom_names': ticked_symptoms
-    }
-    try:
-        st.empty()
-        with st.spinner('Submitting patient symptoms...', show_time=True):
-            response = requests.post(
-                headers={'Authorization': f'Bearer {token}'},
-                url=f'{FAST_API_BASE_URL}/api/patients/{patient_id}/symptoms',
-                json=symptom_request,
-                timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT)
-            )
-            response.raise_for_status()
-        st.success('Patient symptoms submitted successfully.', icon='✅')
-        time.sleep(1.5)
-        st.switch_page('./pages/7_Biomarkers.py')
-    except requests.exceptions.ConnectionError:
-        st.error('Please check your internet connection or try again later.')
-        st.stop()
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error submitting symptoms: {error_detail}')
-        st.stop()
+    st.session_state.setdefault('encounters', {}).setdefault(
+        patient_id, {})['symptom_names'] = ticked_symptoms
+    st.switch_page('./pages/7_Biomarkers.py')
@@ -1,15 +1,13 @@
 """Show Biomarkers page for FebriLogic."""
-import time
+from concurrent.futures import Future
 
-import requests
 import streamlit as st
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError as RequestConnectionError
 
 from config import (
-    controller,
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
+    controller, FEBRILOGIC_LOGO, get_api_client, notify_next_page, prefetched
 )
+from config.client import ApiError
 
 st.set_page_config(
     page_title='Biomarkers',
@@ -39,8 +37,7 @@ else:
 if not st.session_state.get('patient_numbers', []):
     st.session_state.diseases_loaded = False
     st.session_state.diseases = []
-    st.error('No patients available. Please add a patient first.')
-    time.sleep(2)
+    notify_next_page('No patients available. Please add a patient first.', '⚠️')
     st.switch_page('./pages/4_Patient_Information.py')
 
 
@@ -50,41 +47,24 @@ if st.session_state.get('patient_number') == 0:
 
 st.title('🔬 Biomarkers')
 
+client = get_api_client()
+
+pending: dict[str, Future] = {}
 if not st.session_state.biomarkers_loaded:
+    pending['biomarkers'] = prefetched('biomarkers', lambda: client.biomarkers(token))
+if not st.session_state.biomarker_units_loaded:
+    pending['biomarker_units'] = prefetched(
+        'biomarker_units', lambda: client.biomarker_units(token))
+if pending:
     try:
         with st.spinner('Loading biomarker metadata...', show_time=True):
-            response = requests.get(headers={'Authorization': f'Bearer {token}'},
-                                    url=f'{FAST_API_BASE_URL}/api/biomarkers',
-                                    timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT))
-            response.raise_for_status()
-            biomarkers: list[dict[str, str]
-                             ] = response.json().get('biomarkers', [])
-            st.session_state.biomarkers = biomarkers
-            st.session_state.biomarkers_loaded = True
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error fetching biomarkers: {error_detail}')
-        st.rerun()
-    except requests.exceptions.ConnectionError:
-        st.error('Please check your internet connection or try again later.')
+            for name, future in pending.items():
+                st.session_state[name] = future.result()
+                st.session_state[f'{name}_loaded'] = True
+    except ApiError as e:
+        st.error(f'Error fetching biomarkers: {e.detail}')
         st.stop()
-
-if not st.session_state.biomarker_units_loaded:
-    try:
-        with st.spinner('Loading biomarker units...', show_time=True):
-            response = requests.get(headers={'Authorization': f'Bearer {token}'},
-                                    url=f'{FAST_API_BASE_URL}/api/biomarkers/units',
-                                    timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT))
-            response.raise_for_status()
-            biomarker_units: dict[str, list[str]] = response.json().get(
-                'biomarker_units', {})
-            st.session_state.biomarker_units = biomarker_units
-            st.session_state.biomarker_units_loaded = True
-    except HTTPError:
-        error_detail = response.json().get('detail', 'Unknown error')
-        st.error(f'Error fetching biomarker units: {error_detail}')
-        st.rerun()
-    except requests.exceptions.ConnectionError:
+    except RequestConnectionError:
         st.error('Please check your internet connection or try again later.')
         st.stop()
 
@@ -191,23 +171,25 @@ for biomarker, flag in checkboxes.items():
 
 patient_id: int = st.session_state.get('patient_id')
 if submitted:
+    encounter: dict[str, list[str]] = st.session_state.get(
+        'encounters', {}).get(patient_id, {})
+    patient_encounter_request = {
+        **encounter,
+        'biomarker_value_unit': biomarker_value_unit
+    }
     try:
-        with st.spinner('Submitting biomarkers...', show_time=True):
-            patient_biomarkers_request = {
-                'biomarker_value_unit': biomarker_value_unit
-            }
-            time.sleep(5)
-            response = requests.post(
-                json=patient_biomarkers_request,
-                headers={'Authorization': f'Bearer {token}'},
-                url=f"{FAST_API_BASE_URL}/api/patients/{patient_id}/biomarkers",
-                timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT)
-            )
-            response.raise_for_status()
-        st.success('Patient biomarkers submitted successfully!')
-        time.sleep(2)
+        with st.spinner('Submitting patient results...', show_time=True):
+            results, etag, mc_mode = client.submit_encounter(
+                token, patient_id, patient_encounter_request)
+        st.session_state.get('encounters', {}).pop(patient_id, None)
+        st.session_state.setdefault('result_cache', {})[(patient_id, mc_mode)] = {
+            'etag': etag, 'results': results}
+        notify_next_page('Patient results submitted successfully!', '✅')
         st.session_state.biomarkers_loaded = False
         st.switch_page('./pages/8_Results.py')
-    except requests.exceptions.ConnectionError:
+    except ApiError as e:
+        st.error(f'Error submitting patient results: {e.detail}')
+        st.stop()
+    except RequestConnectionError:
         st.error('Please check your internet connection or try again later.')
         st.stop()
@@ -1,16 +1,14 @@
 """Show Results page for FebriLogic."""
-import time
 from typing import Any
 
-import requests
 import streamlit as st
+from requests.exceptions import ConnectionError as RequestConnectionError
 from pandas import DataFrame
 
 from config import (
-    controller,
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
+    controller, FEBRILOGIC_LOGO, get_api_client, notify_next_page, show_notice
 )
+from config.client import ApiError
 
 st.set_page_config(
     page_title='Results',
@@ -19,6 +17,7 @@ st.set_page_config(
 )
 
 st.logo(FEBRILOGIC_LOGO, size='large', link='https://www.febrilogic.com')
+show_notice()
 
 if 'token' not in st.session_state:
     token: str = controller.get('token')
@@ -36,8 +35,7 @@ else:
 if not st.session_state.get('patient_numbers', []):
     st.session_state.diseases_loaded = False
     st.session_state.diseases = []
-    st.error('No patients available. Please add a patient first.')
-    time.sleep(2)
+    notify_next_page('No patients available. Please add a patient first.', '⚠️')
     st.switch_page('./pages/4_Patient_Information.py')
 
 if st.session_state.get('patient_number') == 0:
@@ -57,83 +55,83 @@ patient_number = cols[0].selectbox(label='Select a patient',
                                        'patient_numbers', []),
                                    index=index)
 
+full_precision: bool = cols[1].toggle(
+    label='Full precision',
+    key='results_full_precision',
+    help='Use every Monte Carlo draw, as for reports, instead of stopping once the '
+         'ranking is stable. Slower for large models.')
+
 submitted = cols[4].button(label='Submit',
                            icon='📤',
                            use_container_width=True)
 
-patient_id = st.session_state.get('patient_id')
+patient_id = next(
+    (patient['id'] for patient in st.session_state.get('patients', [])
+     if patient['patient_number'] == patient_number),
+    st.session_state.get('patient_id'))
+st.session_state.patient_number = patient_number
+st.session_state.patient_id = patient_id
+
+mc_mode: str = 'full' if full_precision else 'fast'
+result_cache: dict[tuple[int, str], dict[str, Any]] = st.session_state.setdefault(
+    'result_cache', {})
+cached: dict[str, Any] = result_cache.get((patient_id, mc_mode), {})
 if submitted:
-    url: str = f'{FAST_API_BASE_URL}/api/patients/{patient_id}/calculate'
     try:
         with st.spinner('Ranking diseases...'):
-            response = requests.get(url=url,
-                                    headers={
-                                        'Authorization': f'Bearer {token}'},
-                                    timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT))
-            response.raise_for_status()
-        results = response.json().get('results', {})
-
-        symptom_mean: dict[str, Any] = results.get('symptom_mean', {})
-        symptom_ci_low: dict[str, Any] = results.get('symptom_ci_low', {})
-        symptom_ci_high: dict[str, Any] = results.get('symptom_ci_high', {})
-
-        biomarker_mean: dict[str, Any] = results.get('biomarker_mean', {})
-        biomarker_ci_low: dict[str, Any] = results.get('biomarker_ci_low', {})
-        biomarker_ci_high: dict[str, Any] = results.get(
-            'biomarker_ci_high', {})
-        biomarker_avg: dict[str, Any] = {}
-        biomarker_conf_int_low: dict[str, Any] = {}
-        biomarker_conf_int_high: dict[str, Any] = {}
-        for key, mean, ci_low, ci_high in zip(
-                biomarker_mean.keys(),
-                biomarker_mean.values(),
-                biomarker_ci_low.values(),
-                biomarker_ci_high.values()):
-            biomarker_avg[key.title()] = mean
-            biomarker_conf_int_low[key.title()] = ci_low
-            biomarker_conf_int_high[key.title()] = ci_high
-
-    except requests.exceptions.ConnectionError:
+            fetched, etag = get_api_client().calculate(
+                token, patient_id, cached.get('etag'), mc_mode)
+        if fetched is not None:
+            cached = result_cache[(patient_id, mc_mode)] = {'etag': etag, 'results': fetched}
+    except ApiError as e:
+        st.error(f'Error ranking diseases: {e.detail}')
+        st.stop()
+    except RequestConnectionError:
         st.error('Please check your internet connection or try again later.')
         st.stop()
 
-if submitted:
-    symptom_df: DataFrame = DataFrame({
-        'Mean': symptom_mean,
-        'Confidence Interval (Low)': symptom_ci_low,
-        'Confidence Interval (High)': symptom_ci_high
-    })
-    symptom_df.reset_index(inplace=True)
-    symptom_df.rename(columns={'index': 'Disease'}, inplace=True)
-    symptom_df.sort_values(
-        by='Mean', ascending=False, inplace=True
-    )
-    symptom_df.index = range(1, len(symptom_df) + 1)
-    symptom_df.drop(columns=['Mean', 'Confidence Interval (Low)',
-                    'Confidence Interval (High)'], axis=1, inplace=True)
-
-    biomarker_df: DataFrame = DataFrame({
-        'Mean': biomarker_avg,
-        'Confidence Interval (Low)': biomarker_conf_int_low,
-        'Confidence Interval (High)': biomarker_conf_int_high
+results: dict[str, Any] = cached.get('results', {})
+
+
+def ranking_table(means: dict[str, float], ci_lows: dict[str, float],
+                  ci_highs: dict[str, float]) -> DataFrame:
+    """Rank diseases by mean probability with their confidence intervals."""
+    table: DataFrame = DataFrame({
+        'Mean': means,
+        'Confidence Interval (Low)': ci_lows,
+        'Confidence Interval (High)': ci_highs
     })
-    biomarker_df.index = biomarker_df.index.str.replace(
+    table.reset_index(inplace=True)
+    table.rename(columns={'index': 'Disease'}, inplace=True)
+    table.sort_values(by='Mean', ascending=False, inplace=True)
+    table.index = range(1, len(table) + 1)
+    return table
+
+
+if results:
+    symptom_df: DataFrame = ranking_table(results.get('symptom_mean', {}),
+                                          results.get('symptom_ci_low', {}),
+                                          results.get('symptom_ci_high', {}))
+
+    biomarker_df: DataFrame = ranking_table(results.get('biomarker_mean', {}),
+                                            results.get('biomarker_ci_low', {}),
+                                            results.get('biomarker_ci_high', {}))
+    biomarker_df['Disease'] = biomarker_df['Disease'].str.title().str.replace(
         r'(Severe|Non-Severe)$', r'(\1)', regex=True)
-    biomarker_df.reset_index(inplace=True)
-    biomarker_df.rename(columns={'index': 'Disease'}, inplace=True)
-    biomarker_df.sort_values(
-        'Mean', ascending=False, inplace=True
-    )
-
-    biomarker_df.index = range(1, len(biomarker_df) + 1)
-    biomarker_df.drop(
-        columns=['Mean', 'Confidence Interval (Low)',
-                 'Confidence Interval (High)'], axis=1, inplace=True
-    )
+
+    column_config: dict[str, Any] = {
+        column: st.column_config.NumberColumn(format='%.3f')
+        for column in ('Mean', 'Confidence Interval (Low)', 'Confidence Interval (High)')
+    }
 
     with st.expander('Disease ranking', expanded=True, icon='📈'):
         cols = st.columns(2, gap='medium', border=True)
         cols[0].subheader('Symptoms')
-        cols[0].dataframe(symptom_df, use_container_width=True, )
+        cols[0].dataframe(symptom_df, use_container_width=True,
+                          column_config=column_config)
         cols[1].subheader('Symptoms + Biomarkers')
-        cols[1].dataframe(biomarker_df, use_container_width=True)
+        cols[1].dataframe(biomarker_df, use_container_width=True,
+                          column_config=column_config)
+        if 'mc_draws' in results:
+            st.caption(f"Ranked from {results['mc_draws']} of {results['mc_draws_total']} "
+                       'Monte Carlo draws.')
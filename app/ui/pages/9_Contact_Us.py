@@ -1,15 +1,11 @@
 """Show Contact Us page for FebriLogic."""
-import time
 from typing import Final
 
-import requests
 import streamlit as st
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError as RequestConnectionError
 
-from config import (
-    FAST_API_BASE_URL, FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT,
-    FEBRILOGIC_LOGO
-)
+from config import FEBRILOGIC_LOGO, get_api_client
+from config.client import ApiError
 
 
 st.set_page_config(
@@ -67,24 +63,14 @@ if submitted:
     try:
         with columns[1]:
             with st.spinner('Sending your message...'):
-                response = requests.post(
-                    f'{FAST_API_BASE_URL}/api/contact',
-                    json=payload,
-                    timeout=(FAST_API_CONNECT_TIMEOUT, FAST_API_READ_TIMEOUT),
-                    headers={
-                        'Authorization': f"Bearer {st.session_state.get('token', '')}",
-                    }
-                )
-                response.raise_for_status()
+                get_api_client().contact(st.session_state.get('token', ''), payload)
 
         columns[1].success(
             "Thanks for reaching out! We'll get back to you soon", icon='✅')
-        time.sleep(2)
-    except HTTPError:
-        detail: str = response.json().get('detail', 'Unknown error occurred.')
-        columns[1].error(f'Error sending message: {detail}')
+    except ApiError as e:
+        columns[1].error(f'Error sending message: {e.detail}')
         st.stop()
-    except requests.exceptions.ConnectionError:
+    except RequestConnectionError:
         columns[1].error(
             'Please check your internet connection or try again later.'
         )